@@ -0,0 +1,262 @@
+"""
+趋势分析
+把历史库里的每日快照排成 (ASIN×市场) × 天 的名次矩阵，用 NumPy 整列运算算出
+名次速度、移动平均、连续在榜天数、跨市场名次差和综合的爆发分（breakout），
+10 万行 × 365 天的矩阵几秒内算完；ranking 可按爆发分给商品加权
+
+用法：
+    python analytics.py breakouts --chart movers_shakers --days 90 --limit 20
+"""
+
+import argparse
+import os
+from datetime import date, timedelta
+
+import numpy as np
+
+from history import HISTORY_DB, connect
+
+# 参与计算的历史天数
+ANALYTICS_DAYS = int(os.environ.get("ANALYTICS_DAYS", "90"))
+
+# 短期 / 长期窗口（天）
+SHORT_WINDOW = 7
+LONG_WINDOW = 28
+
+# 爆发分各项权重：
+#   velocity  名次速度（每天上升的名次，经 tanh 压到 -1~1）
+#   momentum  短期均值相对长期均值的改善幅度
+#   strength  今天的名次（第 1 名为 1，第 100 名接近 0）
+#   freshness 刚上榜的商品加分，在榜越久越少
+#   breadth   同时在多个市场上榜
+BREAKOUT_WEIGHTS = {
+    "velocity": 0.4,
+    "momentum": 0.2,
+    "strength": 0.2,
+    "freshness": 0.1,
+    "breadth": 0.1,
+}
+
+# 名次速度的归一化尺度：每天上升这么多名时 tanh 约为 0.76
+VELOCITY_SCALE = 5.0
+
+class RankMatrix:
+    """名次矩阵：ranks[i, d] 为第 i 行（ASIN×市场）在第 d 天的名次，不在榜为 NaN
+
+    行按 (ASIN, 市场) 排序，同一 ASIN 的各市场相邻，便于按 ASIN 分组聚合
+    """
+
+    def __init__(self, ranks, asins, markets, start):
+        self.ranks = ranks
+        self.asins = asins
+        self.markets = markets
+        self.start = start
+
+    @property
+    def days(self):
+        return self.ranks.shape[1]
+
+    @classmethod
+    def from_arrays(cls, asins, markets, dates, ranks, start=None, end=None):
+        """由逐条快照（等长的 ASIN、市场、日期、名次数组）构建矩阵，全程不做 Python 循环"""
+        asins = np.asarray(asins)
+        markets = np.asarray(markets)
+        days = np.asarray(dates, dtype="datetime64[D]")
+        start = np.datetime64(start, "D") if start is not None else days.min()
+        end = np.datetime64(end, "D") if end is not None else days.max()
+        keep = (days >= start) & (days <= end)
+        asins, markets, days = asins[keep], markets[keep], days[keep]
+        ranks = np.asarray(ranks, dtype=np.float32)[keep]
+
+        # ASIN 按字节编码成两个 uint64 做整数排序，比直接对字符串 np.unique 快数倍
+        market_values, market_index = np.unique(markets, return_inverse=True)
+        high, low = _asin_keys(asins)
+        order = np.lexsort((market_index, low, high))
+        high, low, market_index = high[order], low[order], market_index[order]
+        new_row = np.r_[True, (high[1:] != high[:-1]) | (low[1:] != low[:-1])
+                        | (market_index[1:] != market_index[:-1])]
+        rows = np.empty(len(order), dtype=np.intp)
+        rows[order] = np.cumsum(new_row) - 1
+
+        matrix = np.full((int(new_row.sum()), int((end - start).astype(int)) + 1), np.nan, dtype=np.float32)
+        matrix[rows, (days - start).astype(int)] = ranks
+        return cls(matrix, asins[order[new_row]], market_values[market_index[new_row]], start)
+
+def _asin_keys(asins):
+    """把 ASIN（ASCII，最多 16 字节）按大端字节序编码成两个 uint64，整数排序与字符串排序一致"""
+    raw = np.asarray(asins, dtype="S16")
+    words = raw.view(">u8").reshape(len(raw), 2)
+    return words[:, 0], words[:, 1]
+
+def moving_average(ranks, window):
+    """按天滑动的名次均值（只对在榜的天求平均），返回与 ranks 同形的矩阵，窗口内无数据为 NaN"""
+    present = ~np.isnan(ranks)
+    sums = np.cumsum(np.where(present, ranks, 0), axis=1, dtype=np.float64)
+    counts = np.cumsum(present, axis=1, dtype=np.int32)
+    sums[:, window:] = sums[:, window:] - sums[:, :-window]
+    counts[:, window:] = counts[:, window:] - counts[:, :-window]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan).astype(np.float32)
+
+def rank_velocity(ranks, window=SHORT_WINDOW):
+    """最近 window 天名次对时间的最小二乘斜率取反（每天上升的名次），在榜不足两天为 0"""
+    tail = ranks[:, -window:]
+    present = ~np.isnan(tail)
+    x = np.arange(tail.shape[1], dtype=np.float64)
+    y = np.where(present, tail, 0).astype(np.float64)
+    n = present.sum(axis=1)
+    sx = (present * x).sum(axis=1)
+    sy = y.sum(axis=1)
+    sxy = (y * x).sum(axis=1)
+    sxx = (present * x * x).sum(axis=1)
+    denominator = n * sxx - sx * sx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = np.where(denominator > 0, (n * sxy - sx * sy) / denominator, 0.0)
+    return 0.0 - slope
+
+def streaks(ranks):
+    """返回 (截至最后一天的连续在榜天数, 最长连续在榜天数, 累计在榜天数)"""
+    present = ~np.isnan(ranks)
+    day = np.arange(ranks.shape[1])
+    last_absent = np.where(~present, day, -1).max(axis=1)
+    current = ranks.shape[1] - 1 - last_absent
+
+    # 累计在榜天数减去最近一次缺席时的累计值，就是每天的连续天数
+    running = np.cumsum(present, axis=1, dtype=np.int32)
+    reset = np.maximum.accumulate(np.where(~present, running, 0), axis=1)
+    longest = (running - reset).max(axis=1) if ranks.shape[1] else np.zeros(len(ranks), dtype=np.int32)
+    return current, longest, running[:, -1]
+
+def cross_market(matrix):
+    """按 ASIN 分组比较最后一天各市场的名次，返回每行对应 ASIN 的 (名次差, 在榜市场数)"""
+    latest = matrix.ranks[:, -1]
+    present = ~np.isnan(latest)
+    if not len(latest):
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int32)
+    starts = np.flatnonzero(np.r_[True, matrix.asins[1:] != matrix.asins[:-1]])
+    group = np.cumsum(np.r_[True, matrix.asins[1:] != matrix.asins[:-1]]) - 1
+    with np.errstate(invalid="ignore"):
+        high = np.fmax.reduceat(latest, starts)
+        low = np.fmin.reduceat(latest, starts)
+    spread = np.nan_to_num(high - low)
+    count = np.add.reduceat(present.astype(np.int32), starts)
+    return spread[group], count[group]
+
+def compute_trends(matrix, short_window=SHORT_WINDOW, long_window=LONG_WINDOW, weights=None):
+    """计算每行的趋势指标，返回列名 -> 数组"""
+    weights = weights or BREAKOUT_WEIGHTS
+    ranks = matrix.ranks
+    latest = ranks[:, -1]
+    present_today = ~np.isnan(latest)
+
+    velocity = rank_velocity(ranks, short_window)
+    ma_short = moving_average(ranks[:, -short_window:], short_window)[:, -1]
+    ma_long = moving_average(ranks[:, -long_window:], long_window)[:, -1]
+    current, longest, days_on_chart = streaks(ranks)
+    spread, market_count = cross_market(matrix)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        momentum = np.nan_to_num(np.clip((ma_long - ma_short) / ma_long, -1, 1))
+    strength = np.where(present_today, np.clip((101 - np.nan_to_num(latest)) / 100, 0, 1), 0)
+    freshness = np.where(current > 0, np.exp(-(current - 1) / short_window), 0)
+    markets_total = max(1, len(np.unique(matrix.markets)) - 1) if len(matrix.markets) else 1
+    breadth = np.clip((market_count - 1) / markets_total, 0, 1)
+
+    breakout = present_today * (
+        weights["velocity"] * np.tanh(velocity / VELOCITY_SCALE)
+        + weights["momentum"] * momentum
+        + weights["strength"] * strength
+        + weights["freshness"] * freshness
+        + weights["breadth"] * breadth
+    )
+    return {
+        "asin": matrix.asins,
+        "market": matrix.markets,
+        "latest_rank": latest,
+        "velocity": velocity.astype(np.float32),
+        "ma_short": ma_short,
+        "ma_long": ma_long,
+        "streak": current,
+        "longest_streak": longest,
+        "days_on_chart": days_on_chart,
+        "spread": spread,
+        "markets": market_count,
+        "breakout": breakout.astype(np.float32),
+    }
+
+def load_matrix(conn, chart, days=ANALYTICS_DAYS, today=None):
+    """从历史库读取某个榜单截至 today（默认为库里最新一天）的 days 天快照并构建名次矩阵"""
+    if today is None:
+        latest = conn.execute("SELECT MAX(date) FROM snapshots WHERE chart = ?", (chart,)).fetchone()[0]
+        if latest is None:
+            return None
+        today = date.fromisoformat(latest)
+    since = today - timedelta(days=days - 1)
+    rows = conn.execute(
+        "SELECT asin, market, date, rank FROM snapshots "
+        "WHERE chart = ? AND date >= ? AND date <= ? AND rank IS NOT NULL",
+        (chart, since.isoformat(), today.isoformat())
+    ).fetchall()
+    if not rows:
+        return None
+    asins, markets, dates, ranks = zip(*rows)
+    return RankMatrix.from_arrays(asins, markets, dates, ranks, start=since, end=today)
+
+def breakout_signals(path=HISTORY_DB, charts=("movers_shakers", "best_sellers"), days=ANALYTICS_DAYS, today=None):
+    """计算各榜单的爆发分，返回 {(asin, market, chart): 分数}，供排序加权使用
+
+    在抓取前调用，以库里最新一天为准，本轮新抓的数据不参与
+    """
+    if not os.path.exists(path):
+        return {}
+    conn = connect(path)
+    try:
+        signals = {}
+        for chart in charts:
+            matrix = load_matrix(conn, chart, days, today)
+            if matrix is None:
+                continue
+            trends = compute_trends(matrix)
+            for asin, market, score in zip(trends["asin"].tolist(), trends["market"].tolist(),
+                                           trends["breakout"].tolist()):
+                if score:
+                    signals[(asin, market, chart)] = round(score, 4)
+        return signals
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="商品趋势分析")
+    parser.add_argument("--db", default=HISTORY_DB, help="历史库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    breakouts = sub.add_parser("breakouts", help="爆发分最高的商品")
+    breakouts.add_argument("--chart", default="movers_shakers", choices=["movers_shakers", "best_sellers"])
+    breakouts.add_argument("--days", type=int, default=ANALYTICS_DAYS)
+    breakouts.add_argument("--market", help="只看某个市场")
+    breakouts.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+    conn = connect(args.db)
+    try:
+        matrix = load_matrix(conn, args.chart, args.days)
+    finally:
+        conn.close()
+    if matrix is None:
+        print("历史库里没有这个榜单的数据")
+        return
+
+    trends = compute_trends(matrix)
+    order = np.argsort(-trends["breakout"], kind="stable")
+    if args.market:
+        order = order[trends["market"][order] == args.market]
+    print(f"{'ASIN':<12} {'市场':<5} {'名次':>4} {'速度':>6} {'7日均':>6} {'28日均':>6} {'连续':>4} {'市场数':>4} {'爆发分':>6}")
+    for i in order[:args.limit]:
+        print(
+            f"{trends['asin'][i]:<12} {trends['market'][i]:<6} {trends['latest_rank'][i]:>5.0f} "
+            f"{trends['velocity'][i]:>7.2f} {trends['ma_short'][i]:>7.1f} {trends['ma_long'][i]:>7.1f} "
+            f"{trends['streak'][i]:>5} {trends['markets'][i]:>5} {trends['breakout'][i]:>7.3f}"
+        )
+
+if __name__ == "__main__":
+    main()
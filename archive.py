@@ -0,0 +1,305 @@
+"""
+报告归档
+每次写出当日报告后登记进 <报告目录>/manifest.json，为本次新写出或内容变化的文件生成预压缩副本（.gz / .br），
+再按清单重写归档首页 index.html。超过保留天数的日报按 ISO 周合并成周汇总报告，原日报及其副本随之删除。
+清单记录每个文件的内容哈希和每天的 TOP 选品，每次只处理变化的文件和受影响的周，不扫描整个报告目录
+
+brotli 为可选依赖，未安装时只生成 .gz
+"""
+
+import gzip
+import hashlib
+import html
+import json
+import os
+import re
+from datetime import date, timedelta
+
+from render import get_template, publish_asset, publish_css, sidecar_path, write_report
+
+# 日报保留天数，更早的日报合并进周汇总后删除（0 表示不合并）
+ARCHIVE_KEEP_DAYS = int(os.environ.get("ARCHIVE_KEEP_DAYS", "30"))
+
+# 预压缩格式，逗号分隔（gz、br），留空则不生成
+ARCHIVE_COMPRESS = [fmt.strip() for fmt in os.environ.get("ARCHIVE_COMPRESS", "gz,br").split(",") if fmt.strip()]
+
+# 清单和归档首页的文件名（位于报告目录下）
+MANIFEST_NAME = "manifest.json"
+INDEX_NAME = "index.html"
+
+# 清单格式版本，字段不兼容地变化时递增
+MANIFEST_VERSION = 1
+
+# 清单中每天保留的 TOP 选品数（周汇总据此生成）
+ARCHIVE_TOP_N = 10
+
+# 清单中每个选品保留的字段
+PICK_FIELDS = ("asin", "name", "market", "market_key", "flag", "chart", "source", "growth", "price", "score")
+
+_DAILY_RE = re.compile(r"^hot_products_(\d{4})(\d{2})(\d{2})\.html$")
+
+_warned_brotli = False
+
+def compress_file(path, formats=ARCHIVE_COMPRESS):
+    """在 path 旁写出 .gz / .br 副本，返回实际生成的格式；gzip 不写时间戳，内容不变时副本也不变"""
+    global _warned_brotli
+    with open(path, "rb") as f:
+        content = f.read()
+    written = []
+    for fmt in formats:
+        if fmt == "gz":
+            data = gzip.compress(content, compresslevel=9, mtime=0)
+        elif fmt == "br":
+            try:
+                import brotli
+            except ImportError:
+                if not _warned_brotli:
+                    print("⚠️ 未安装 brotli，跳过 .br 预压缩（pip install brotli）")
+                    _warned_brotli = True
+                continue
+            data = brotli.compress(content, quality=11)
+        else:
+            continue
+        tmp_path = f"{path}.{fmt}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, f"{path}.{fmt}")
+        written.append(fmt)
+    return written
+
+def remove_with_copies(path):
+    """删除文件及其预压缩副本"""
+    for target in (path, f"{path}.gz", f"{path}.br"):
+        if os.path.exists(target):
+            os.remove(target)
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+def pick_summary(product):
+    """清单里保存的选品字段"""
+    return {field: product.get(field) for field in PICK_FIELDS}
+
+def parse_report_picks(path):
+    """从已有的日报 HTML 里读出 TOP 选品（首次建立清单时用于登记旧报告）"""
+    from lxml import html as lxml_html
+
+    def text(card, selector, prefix=""):
+        found = card.cssselect(selector)
+        value = found[0].text_content().strip() if found else ""
+        return value[len(prefix):].strip() if prefix and value.startswith(prefix) else value
+
+    with open(path, "rb") as f:
+        tree = lxml_html.fromstring(f.read())
+    picks = []
+    for card in tree.cssselect(".product-card")[:ARCHIVE_TOP_N]:
+        flag, _, market = text(card, ".product-market").partition(" ")
+        picks.append(pick_summary({
+            "name": text(card, ".product-name"),
+            "market": market,
+            "flag": flag,
+            "growth": text(card, ".metric.growth", "📈"),
+            "price": text(card, ".metric.price", "💰"),
+            "source": text(card, ".metric.hot", "🔥"),
+        }))
+    return picks
+
+def weekly_picks(days, n=ARCHIVE_TOP_N):
+    """合并一周内每天的 TOP 选品：上榜天数多的在前，天数相同时比当周最好名次"""
+    merged = {}
+    for day in sorted(days):
+        for position, pick in enumerate(days[day]):
+            key = pick.get("asin") or pick["name"]
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = dict(pick, days=0, best=position)
+            entry["days"] += 1
+            entry["best"] = min(entry["best"], position)
+    picks = sorted(merged.values(), key=lambda pick: (-pick["days"], pick["best"]))[:n]
+    for pick in picks:
+        pick["source"] = f"{pick.get('source') or ''} · 本周上榜 {pick['days']} 天"
+        # 增长条按上榜天数显示
+        pick["score"] = pick["days"]
+    return picks
+
+def week_key(day):
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+class ReportArchive:
+    """报告目录的归档清单
+
+    用法：
+        archive = ReportArchive("reports")
+        archive.add_daily("2024-05-01", "reports/hot_products_20240501.html", top, timestamp)
+        archive.sync("reports/latest.html")
+        archive.roll_up(date(2024, 5, 1))
+        archive.write_index()
+        archive.save()
+    """
+
+    def __init__(self, report_dir):
+        self.report_dir = report_dir
+        self.path = os.path.join(report_dir, MANIFEST_NAME)
+        self.manifest = {"version": MANIFEST_VERSION, "files": {}, "days": {}, "weeks": {}}
+        self.changed = False
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+                if manifest.get("version") == MANIFEST_VERSION:
+                    self.manifest = manifest
+                    return
+                print(f"⚠️ 归档清单版本 {manifest.get('version')} 不受支持，重新建立")
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ 读取归档清单失败，重新建立: {e}")
+        self.bootstrap()
+
+    def bootstrap(self):
+        """没有清单时扫描一次报告目录，登记已有的日报"""
+        if not os.path.isdir(self.report_dir):
+            return
+        for name in sorted(os.listdir(self.report_dir)):
+            match = _DAILY_RE.match(name)
+            if not match:
+                continue
+            day = "-".join(match.groups())
+            path = os.path.join(self.report_dir, name)
+            try:
+                picks = parse_report_picks(path)
+            except Exception as e:
+                print(f"⚠️ 读取旧报告 {name} 失败: {e}")
+                picks = []
+            self.manifest["days"][day] = {"file": name, "timestamp": day, "top": picks}
+            self.sync(path)
+        self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.changed = False
+
+    def sync(self, path):
+        """登记文件的内容哈希；新文件或内容变化时重新生成预压缩副本，返回是否有变化"""
+        name = os.path.relpath(path, self.report_dir).replace(os.sep, "/")
+        digest = _file_hash(path)
+        entry = self.manifest["files"].get(name)
+        if entry and entry["hash"] == digest and all(os.path.exists(f"{path}.{fmt}") for fmt in entry["compressed"]):
+            return False
+        self.manifest["files"][name] = {
+            "hash": digest,
+            "bytes": os.path.getsize(path),
+            "compressed": compress_file(path),
+        }
+        self.changed = True
+        return True
+
+    def forget(self, path):
+        """删除文件及副本，并从清单中移除"""
+        remove_with_copies(path)
+        name = os.path.relpath(path, self.report_dir).replace(os.sep, "/")
+        if self.manifest["files"].pop(name, None) is not None:
+            self.changed = True
+
+    def add_daily(self, day, path, top, timestamp):
+        """登记（或更新）当日报告及其旁路商品目录"""
+        data_path = sidecar_path(path)
+        entry = {
+            "file": os.path.basename(path),
+            "data": os.path.basename(data_path) if os.path.exists(data_path) else None,
+            "timestamp": timestamp,
+            "top": [pick_summary(product) for product in top[:ARCHIVE_TOP_N]],
+        }
+        if self.manifest["days"].get(day) != entry:
+            self.manifest["days"][day] = entry
+            self.changed = True
+        self.sync(path)
+        if os.path.exists(data_path):
+            self.sync(data_path)
+        else:
+            self.forget(data_path)
+
+    def roll_up(self, today, keep_days=ARCHIVE_KEEP_DAYS):
+        """把 today - keep_days 之前的日报并入所在 ISO 周的汇总报告，删除原日报；返回更新的周"""
+        if keep_days <= 0:
+            return []
+        cutoff = (today - timedelta(days=keep_days)).isoformat()
+        expired = sorted(day for day in self.manifest["days"] if day < cutoff)
+        touched = set()
+        for day in expired:
+            entry = self.manifest["days"].pop(day)
+            key = week_key(date.fromisoformat(day))
+            week = self.manifest["weeks"].setdefault(key, {"file": f"weekly_{key.replace('-', '')}.html", "days": {}})
+            week["days"][day] = entry["top"]
+            for name in (entry["file"], entry.get("data")):
+                if name:
+                    self.forget(os.path.join(self.report_dir, name))
+            touched.add(key)
+        for key in sorted(touched):
+            self.write_week(key)
+        if touched:
+            self.changed = True
+            print(f"🗄️ {len(expired)} 份日报已合并进周汇总: {', '.join(sorted(touched))}")
+        return sorted(touched)
+
+    def write_week(self, key):
+        week = self.manifest["weeks"][key]
+        days = sorted(week["days"])
+        picks = weekly_picks(week["days"])
+        path = os.path.join(self.report_dir, week["file"])
+        markets = {pick.get("market") for pick in picks}
+        write_report(picks, f"{days[0]} ~ {days[-1]} 周汇总（{len(days)} 天）", path, len(markets))
+        self.sync(path)
+
+    def write_index(self):
+        """按清单重写归档首页（只读清单，不扫描目录）"""
+        def summary(top):
+            return " · ".join(f"{pick.get('flag') or ''} {pick['name']}".strip() for pick in top[:3])
+
+        days = [
+            f'<li><a href="{html.escape(entry["file"])}">{day}</a>'
+            f'<span class="archive-top">{html.escape(summary(entry["top"]))}</span></li>'
+            for day, entry in sorted(self.manifest["days"].items(), reverse=True)
+        ]
+        weeks = [
+            f'<li><a href="{html.escape(week["file"])}">{key}</a>'
+            f'<span class="archive-top">{min(week["days"])} ~ {max(week["days"])}，{len(week["days"])} 天</span></li>'
+            for key, week in sorted(self.manifest["weeks"].items(), reverse=True)
+        ]
+        path = os.path.join(self.report_dir, INDEX_NAME)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            get_template("archive.html").render_to(f.write, {
+                "css_href": publish_css(self.report_dir),
+                "day_count": len(days),
+                "week_count": len(weeks),
+                "days": "\n".join(days) or '<li class="archive-empty">暂无</li>',
+                "weeks": "\n".join(weeks) or '<li class="archive-empty">暂无</li>',
+            })
+        os.replace(tmp_path, path)
+        self.sync(path)
+
+def archive_report(path, run_date, top, timestamp, latest_path=None):
+    """归档阶段：登记当日报告，预压缩变化的文件，合并过期日报并更新归档首页"""
+    report_dir = os.path.dirname(path) or "."
+    archive = ReportArchive(report_dir)
+    archive.add_daily(run_date, path, top, timestamp)
+    if latest_path:
+        archive.sync(latest_path)
+    for asset in ("report.css", "report.js"):
+        archive.sync(os.path.join(report_dir, publish_asset(report_dir, asset)))
+    archive.roll_up(date.fromisoformat(run_date))
+    archive.write_index()
+    archive.save()
+    return archive
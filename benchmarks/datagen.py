@@ -0,0 +1,82 @@
+"""
+基准测试用的合成数据
+按固定随机种子生成商品名、增长率和各地区格式的价格，保证每次运行输入一致
+"""
+
+import random
+
+# 商品名词汇，覆盖 categories.json 里的各个类目
+BRANDS = ["Anker", "Stanley", "Owala", "COSRX", "Amazon Basics", "Soundcore", "Bose", "Ninja", "Medicube", "Dove"]
+NOUNS = [
+    "Wireless Earbuds", "Bluetooth Headphones", "Kitchen Scale", "Cooking Thermometer",
+    "Hand Soap Refill", "Cleaning Wipes", "Toner Pads", "Skincare Serum",
+    "Adjustable Dumbbell", "Fitness Tracker", "Water Bottle", "Tumbler Cup",
+    "Phone Case", "Screen Protector", "Laptop Cover", "Desk Lamp", "USB-C Cable",
+    "Throw Pillow", "Notebook Set", "Pet Brush",
+]
+ADJECTIVES = ["Pro", "Max", "Mini", "Ultra", "2-Pack", "Stainless Steel", "Portable", "Rechargeable", "Waterproof", "Eco"]
+
+MARKETS = {
+    "usa": {"name": "美国", "flag": "🇺🇸", "price": lambda v: f"${v:,.2f}"},
+    "uk": {"name": "英国", "flag": "🇬🇧", "price": lambda v: f"£{v:,.2f}"},
+    "de": {"name": "德国", "flag": "🇩🇪", "price": lambda v: f"{v:,.2f} €".replace(",", "X").replace(".", ",").replace("X", ".")},
+}
+
+CHARTS = {"movers_shakers": "Movers & Shakers", "best_sellers": "Best Sellers"}
+
+def make_name(rng):
+    return f"{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}, {rng.randint(1, 64)} Count"
+
+def make_asin(rng):
+    return "B0" + "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789") for _ in range(8))
+
+def make_growth(rng):
+    """约四分之一为新进榜，其余为带千分位的百分比"""
+    if rng.random() < 0.25:
+        return None
+    return f"+{rng.randint(10, 5000):,}%"
+
+def make_products(n, seed=0):
+    """生成 n 个与 cards_to_products 输出结构相同的商品字典"""
+    rng = random.Random(seed)
+    market_keys = list(MARKETS)
+    chart_keys = list(CHARTS)
+    products = []
+    for i in range(n):
+        market_key = market_keys[i % len(market_keys)]
+        chart_key = chart_keys[(i // len(market_keys)) % len(chart_keys)]
+        market = MARKETS[market_key]
+        rank = i % 100 + 1
+        if chart_key == "movers_shakers":
+            growth = make_growth(rng) or "新进榜"
+        else:
+            growth = f"#{rank} 热销"
+        products.append({
+            "name": make_name(rng)[:80],
+            "price": market["price"](rng.uniform(5, 300)),
+            "growth": growth,
+            "rank": rank,
+            "rating": f"{rng.uniform(3, 5):.1f} out of 5 stars",
+            "asin": make_asin(rng),
+            "link": "",
+            "market": market["name"],
+            "market_key": market_key,
+            "flag": market["flag"],
+            "chart": chart_key,
+            "source": CHARTS[chart_key],
+        })
+    return products
+
+def make_rank_matrix(n, days=365, seed=0):
+    """生成 n 行（ASIN×市场）× days 天的名次矩阵：名次随机游走，约三成的天不在榜"""
+    import numpy as np
+
+    from analytics import RankMatrix
+
+    rng = np.random.default_rng(seed)
+    steps = rng.integers(-6, 7, size=(n, days)).astype(np.float32)
+    ranks = np.clip(rng.integers(1, 101, size=(n, 1)) + np.cumsum(steps, axis=1), 1, 100)
+    ranks[rng.random((n, days)) < 0.3] = np.nan
+    market_keys = np.array(sorted(MARKETS))
+    asins = np.char.add("B0", (np.arange(n) // len(market_keys)).astype("U8"))
+    return RankMatrix(ranks, asins, market_keys[np.arange(n) % len(market_keys)], np.datetime64("2026-01-01"))
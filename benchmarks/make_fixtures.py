@@ -0,0 +1,166 @@
+"""
+生成基准测试用的榜单页面
+按 Amazon 榜单页的结构（#gridItemRoot 卡片、zg-bdg-text 名次徽章、a-offscreen 价格等）
+为 DATA_SOURCES 里每个市场的 Movers & Shakers 和 Best Sellers 各生成一页 100 个商品，
+并为首页左侧导航里的每个子类目生成一页 20 个商品的末级类目页（没有再往下的导航，供 CRAWL_DEPTH=1 离线爬取），
+保存到 benchmarks/fixtures/pages/<域名>/<路径>/index.html，供 standin_server.py 提供服务
+
+每张卡片前带 <!--standin-card--> 标记，替身服务器据此模拟懒加载
+
+用法：
+    python -m benchmarks.make_fixtures
+"""
+
+import html
+import json
+import os
+import random
+from urllib.parse import urlsplit
+
+from benchmarks.datagen import MARKETS, make_asin, make_growth, make_name
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pages")
+
+# 与 scraper.DATA_SOURCES 一致（这里不导入 scraper，避免依赖 Playwright）
+SOURCE_URLS = {
+    "usa": {
+        "movers_shakers": "https://www.amazon.com/gp/movers-and-shakers/",
+        "best_sellers": "https://www.amazon.com/Best-Sellers/zgbs/",
+    },
+    "uk": {
+        "movers_shakers": "https://www.amazon.co.uk/gp/movers-and-shakers/",
+        "best_sellers": "https://www.amazon.co.uk/Best-Sellers/zgbs/",
+    },
+    "de": {
+        "movers_shakers": "https://www.amazon.de/gp/movers-and-shakers/",
+        "best_sellers": "https://www.amazon.de/Best-Sellers/zgbs/",
+    },
+}
+
+DEPARTMENTS = ["Electronics", "Kitchen", "Beauty", "Sports", "Home", "Pet Supplies", "Office Products", "Toys"]
+
+ITEMS_PER_PAGE = 100
+SUBCATEGORY_ITEMS = 20
+
+PAGE_TEMPLATE = """<!doctype html>
+<html lang="en-us">
+<head>
+<meta charset="utf-8">
+<title>Amazon.com {title}</title>
+<link rel="stylesheet" href="https://m.media-amazon.com/images/I/zg-grid.css">
+<script>var ue_t0 = +new Date(); window.P = {{ register: function() {{}} }};</script>
+</head>
+<body>
+<div id="a-page">
+<div id="zg-left-col">
+<div role="group" class="_p13n-zg-nav-tree-all_style_zg-browse-group__88fbz">
+<div class="_p13n-zg-nav-tree-all_style_zg-browse-item__1rdKf">Any Department</div>
+{nav}
+</div>
+</div>
+<div id="zg-right-col">
+<h1 class="a-size-large a-spacing-medium a-text-bold">{title}</h1>
+<div class="p13n-gridRow _cDEzb_grid-row_3Cywl" data-standin-grid>
+{cards}<!--/standin-grid-->
+</div>
+</div>
+</div>
+<script type="application/json" id="p13n-zg-state">{state}</script>
+</body>
+</html>
+"""
+
+CARD_TEMPLATE = """<!--standin-card--><div id="gridItemRoot" class="a-column a-span12 a-text-center _cDEzb_grid-column_2hIsc">
+<div class="zg-grid-general-faceout">
+<div data-asin="{asin}" class="p13n-sc-uncoverable-faceout" id="{asin}">
+<div class="a-section zg-bdg-ctr"><span class="zg-bdg-text">#{rank}</span></div>
+<a class="a-link-normal aok-block" tabindex="-1" href="/{slug}/dp/{asin}/ref={ref}_{rank}"><div class="a-section a-spacing-mini _cDEzb_noop_3Xbw5"><img alt="{name}" src="https://m.media-amazon.com/images/I/{asin}._AC_UL300_SR300,200_.jpg" class="a-dynamic-image p13n-sc-dynamic-image p13n-product-image" height="200" width="200"></div></a>
+<a class="a-link-normal aok-block" href="/{slug}/dp/{asin}/ref={ref}_{rank}"><span><div class="_cDEzb_p13n-sc-css-line-clamp-1_1Fn1y">{name}</div></span></a>
+<div class="a-row"><a class="a-link-normal" title="{rating}" href="/product-reviews/{asin}/"><i class="a-icon a-icon-star-small a-star-small-4-5 aok-align-top"><span class="a-icon-alt">{rating}</span></i><span class="a-size-small">{reviews}</span></a></div>
+{growth}<div class="a-row"><a class="a-link-normal a-text-normal" href="/{slug}/dp/{asin}/ref={ref}_{rank}"><span class="a-size-base a-color-price"><span class="a-price"><span class="a-offscreen">{price}</span><span aria-hidden="true" class="_cDEzb_p13n-sc-price_3mJ9Z">{price}</span></span></span></a></div>
+</div>
+</div>
+</div>
+"""
+
+GROWTH_TEMPLATE = '<div class="a-row"><span class="a-size-small a-color-success">{growth}</span><span class="a-size-small a-color-secondary"> Sales rank: {rank} (previously {previous})</span></div>\n'
+
+def department_slug(dept):
+    return dept.lower().replace(" ", "-")
+
+def build_page(market_key, chart_key, seed, dept=None):
+    """生成一页榜单 HTML；给了 dept 时生成该子类目的末级页面"""
+    rng = random.Random(seed)
+    market = MARKETS[market_key]
+    base_path = urlsplit(SOURCE_URLS[market_key][chart_key]).path
+    title = "Movers & Shakers" if chart_key == "movers_shakers" else "Best Sellers"
+    ref = "zg_bsms_c" if chart_key == "movers_shakers" else "zg_bs_c"
+    if dept:
+        title = f"{title} in {dept}"
+
+    cards = []
+    state = []
+    for rank in range(1, (SUBCATEGORY_ITEMS if dept else ITEMS_PER_PAGE) + 1):
+        asin = make_asin(rng)
+        name = make_name(rng)
+        growth = ""
+        if chart_key == "movers_shakers":
+            pct = make_growth(rng)
+            if pct:
+                growth = GROWTH_TEMPLATE.format(growth=pct, rank=rank, previous=rank * rng.randint(2, 40))
+        cards.append(CARD_TEMPLATE.format(
+            asin=asin,
+            rank=rank,
+            name=html.escape(name),
+            slug=name.split(",")[0].replace(" ", "-"),
+            ref=ref,
+            rating=f"{rng.uniform(3.5, 5):.1f} out of 5 stars",
+            reviews=f"{rng.randint(10, 90000):,}",
+            growth=growth,
+            price=html.escape(market["price"](rng.uniform(5, 300))),
+        ))
+        state.append({"id": asin, "metadataMap": {"render.zg.rank": str(rank)}, "linkParameters": {}})
+
+    if dept:
+        # 末级类目页只列出自身，没有更深的子类目链接
+        nav = f'<div class="_p13n-zg-nav-tree-all_style_zg-browse-item__1rdKf">{dept}</div>'
+    else:
+        nav = "\n".join(
+            f'<div class="_p13n-zg-nav-tree-all_style_zg-browse-item__1rdKf">'
+            f'<a href="{base_path}{department_slug(name)}/ref={ref}_nav_0">{name}</a></div>'
+            for name in DEPARTMENTS
+        )
+    # 真实页面里内嵌的状态 JSON 体积不小，这里按同样规模填充，让解析耗时更接近实际
+    return PAGE_TEMPLATE.format(
+        title=title,
+        nav=nav,
+        cards="".join(cards),
+        state=json.dumps({"gridItems": state * 4}),
+    )
+
+def write_page(directory, content):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "index.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    print(f"📄 {path}")
+
+def main():
+    seed = 0
+    for market_key, charts in SOURCE_URLS.items():
+        for chart_key, url in charts.items():
+            parts = urlsplit(url)
+            directory = os.path.join(FIXTURE_DIR, parts.netloc, parts.path.strip("/"))
+            write_page(directory, build_page(market_key, chart_key, seed))
+            seed += 1
+    # 子类目页的种子接在首页之后，首页内容不受影响
+    for market_key, charts in SOURCE_URLS.items():
+        for chart_key, url in charts.items():
+            parts = urlsplit(url)
+            for dept in DEPARTMENTS:
+                directory = os.path.join(FIXTURE_DIR, parts.netloc, parts.path.strip("/"), department_slug(dept))
+                write_page(directory, build_page(market_key, chart_key, seed, dept))
+                seed += 1
+
+if __name__ == "__main__":
+    main()
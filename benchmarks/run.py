@@ -0,0 +1,303 @@
+"""
+离线基准测试
+在本地替身服务器上跑完整流程，并分别测量单页提取、类目分类、排序和报告渲染，
+趋势分析（trends）在 n 行 × 365 天的名次矩阵上测量，需要 NumPy；
+结果写入 benchmarks/results/<commit>.json，可用 --compare 对比两次提交
+
+用法：
+    python -m benchmarks.run                       # 全部基准，规模 10 ~ 100k
+    python -m benchmarks.run --sizes 10,1000 --only classify,ranking
+    python -m benchmarks.run --browser             # 额外跑浏览器通道（需已安装 Chromium）
+    python -m benchmarks.run --compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.datagen import make_products
+from benchmarks.make_fixtures import FIXTURE_DIR, SOURCE_URLS
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+
+# 各基准的重复次数（端到端运行较慢，次数少一些）
+REPEATS = 5
+E2E_REPEATS = 3
+
+BENCHMARKS = ["e2e", "extract", "classify", "ranking", "report", "render_cards", "catalog", "dedup", "trends"]
+
+def git_commit():
+    """返回当前提交的短 SHA，以及工作区是否有未提交改动"""
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return sha, dirty
+
+def summarize(runs):
+    return {
+        "runs": [round(r, 6) for r in runs],
+        "min": round(min(runs), 6),
+        "median": round(statistics.median(runs), 6),
+        "mean": round(statistics.mean(runs), 6),
+    }
+
+def timed(func, repeats, setup=None):
+    """重复执行 func，返回每次耗时（秒）；setup 的返回值作为参数传给 func，不计入耗时"""
+    runs = []
+    for _ in range(repeats):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        if setup:
+            func(arg)
+        else:
+            func()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+def fresh_copies(products):
+    """复制商品字典，去掉分类和打分缓存，保证每次都从头计算"""
+    return lambda: [dict(p) for p in products]
+
+def bench_e2e(results, repeats, browser):
+    """在替身服务器上以子进程运行 scraper.py，统计总耗时和各阶段耗时"""
+    from standin_server import start_server
+
+    variants = [("http", {"latency_ms": 150}, {"FETCH_BACKEND": "http"})]
+    if browser:
+        # 浏览器通道跑懒加载页面：首屏 30 个，其余滚动后分批出现
+        variants.append(("browser_lazy", {"latency_ms": 150, "lazy_initial": 30}, {"FETCH_BACKEND": "browser"}))
+
+    for name, server_options, env_overrides in variants:
+        server, base_url = start_server(FIXTURE_DIR, **server_options)
+        runs = []
+        stages = {}
+        products = None
+        try:
+            for _ in range(repeats):
+                with tempfile.TemporaryDirectory() as workdir:
+                    metrics_path = os.path.join(workdir, "metrics.json")
+                    env = dict(os.environ)
+                    env.update({
+                        "AMAZON_STANDIN_URL": base_url,
+                        "PYTHONPATH": REPO_DIR,
+                        "METRICS_JSON": metrics_path,
+                        "METRICS_PROM": "",
+                        "FEISHU_WEBHOOK": "",
+                        "FEISHU_TARGETS": "",
+                        "CRAWL_DEPTH": "0",
+                        **env_overrides,
+                    })
+                    start = time.perf_counter()
+                    completed = subprocess.run(
+                        [sys.executable, os.path.join(REPO_DIR, "scraper.py")],
+                        cwd=workdir, env=env, capture_output=True, text=True,
+                    )
+                    runs.append(time.perf_counter() - start)
+                    if completed.returncode != 0:
+                        raise RuntimeError(f"scraper.py 退出码 {completed.returncode}:\n{completed.stderr[-2000:]}")
+                    with open(metrics_path, encoding="utf-8") as f:
+                        run_metrics = json.load(f)
+                    for stage in run_metrics["stages"]:
+                        stages.setdefault(stage["stage"], []).append(stage["seconds"])
+                    products = sum(
+                        c["value"] for c in run_metrics["counters"] if c["name"] == "items_kept_total"
+                    )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        # 同一阶段在一次运行中的多个标签组合先求和，再按运行取中位数
+        per_run = len(runs)
+        stage_summary = {}
+        for stage, values in stages.items():
+            total = sum(values) / per_run
+            stage_summary[stage] = round(total, 6)
+        results[f"e2e_{name}"] = {
+            **summarize(runs),
+            "products": products,
+            "stage_seconds_mean": stage_summary,
+        }
+        print(f"  e2e_{name}: 中位数 {results[f'e2e_{name}']['median']:.3f}s，{products} 个商品")
+
+def bench_extract(results, repeats):
+    """用 lxml 解析每个榜单页面（HTTP 通道的提取路径）"""
+    from extractor import MAX_ITEMS_PER_CHART, parse_cards_html
+
+    for market_key, charts in SOURCE_URLS.items():
+        for chart_key, url in charts.items():
+            path = os.path.join(FIXTURE_DIR, *url.split("://", 1)[1].strip("/").split("/"), "index.html")
+            with open(path, encoding="utf-8") as f:
+                html = f.read()
+            count = len(parse_cards_html(html, chart_key, url, MAX_ITEMS_PER_CHART))
+            runs = timed(lambda: parse_cards_html(html, chart_key, url, MAX_ITEMS_PER_CHART), repeats * 4)
+            key = f"extract[{market_key}/{chart_key}]"
+            results[key] = {**summarize(runs), "cards": count, "bytes": len(html.encode("utf-8"))}
+            print(f"  {key}: 中位数 {results[key]['median'] * 1000:.2f}ms，{count} 个卡片")
+
+def bench_sized(results, sizes, repeats, only):
+    """按商品规模测量分类、排序和报告渲染"""
+    from catalog import ProductCatalog, encode_catalog
+    from dedup import dedupe
+    from ranking import prepare_products, top_k
+    from render import render_report_string
+    from scraper import generate_html_report, generate_marketing_tips
+
+    timestamp = "2026-01-01 08:00"
+    for size in sizes:
+        base = make_products(size)
+
+        if "classify" in only:
+            def classify(products):
+                for product in products:
+                    generate_marketing_tips(product)
+            record(results, f"classify[n={size}]", timed(classify, repeats, fresh_copies(base)))
+
+        if "ranking" in only:
+            def rank(products):
+                prepare_products(products)
+                top_k(products, 10)
+            record(results, f"ranking[n={size}]", timed(rank, repeats, fresh_copies(base)))
+
+        # 渲染基准使用已打分的商品，只测量选 TOP 和写 HTML 的开销
+        scored = [dict(p) for p in base]
+        prepare_products(scored)
+
+        if "dedup" in only:
+            record(results, f"dedup[n={size}]", timed(lambda: dedupe(scored), repeats))
+
+        if "report" in only:
+            record(results, f"report[n={size}]", timed(lambda: generate_html_report(scored, timestamp), repeats))
+
+        if "catalog" in only:
+            # 报告附带的全量商品目录：逐个收集、排序编码成 JSON，并记下页面要下载的字节数
+            def build_catalog():
+                catalog = ProductCatalog()
+                for product in scored:
+                    catalog.add(product)
+                return encode_catalog(catalog.table())
+            key = f"catalog[n={size}]"
+            record(results, key, timed(build_catalog, repeats))
+            results[key]["bytes"] = len(build_catalog().encode("utf-8"))
+
+        if "render_cards" in only:
+            # 把全部商品渲染成卡片，衡量模板与分类在大列表上的开销
+            record(results, f"render_cards[n={size}]", timed(
+                lambda products: render_report_string(products, timestamp, "assets/report.css"),
+                repeats, fresh_copies(scored),
+            ))
+
+def bench_trends(results, sizes, repeats):
+    """按矩阵行数测量趋势指标和爆发分的计算"""
+    from analytics import compute_trends
+    from benchmarks.datagen import make_rank_matrix
+
+    for size in sizes:
+        matrix = make_rank_matrix(size)
+        record(results, f"trends[n={size}x{matrix.days}]", timed(lambda: compute_trends(matrix), repeats))
+
+def record(results, key, runs):
+    results[key] = summarize(runs)
+    print(f"  {key}: 中位数 {results[key]['median'] * 1000:.2f}ms")
+
+def run(args):
+    only = set(args.only.split(",")) if args.only else set(BENCHMARKS)
+    unknown = only - set(BENCHMARKS)
+    if unknown:
+        raise SystemExit(f"未知的基准: {', '.join(sorted(unknown))}（可选 {', '.join(BENCHMARKS)}）")
+    sizes = [int(s) for s in args.sizes.split(",")] if args.sizes else DEFAULT_SIZES
+
+    sha, dirty = git_commit()
+    print(f"🏁 基准测试：提交 {sha}{'（有未提交改动）' if dirty else ''}，Python {platform.python_version()}")
+
+    results = {}
+    # 报告渲染会在当前目录写 reports/assets，放到临时目录里
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            if "extract" in only:
+                bench_extract(results, args.repeat)
+            if only & {"classify", "ranking", "dedup", "report", "render_cards", "catalog"}:
+                bench_sized(results, sizes, args.repeat, only)
+            if "trends" in only:
+                bench_trends(results, sizes, args.repeat)
+            if "e2e" in only:
+                bench_e2e(results, args.e2e_repeat, args.browser)
+        finally:
+            os.chdir(cwd)
+
+    output = {
+        "commit": sha,
+        "dirty": dirty,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": sizes,
+        "benchmarks": results,
+    }
+    path = args.output or os.path.join(RESULTS_DIR, f"{sha}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f"📄 结果已写入: {path}")
+
+def compare(base_path, new_path):
+    """按中位数对比两次结果，比值小于 1 表示变快"""
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"📊 {base['commit']} → {new['commit']}（中位数，比值 < 1 表示变快）")
+    width = max((len(k) for k in {**base["benchmarks"], **new["benchmarks"]}), default=10)
+    for key, item in new["benchmarks"].items():
+        old = base["benchmarks"].get(key)
+        if not old:
+            print(f"  {key:<{width}}  {'-':>10}  {item['median'] * 1000:>10.2f}ms  （新增）")
+            continue
+        ratio = item["median"] / old["median"] if old["median"] else float("inf")
+        mark = "🟢" if ratio < 0.95 else "🔴" if ratio > 1.05 else "⚪"
+        print(
+            f"  {key:<{width}}  {old['median'] * 1000:>10.2f}ms  {item['median'] * 1000:>10.2f}ms  "
+            f"x{ratio:.2f} {mark}"
+        )
+    for key in base["benchmarks"]:
+        if key not in new["benchmarks"]:
+            print(f"  {key:<{width}}  （本次未运行）")
+
+def main():
+    parser = argparse.ArgumentParser(description="离线基准测试")
+    parser.add_argument("--sizes", help="商品规模，逗号分隔（默认 10,100,1000,10000,100000）")
+    parser.add_argument("--only", help=f"只运行部分基准，逗号分隔（{', '.join(BENCHMARKS)}）")
+    parser.add_argument("--repeat", type=int, default=REPEATS, help="每个基准的重复次数")
+    parser.add_argument("--e2e-repeat", type=int, default=E2E_REPEATS, help="端到端运行的重复次数")
+    parser.add_argument("--browser", action="store_true", help="端到端基准额外运行浏览器通道")
+    parser.add_argument("--output", help="结果文件路径（默认 benchmarks/results/<commit>.json）")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="对比两个结果文件")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run(args)
+
+if __name__ == "__main__":
+    main()
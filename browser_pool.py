@@ -0,0 +1,224 @@
+"""
+常驻浏览器池
+守护进程模式下复用同一个 Chromium，每个抓取会话（见 sessions.py）一个预热好的上下文；
+上下文用会话自己的指纹、代理和 storage state（cookies、localStorage），回收或保存时交回会话，由会话池写到磁盘；
+上下文服务满 N 个页面后回收重建，进程树内存增长超过阈值时整体重启浏览器
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+from http_fetch import USER_AGENT
+from metrics import metrics
+from resources import ResourcePolicy
+
+# 单个上下文最多服务的页面数，达到后回收重建
+BROWSER_CONTEXT_MAX_PAGES = int(os.environ.get("BROWSER_CONTEXT_MAX_PAGES", "50"))
+
+# 相对启动时的内存增长上限（MB），超过后重启浏览器（0 表示不检查）
+BROWSER_MAX_RSS_GROWTH_MB = int(os.environ.get("BROWSER_MAX_RSS_GROWTH_MB", "600"))
+
+def process_tree_rss_mb(root_pid=None):
+    """当前进程及其所有子进程（含 Chromium）的常驻内存合计（MB）；读不到 /proc 时返回 None"""
+    root_pid = root_pid or os.getpid()
+    try:
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        entries = [name for name in os.listdir("/proc") if name.isdigit()]
+    except (OSError, ValueError, AttributeError):
+        return None
+
+    children = {}
+    rss_pages = {}
+    for name in entries:
+        try:
+            with open(f"/proc/{name}/stat", encoding="utf-8") as f:
+                stat = f.read()
+        except OSError:
+            # 进程已退出
+            continue
+        # 进程名可能带空格，从最后一个 ")" 之后开始按空格切分
+        fields = stat[stat.rfind(")") + 2:].split()
+        pid = int(name)
+        children.setdefault(int(fields[1]), []).append(pid)
+        rss_pages[pid] = int(fields[21])
+
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss_pages.get(pid, 0)
+        stack.extend(children.get(pid, ()))
+    return total * page_size / 1024 / 1024
+
+class _ContextSlot:
+    """某个会话（不带会话时为某个市场）的上下文及其使用情况"""
+
+    def __init__(self, context, session=None):
+        self.context = context
+        self.session = session
+        self.pages_served = 0
+        self.active = 0
+        self.created = time.monotonic()
+
+class BrowserPool:
+    """按会话复用的常驻浏览器上下文池
+
+    接口与 scraper.LazyBrowser 一致：page(market_key, session) 借出一个页面，用完自动关闭；
+    finish_run() 在每轮抓取结束时调用，只上报统计、把上下文状态交回会话和按内存回收，浏览器保持运行；
+    close() 在进程退出前调用
+    """
+
+    def __init__(self, block_resources=True, max_pages=BROWSER_CONTEXT_MAX_PAGES,
+                 max_rss_growth_mb=BROWSER_MAX_RSS_GROWTH_MB):
+        self.block_resources = block_resources
+        self.max_pages = max(1, max_pages)
+        self.max_rss_growth_mb = max_rss_growth_mb
+        self.resource_policy = ResourcePolicy() if block_resources else None
+        self._playwright = None
+        self._browser = None
+        self._slots = {}
+        self._baseline_rss = None
+        self._launch_error = None
+        self._lock = asyncio.Lock()
+
+    async def _ensure_browser(self):
+        if self._browser is None or not self._browser.is_connected():
+            print("🌐 启动常驻 Chromium...")
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._slots = {}
+            metrics.count("browser_launches_total")
+
+    async def _new_context(self, session=None):
+        """创建上下文：带会话时用会话的指纹、代理和 storage state，否则是一个全新的上下文"""
+        options = session.context_options() if session else {"user_agent": USER_AGENT}
+        context = await self._browser.new_context(**options)
+        if self.resource_policy:
+            await self.resource_policy.install(context)
+        return _ContextSlot(context, session)
+
+    async def _save_state(self, key, slot):
+        """把上下文的 cookies 和 localStorage 交回会话（由会话池保存）；不带会话的上下文不保存"""
+        if slot.session is None:
+            return
+        try:
+            state = await slot.context.storage_state()
+        except Exception as e:
+            print(f"⚠️ 保存 {key} 会话状态失败: {e}")
+            return
+        slot.session.merge_storage_state(state)
+
+    async def _retire(self, key, slot):
+        """保存会话后关闭上下文"""
+        await self._save_state(key, slot)
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+
+    async def _acquire(self, market_key, session=None):
+        async with self._lock:
+            # 本轮已启动失败时不再反复尝试，下一轮 maintain() 后重试
+            if self._launch_error:
+                raise self._launch_error
+            try:
+                await self._ensure_browser()
+            except Exception as e:
+                self._launch_error = e
+                raise
+            # 已退役会话的上下文直接关闭（cookies 不再保留）
+            for key, retired in [(k, s) for k, s in self._slots.items() if s.session and s.session.retired and s.active == 0]:
+                del self._slots[key]
+                try:
+                    await retired.context.close()
+                except Exception:
+                    pass
+            key = session.id if session else market_key
+            slot = self._slots.get(key)
+            # 只在没有页面在用时回收，避免关掉正在抓取的页面
+            if slot and slot.pages_served >= self.max_pages and slot.active == 0:
+                print(f"♻️ {key} 上下文已服务 {slot.pages_served} 个页面，回收重建")
+                await self._retire(key, slot)
+                metrics.count("context_recycles_total", market=market_key, reason="pages")
+                slot = None
+            if slot is None:
+                slot = await self._new_context(session)
+                self._slots[key] = slot
+            slot.active += 1
+            slot.pages_served += 1
+            return slot
+
+    @asynccontextmanager
+    async def page(self, market_key="default", session=None):
+        """借出该市场（带会话时为该会话）上下文中的一个新页面"""
+        slot = await self._acquire(market_key, session)
+        try:
+            page = await slot.context.new_page()
+            try:
+                yield page
+            finally:
+                await page.close()
+        finally:
+            slot.active -= 1
+
+    async def maintain(self):
+        """两次运行之间调用：把各上下文状态交回会话，内存增长超限时重启浏览器"""
+        async with self._lock:
+            self._launch_error = None
+            for key, slot in self._slots.items():
+                await self._save_state(key, slot)
+
+            rss = process_tree_rss_mb()
+            if rss is None or self._browser is None:
+                return
+            # 以第一轮跑完（上下文都已预热）时的内存为基线
+            if self._baseline_rss is None:
+                self._baseline_rss = rss
+                print(f"🧠 浏览器进程树内存基线 {rss:.0f} MB")
+                return
+            growth = rss - self._baseline_rss
+            print(f"🧠 浏览器进程树内存 {rss:.0f} MB（较启动时 {growth:+.0f} MB）")
+            if self.max_rss_growth_mb and growth > self.max_rss_growth_mb and self._browser:
+                print(f"♻️ 内存增长超过 {self.max_rss_growth_mb} MB，重启浏览器")
+                metrics.count("context_recycles_total", market="all", reason="memory")
+                for key, slot in self._slots.items():
+                    await self._retire(key, slot)
+                self._slots = {}
+                await self._browser.close()
+                self._browser = None
+                self._baseline_rss = None
+
+    async def report_resources(self):
+        """打印并上报本轮的请求拦截统计，然后清零"""
+        if not self.resource_policy or self._browser is None:
+            return
+        await self.resource_policy.flush()
+        self.resource_policy.print_summary()
+        stats = self.resource_policy.summary()
+        for resource_type, count in stats["blocked_by_type"].items():
+            metrics.count("blocked_requests_total", count, type=resource_type)
+        metrics.count("loaded_bytes_total", stats["loaded_bytes"])
+        self.resource_policy.reset()
+
+    async def finish_run(self):
+        """一轮抓取结束：上报拦截统计，保存会话，必要时回收"""
+        await self.report_resources()
+        await self.maintain()
+
+    async def close(self):
+        """保存会话并关闭浏览器"""
+        async with self._lock:
+            for key, slot in self._slots.items():
+                await self._retire(key, slot)
+            self._slots = {}
+            if self._browser:
+                await self._browser.close()
+                self._browser = None
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
@@ -0,0 +1,132 @@
+"""
+报告里的全量商品目录
+商品流过时逐个压成紧凑的行：每行是数组而不是对象，市场、榜单、类目按字典编码成下标，
+有 ASIN 的商品不存链接（页面用市场域名拼出 /dp/ASIN）。整个目录序列化成一段 JSON：
+商品少时直接嵌进报告页面，多时写成旁路文件由页面按需加载，卡片在浏览器端按可见区域虚拟渲染
+"""
+
+import hashlib
+import json
+import os
+from urllib.parse import urlsplit
+
+from classifier import classify_product
+
+# 报告中的全量商品数据：auto（少量商品内嵌，否则写旁路文件）/ inline / sidecar / off（不附带）
+REPORT_DATA = os.environ.get("REPORT_DATA", "auto")
+
+# auto 模式下最多内嵌多少个商品，超过时改写旁路文件
+REPORT_INLINE_MAX = int(os.environ.get("REPORT_INLINE_MAX", "1000"))
+
+# 目录格式版本，与 templates/report.js 保持一致
+CATALOG_VERSION = 1
+
+# 每行的字段顺序
+CATALOG_FIELDS = (
+    "asin", "name", "market", "chart", "category", "rank",
+    "growth", "growth_pct", "price", "price_value", "score", "link",
+)
+
+class ProductCatalog:
+    """逐个收集商品，生成报告页面使用的紧凑目录
+
+    商品到达顺序随并发抓取而变，table() 按市场、榜单、名次排好序再编码，内容相同时输出也相同
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.markets = {}
+        self.charts = {}
+        self.categories = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, product):
+        market_key = product.get("market_key")
+        link = product.get("link") or ""
+        market = self.markets.get(market_key)
+        if market is None:
+            market = self.markets[market_key] = {
+                "key": market_key,
+                "name": product.get("market"),
+                "flag": product.get("flag"),
+                "origin": "",
+            }
+        if link and not market["origin"]:
+            parts = urlsplit(link)
+            market["origin"] = f"{parts.scheme}://{parts.netloc}"
+        chart_key = product.get("chart")
+        if chart_key not in self.charts:
+            self.charts[chart_key] = {"key": chart_key, "label": product.get("source")}
+        category = classify_product(product)
+        if category.key not in self.categories:
+            self.categories[category.key] = {
+                "key": category.key,
+                "name": category.name,
+                "icon": category.icon,
+                "tips": category.tips,
+            }
+        asin = product.get("asin") or ""
+        score = product.get("score")
+        self.rows.append([
+            asin,
+            product["name"],
+            market_key,
+            chart_key,
+            category.key,
+            product.get("rank"),
+            product["growth"],
+            product.get("growth_pct"),
+            product["price"],
+            product.get("price_value"),
+            round(score, 3) if score is not None else None,
+            link,
+        ])
+
+    def table(self):
+        """目录的 JSON 结构：市场、榜单、类目按 key 排序后编码成下标"""
+        codes = {}
+        entries = {}
+        for field, table in (("market", self.markets), ("chart", self.charts), ("category", self.categories)):
+            keys = sorted(table, key=str)
+            codes[field] = {key: index for index, key in enumerate(keys)}
+            entries[field] = [table[key] for key in keys]
+        origins = {key: market["origin"] for key, market in self.markets.items()}
+
+        rows = []
+        for asin, name, market_key, chart_key, category_key, rank, *rest, link in sorted(
+            self.rows, key=lambda row: (str(row[2]), str(row[3]), row[5] or 0, row[0], row[1])
+        ):
+            origin = origins[market_key]
+            rows.append([
+                asin, name,
+                codes["market"][market_key], codes["chart"][chart_key], codes["category"][category_key],
+                rank, *rest,
+                "" if asin and origin and link.startswith(origin) else link,
+            ])
+        return {
+            "version": CATALOG_VERSION,
+            "fields": list(CATALOG_FIELDS),
+            "markets": entries["market"],
+            "charts": entries["chart"],
+            "categories": entries["category"],
+            "rows": rows,
+        }
+
+def encode_catalog(table):
+    """紧凑 JSON 文本（无多余空白，中文不转义）"""
+    return json.dumps(table, ensure_ascii=False, separators=(",", ":"))
+
+def catalog_digest(table):
+    """目录内容的短哈希，用于变化检测和旁路文件的缓存失效"""
+    return hashlib.sha256(encode_catalog(table).encode("utf-8")).hexdigest()[:16]
+
+def data_mode(count, mode=REPORT_DATA):
+    """按商品数决定目录放在哪里：inline / sidecar / off"""
+    if mode not in ("auto", "inline", "sidecar", "off"):
+        print(f"⚠️ 未知的 REPORT_DATA={mode}，按 auto 处理")
+        mode = "auto"
+    if mode == "auto":
+        return "inline" if count <= REPORT_INLINE_MAX else "sidecar"
+    return mode
@@ -0,0 +1,130 @@
+"""
+内容变化检测
+商品流过时逐个累加各榜单的内容哈希，与最终 TOP 列表的哈希一起与上次运行保存的比较：
+榜单都没变且当天已写过历史库时不再写入，TOP 列表没变且当天已有报告时不重新渲染、不推送，
+并告诉工作流本次没有新报告；只有报告附带的全量商品目录变了时重新渲染但不推送
+"""
+
+import hashlib
+import json
+import os
+
+# 上次运行的哈希状态（随报告一起提交，工作流下次检出时可读到）
+CHANGE_STATE = os.environ.get("CHANGE_STATE", "data/change_state.json")
+
+# 设为 1 时无论是否变化都重新渲染和推送（例如改了模板之后）
+FORCE_REPORT = os.environ.get("FORCE_REPORT", "0") == "1"
+
+# 参与哈希的商品字段：榜单里会变、且会影响排序或报告内容的字段
+CHART_HASH_FIELDS = ("asin", "name", "price", "growth", "rank", "rating")
+TOP_HASH_FIELDS = ("asin", "name", "price", "growth", "market_key", "chart")
+
+def item_hash(product, fields):
+    """单个商品的 64 位内容哈希"""
+    data = json.dumps([product.get(f) for f in fields], ensure_ascii=False).encode("utf-8")
+    return int.from_bytes(hashlib.sha256(data).digest()[:8], "big")
+
+def content_hash(products, fields):
+    """按固定字段顺序计算商品列表的哈希（列表顺序参与计算）"""
+    digest = hashlib.sha256()
+    for product in products:
+        digest.update(json.dumps([product.get(f) for f in fields], ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()[:16]
+
+class ChangeTracker:
+    """记录每个榜单与 TOP 列表的内容哈希"""
+
+    def __init__(self, path=CHANGE_STATE):
+        self.path = path
+        self.state = {"charts": {}, "top": None, "history_date": None}
+        # 本轮各榜单的 (哈希累加值, 商品数)
+        self._running = {}
+        self.load()
+
+    def load(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self.state.update(json.load(f))
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ 读取变化检测状态失败，按全部变化处理: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def observe(self, key, product):
+        """累加一个流过的商品；累加与到达顺序无关，类目页先后完成不影响结果"""
+        total, count = self._running.get(key, (0, 0))
+        self._running[key] = ((total + item_hash(product, CHART_HASH_FIELDS)) % 2 ** 64, count + 1)
+
+    def finish_charts(self, keys):
+        """本轮商品流完后调用，返回 {榜单 key: 是否变化}，没有商品的榜单也参与比较"""
+        changed = {}
+        for key in keys:
+            total, count = self._running.pop(key, (0, 0))
+            new_hash = f"{total:016x}-{count}"
+            changed[key] = self.state["charts"].get(key) != new_hash
+            self.state["charts"][key] = new_hash
+        self._running = {}
+        return changed
+
+    @staticmethod
+    def _top_hash(top_products, notes):
+        digest = content_hash(top_products, TOP_HASH_FIELDS)
+        # 数据完整性提示变化（某个市场过期或恢复）也要重新生成报告
+        if notes:
+            digest += "-" + content_hash(notes, ("market_key", "text"))
+        return digest
+
+    def top_changed(self, top_products, run_date, notes=()):
+        """TOP 列表或数据完整性提示与上次渲染的不同，或当天还没有报告时返回 True"""
+        if FORCE_REPORT:
+            return True
+        top = self.state.get("top") or {}
+        return top.get("hash") != self._top_hash(top_products, notes) or top.get("date") != run_date
+
+    def catalog_changed(self, digest):
+        """报告附带的全量商品目录与上次渲染的不同时返回 True（不附带目录时为 False）"""
+        return bool(digest) and (self.state.get("top") or {}).get("catalog") != digest
+
+    def mark_rendered(self, top_products, run_date, path, notes=(), catalog_digest=None):
+        self.state["top"] = {
+            "hash": self._top_hash(top_products, notes),
+            "date": run_date,
+            "report": path,
+            "catalog": catalog_digest,
+        }
+
+    def history_needed(self, any_chart_changed, run_date):
+        """有榜单变化，或今天还没写过历史库时需要写入"""
+        return any_chart_changed or self.state.get("history_date") != run_date
+
+    def mark_history(self, run_date):
+        self.state["history_date"] = run_date
+
+_default_tracker = None
+
+def get_tracker():
+    """返回进程内共享的变化检测器（守护进程多轮之间不必重复读状态文件）"""
+    global _default_tracker
+    if _default_tracker is None:
+        _default_tracker = ChangeTracker(CHANGE_STATE)
+    return _default_tracker
+
+def write_github_output(**values):
+    """在 GitHub Actions 中把结果写到步骤输出，供后续步骤判断"""
+    path = os.environ.get("GITHUB_OUTPUT")
+    if not path:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        for name, value in values.items():
+            if isinstance(value, bool):
+                value = "true" if value else "false"
+            f.write(f"{name}={value}\n")
@@ -0,0 +1,124 @@
+"""
+商品类目分类器
+把 categories.json 里所有类目的关键词编译成一个前缀树正则，单次扫描商品名完成分类，
+得到的类目同时提供营销建议、图标和置信度
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+
+# 类目规则文件
+CATEGORY_RULES = os.environ.get(
+    "CATEGORY_RULES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "categories.json")
+)
+
+# 分类结果：类目 key、名称、图标、营销建议和置信度（0~1，默认类目为 0）
+Classification = namedtuple("Classification", "key name icon tips confidence")
+
+def _trie_pattern(words):
+    """把关键词列表编译成前缀树形式的正则，同一起点只需沿一条分支匹配"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # 当前节点本身是完整关键词时，后续部分可选（贪婪匹配优先取最长的关键词）
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+class CategoryClassifier:
+    """表驱动的单次扫描分类器
+
+    商品名中命中关键词最多的类目胜出，数量相同时按规则文件中的顺序优先
+    """
+
+    def __init__(self, categories, default):
+        self.categories = list(categories)
+        self.default = Classification(
+            default["key"], default["name"], default["icon"], default["tips"], 0.0
+        )
+        self.key_index = {c["key"]: index for index, c in enumerate(self.categories)}
+
+        # 关键词 -> 所属类目下标
+        self.keyword_categories = {}
+        for index, category in enumerate(self.categories):
+            for keyword in category["keywords"]:
+                self.keyword_categories.setdefault(keyword.lower(), []).append(index)
+
+        # 同一起点只会匹配到最长的关键词，这里预先记下它所包含的更短前缀关键词
+        keywords = list(self.keyword_categories)
+        self.prefix_keywords = {
+            kw: [kw[:end] for end in range(1, len(kw) + 1) if kw[:end] in self.keyword_categories]
+            for kw in keywords
+        }
+
+        # 零宽前瞻让每个字符位置都尝试一次，重叠的关键词也不会漏掉
+        self.pattern = re.compile(f"(?=({_trie_pattern(keywords)}))") if keywords else None
+
+    @classmethod
+    def from_file(cls, path=CATEGORY_RULES):
+        """从规则文件加载分类器"""
+        with open(path, encoding="utf-8") as f:
+            rules = json.load(f)
+        return cls(rules["categories"], rules["default"])
+
+    def classify(self, name):
+        """对商品名分类，返回 Classification"""
+        if self.pattern is None:
+            return self.default
+
+        hits = {}
+        for match in self.pattern.finditer(name.lower()):
+            for keyword in self.prefix_keywords[match.group(1)]:
+                for index in self.keyword_categories[keyword]:
+                    hits.setdefault(index, set()).add(keyword)
+
+        if not hits:
+            return self.default
+
+        best = min(hits, key=lambda index: (-len(hits[index]), index))
+        total = sum(len(found) for found in hits.values())
+        return self._result(best, len(hits[best]) / total)
+
+    def lookup(self, key, confidence):
+        """按类目 key 还原分类结果"""
+        if key not in self.key_index:
+            return self.default
+        return self._result(self.key_index[key], confidence)
+
+    def _result(self, index, confidence):
+        category = self.categories[index]
+        return Classification(
+            category["key"], category["name"], category["icon"], category["tips"], round(confidence, 3)
+        )
+
+_default_classifier = None
+
+def get_classifier():
+    """返回按 CATEGORY_RULES 加载的共享分类器"""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = CategoryClassifier.from_file(CATEGORY_RULES)
+    return _default_classifier
+
+def classify_product(product):
+    """对商品分类，结果以 category / category_confidence 字段缓存在商品字典上"""
+    classifier = get_classifier()
+    if "category" in product:
+        return classifier.lookup(product["category"], product.get("category_confidence", 0.0))
+
+    result = classifier.classify(product["name"])
+    product["category"] = result.key
+    product["category_confidence"] = result.confidence
+    return result
@@ -0,0 +1,309 @@
+"""
+类目树爬虫
+从各市场的榜单首页发现子类目榜单 URL，交给有上限的异步 worker 池抓取；
+按域名令牌桶限速，限制爬取深度，URL 去重；每个页面经抓取调度器（见 scheduler.py）请求，
+与榜单首页抓取共用总截止时间、按站点熔断和会话池。
+通过追加写入的日志文件在崩溃后续爬：已完成的页面按原来的顺序从日志重放，再展开它的子类目；
+队列清空（爬取跑完）后删除日志，同一天再次运行时重新抓取
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from extractor import MAX_ITEMS_PER_CHART, parse_cards_tree
+from http_fetch import detect_block, fetch_page
+from metrics import metrics
+from scheduler import ScrapeScheduler
+
+# 子类目爬取深度（0 表示只抓榜单首页，不启用类目爬虫）
+CRAWL_DEPTH = int(os.environ.get("CRAWL_DEPTH", "0"))
+
+# 并发 worker 数
+CRAWL_WORKERS = int(os.environ.get("CRAWL_WORKERS", "8"))
+
+# 每个域名每秒允许的请求数
+CRAWL_RATE = float(os.environ.get("CRAWL_RATE", "1.0"))
+
+# 单次运行最多抓取的页面数
+CRAWL_MAX_PAGES = int(os.environ.get("CRAWL_MAX_PAGES", "500"))
+
+# 续爬日志目录，每天一个文件
+CRAWL_JOURNAL_DIR = os.environ.get("CRAWL_JOURNAL_DIR", "data/crawl")
+
+# 各榜单 URL 中类目路径前的标记
+CHART_PATH_MARKERS = {
+    "movers_shakers": "/movers-and-shakers/",
+    "best_sellers": "/zgbs/",
+}
+
+_REF_SEGMENT_RE = re.compile(r"/ref=[^/]*")
+
+class TokenBucket:
+    """异步令牌桶：每秒补充 rate 个令牌，最多积攒 capacity 个"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """取走一个令牌，不足时等待"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def canonical_url(url):
+    """去掉 query、fragment 和 Amazon 的 /ref=... 路径段，统一以 / 结尾，用于去重"""
+    parts = urlsplit(url)
+    path = _REF_SEGMENT_RE.sub("", parts.path)
+    if not path.endswith("/"):
+        path += "/"
+    return urlunsplit((parts.scheme, parts.netloc.lower(), path, "", ""))
+
+def node_path(url, chart_key):
+    """返回 URL 中榜单标记之后的类目路径，不是该榜单的 URL 返回 None"""
+    path = urlsplit(url).path
+    marker = CHART_PATH_MARKERS[chart_key]
+    if marker not in path:
+        return None
+    return path.split(marker, 1)[1].strip("/")
+
+def discover_links(root, base_url, chart_key):
+    """从榜单页面中找出同一域名下同类榜单的子类目链接，返回 [(url, 类目名称), ...]"""
+    host = urlsplit(base_url).netloc.lower()
+    links = []
+    seen = set()
+    for anchor in root.iter("a"):
+        href = anchor.get("href")
+        if not href:
+            continue
+        url = canonical_url(urljoin(base_url, href))
+        if urlsplit(url).netloc != host or url in seen:
+            continue
+        # 只要同类榜单下的非首页链接
+        if not node_path(url, chart_key):
+            continue
+        seen.add(url)
+        links.append((url, " ".join(anchor.text_content().split())))
+    return links
+
+class CategoryCrawler:
+    """按类目树广度优先抓取榜单页面
+
+    sources 为 DATA_SOURCES 结构；to_products(cards, chart_key, market_info) 把卡片转换为商品；
+    rewrite(url) 返回实际请求的地址（用于替身服务器），链接解析始终基于 Amazon 原始 URL；
+    给了 emit 时每页的商品通过 await emit(order, product) 逐个送出，记录里不再保留商品，
+    order = (市场序号, 榜单序号, 深度, URL, 页内序号)；
+    scheduler 为 ScrapeScheduler，每个页面按 (市场, 榜单, URL) 登记结果，默认新建一个
+    """
+
+    def __init__(self, sources, chart_keys, to_products, rewrite=None,
+                 max_depth=CRAWL_DEPTH, workers=CRAWL_WORKERS, rate=CRAWL_RATE,
+                 max_pages=CRAWL_MAX_PAGES, journal_path=None, emit=None, scheduler=None):
+        self.sources = sources
+        self.chart_keys = list(chart_keys)
+        self.to_products = to_products
+        self.rewrite = rewrite or (lambda url: url)
+        self.max_depth = max_depth
+        self.workers = max(1, workers)
+        self.rate = rate
+        self.max_pages = max_pages
+        self.journal_path = journal_path
+        self.emit = emit
+        self.scheduler = scheduler or ScrapeScheduler()
+        self.market_order = {key: i for i, key in enumerate(self.sources)}
+        self.chart_order = {key: i for i, key in enumerate(self.chart_keys)}
+
+        self.buckets = {}
+        self.seen = set()
+        self.pages = {}
+        self.failures = {}
+        self.resumed = set()
+        self._journal = None
+        self._semaphore = None
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate)
+        return self.buckets[host]
+
+    def _load_journal(self):
+        """读取续爬日志中已完成的页面"""
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return
+        offset = 0
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                start, offset = offset, offset + len(line)
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # 崩溃时最后一行可能只写了一半
+                    continue
+                record.setdefault("product_count", len(record["products"]))
+                if self.emit:
+                    # 流式模式下不在内存里保留商品，记下位置，轮到该页时再从日志读出
+                    record["products"] = None
+                    record["offset"] = start
+                self.pages[record["url"]] = record
+                self.resumed.add(record["url"])
+        print(f"♻️ 从续爬日志恢复 {len(self.pages)} 个已完成页面: {self.journal_path}")
+
+    def _write_journal(self, record):
+        if self._journal:
+            self._journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._journal.flush()
+
+    def _enqueue(self, queue, url, depth, market_key, chart_key, name):
+        url = canonical_url(url)
+        if url in self.seen or depth > self.max_depth:
+            return
+        if len(self.seen) >= self.max_pages:
+            return
+        self.seen.add(url)
+        queue.put_nowait((url, depth, market_key, chart_key, name))
+
+    async def _fetch(self, url, depth, market_key, chart_key, name):
+        """在调度器的预算内抓取并解析单个榜单页面，返回日志记录；放弃时抛出 RuntimeError"""
+        key = (market_key, chart_key, url)
+        record = await self.scheduler.run(
+            key, urlsplit(url).netloc, self._semaphore,
+            lambda timeout, session: self._attempt(url, depth, market_key, chart_key, name, timeout, session),
+            size=lambda record: record["product_count"],
+        )
+        if record is None:
+            raise RuntimeError(self.scheduler.coverage[key]["reason"])
+        return record
+
+    async def _attempt(self, url, depth, market_key, chart_key, name, timeout, session):
+        """单次抓取尝试，返回 (日志记录, 失败原因)"""
+        from lxml import html as lxml_html
+
+        await self._bucket(url).acquire()
+        try:
+            status_code, html, _ = await asyncio.to_thread(
+                fetch_page, self.rewrite(url), timeout, session.http() if session else None
+            )
+        except Exception as e:
+            return None, f"request error: {e}"
+        reason = detect_block(status_code, html)
+        if reason:
+            return None, reason
+
+        def parse():
+            root = lxml_html.fromstring(html)
+            cards = parse_cards_tree(root, chart_key, url, MAX_ITEMS_PER_CHART)
+            children = discover_links(root, url, chart_key) if depth < self.max_depth else []
+            return cards, children
+
+        cards, children = await asyncio.to_thread(parse)
+        products = self.to_products(cards, chart_key, self.sources[market_key])
+        for product in products:
+            product["browse_node"] = name
+            product["browse_url"] = url
+        return {
+            "url": url,
+            "depth": depth,
+            "market_key": market_key,
+            "chart": chart_key,
+            "name": name,
+            "products": products,
+            "product_count": len(products),
+            "children": children,
+        }, None
+
+    async def _worker(self, queue):
+        while True:
+            url, depth, market_key, chart_key, name = await queue.get()
+            try:
+                if url in self.resumed:
+                    # 上次运行已完成：先按原来的顺序重放它的商品，再展开子类目
+                    record = self.pages[url]
+                    if self.emit:
+                        await self._emit_products(dict(record, products=self._read_products(record)))
+                else:
+                    with metrics.span("crawl_page", market=market_key, chart=chart_key):
+                        record = await self._fetch(url, depth, market_key, chart_key, name)
+                    self._write_journal(record)
+                    if self.emit:
+                        await self._emit_products(record)
+                        record["products"] = None
+                    self.pages[url] = record
+                for child, child_name in record["children"]:
+                    self._enqueue(queue, child, depth + 1, market_key, chart_key, child_name)
+            except Exception as e:
+                self.failures[url] = str(e)
+                metrics.count("crawl_failures_total", market=market_key, chart=chart_key)
+            finally:
+                queue.task_done()
+
+    async def _emit_products(self, record):
+        market_key, chart_key = record["market_key"], record["chart"]
+        prefix = (self.market_order[market_key], self.chart_order[chart_key], record["depth"], record["url"])
+        for i, product in enumerate(record["products"]):
+            await self.emit(prefix + (i,), product)
+
+    def _read_products(self, record):
+        """从续爬日志中读出某个已完成页面的商品"""
+        with open(self.journal_path, "rb") as f:
+            f.seek(record["offset"])
+            return json.loads(f.readline())["products"]
+
+    async def run(self):
+        """执行爬取，返回按 (市场, 榜单, 深度, URL) 排序的页面记录"""
+        queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(self.workers)
+        self._load_journal()
+
+        if self.journal_path:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+        # 根页面始终入队（或从日志中展开）
+        for market_key, market_info in self.sources.items():
+            for chart_key in self.chart_keys:
+                self._enqueue(queue, market_info[chart_key], 0, market_key, chart_key, "")
+
+        print(
+            f"🕸️ 类目爬取：深度 {self.max_depth}，{self.workers} 个 worker，"
+            f"每域名 {self.rate:g} 请求/秒，最多 {self.max_pages} 页"
+        )
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.workers)]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if self._journal:
+                self._journal.close()
+                self._journal = None
+
+        # 续爬只用于没跑完（崩溃或被中断）的爬取，跑完后删除日志，下次运行不再重放旧商品
+        if self.journal_path and os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+        if self.failures:
+            print(f"⚠️ {len(self.failures)} 个类目页面抓取失败，下次运行时会重试")
+
+        return sorted(
+            (record for url, record in self.pages.items() if url in self.seen),
+            key=lambda r: (self.market_order[r["market_key"]], self.chart_order[r["chart"]], r["depth"], r["url"])
+        )
+
+def journal_path_for(run_date, directory=CRAWL_JOURNAL_DIR):
+    """当天的续爬日志路径"""
+    return os.path.join(directory, f"{run_date}.ndjson")
@@ -0,0 +1,170 @@
+"""
+全量商品导出
+每轮把流过的全部商品（不只是 TOP 10）写成按日期分区的 NDJSON（gzip）和 Parquet（zstd）文件，
+分析时直接用 pandas / DuckDB 读取，不必再从 HTML 报告里反解析
+
+目录结构（Hive 风格分区，DuckDB 可用 hive_partitioning 读出 date 列）：
+    data/exports/date=2024-05-01/products-080000.ndjson.gz
+    data/exports/date=2024-05-01/products-080000.parquet
+
+Parquet 需要可选依赖 pyarrow，未安装时只导出 NDJSON
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime
+
+from classifier import classify_product
+
+# 导出目录
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "data/exports")
+
+# 导出格式，逗号分隔（ndjson、parquet），留空则不导出
+EXPORT_FORMATS = os.environ.get("EXPORT_FORMATS", "ndjson,parquet")
+
+# Parquet 每个行组的行数，决定写出时缓冲的商品数
+EXPORT_ROW_GROUP_SIZE = 10_000
+
+# 导出的字段及 Parquet 列类型（名称 -> pyarrow 类型名）
+EXPORT_COLUMNS = [
+    ("asin", "string"),
+    ("market", "string"),
+    ("chart", "string"),
+    ("rank", "int16"),
+    ("growth", "string"),
+    ("growth_pct", "float64"),
+    ("is_new", "bool"),
+    ("price", "string"),
+    ("price_value", "float64"),
+    ("currency", "string"),
+    ("score", "float64"),
+    ("breakout", "float64"),
+    ("name", "string"),
+    ("rating", "string"),
+    ("category", "string"),
+    ("browse_node", "string"),
+    ("scraped_at", "timestamp"),
+]
+
+def export_row(product, scraped_at):
+    """把商品字典转换成导出行（字段顺序与 EXPORT_COLUMNS 一致）"""
+    classify_product(product)
+    return {
+        "asin": product.get("asin") or None,
+        "market": product["market_key"],
+        "chart": product["chart"],
+        "rank": product.get("rank"),
+        "growth": product["growth"],
+        "growth_pct": product.get("growth_pct"),
+        "is_new": product.get("is_new"),
+        "price": product["price"],
+        "price_value": product.get("price_value"),
+        "currency": product.get("currency"),
+        "score": product.get("score"),
+        "breakout": product.get("breakout"),
+        "name": product["name"],
+        "rating": product.get("rating") or None,
+        "category": product["category"],
+        "browse_node": product.get("browse_node") or None,
+        "scraped_at": scraped_at,
+    }
+
+def _arrow_schema(pa):
+    types = {
+        "string": pa.string(),
+        "int16": pa.int16(),
+        "float64": pa.float64(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("s"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in EXPORT_COLUMNS])
+
+class ExportWriter:
+    """逐行写出一轮的导出文件：先写临时文件，close(commit=True) 时改名为正式文件
+
+    NDJSON 每行立即写入 gzip 流；Parquet 按列缓冲，攒满一个行组写出一次，内存只占一个行组
+    """
+
+    def __init__(self, run_time=None, directory=EXPORT_DIR, formats=EXPORT_FORMATS,
+                 row_group_size=EXPORT_ROW_GROUP_SIZE):
+        run_time = run_time or datetime.now()
+        self.scraped_at = run_time.replace(microsecond=0)
+        self.directory = os.path.join(directory, f"date={run_time.strftime('%Y-%m-%d')}")
+        self.basename = f"products-{run_time.strftime('%H%M%S')}"
+        self.formats = {f.strip() for f in formats.split(",") if f.strip()}
+        self.row_group_size = row_group_size
+        self.count = 0
+        self.paths = []
+
+        self._ndjson = None
+        self._parquet = None
+        self._pa = None
+        self._columns = None
+        os.makedirs(self.directory, exist_ok=True)
+
+        if "ndjson" in self.formats:
+            path = os.path.join(self.directory, f"{self.basename}.ndjson.gz")
+            self._ndjson = gzip.open(f"{path}.tmp", "wt", encoding="utf-8")
+            self.paths.append(path)
+
+        if "parquet" in self.formats:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                print("⚠️ 未安装 pyarrow，跳过 Parquet 导出（pip install pyarrow）")
+            else:
+                path = os.path.join(self.directory, f"{self.basename}.parquet")
+                self._pa = pa
+                self._schema = _arrow_schema(pa)
+                self._parquet = pq.ParquetWriter(f"{path}.tmp", self._schema, compression="zstd")
+                self._columns = {name: [] for name, _ in EXPORT_COLUMNS}
+                self.paths.append(path)
+
+    def add(self, product):
+        row = export_row(product, self.scraped_at)
+        self.count += 1
+        if self._ndjson:
+            record = dict(row, scraped_at=self.scraped_at.isoformat())
+            self._ndjson.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if self._parquet:
+            for name, value in row.items():
+                self._columns[name].append(value)
+            if len(self._columns["asin"]) >= self.row_group_size:
+                self._flush_row_group()
+
+    def _flush_row_group(self):
+        if not self._columns["asin"]:
+            return
+        batch = self._pa.record_batch(
+            [self._pa.array(self._columns[field.name], type=field.type) for field in self._schema],
+            schema=self._schema,
+        )
+        self._parquet.write_batch(batch)
+        self._columns = {name: [] for name, _ in EXPORT_COLUMNS}
+
+    def close(self, commit=True):
+        """关闭文件；commit 为 False 时删除临时文件，返回导出行数"""
+        try:
+            if self._ndjson:
+                self._ndjson.close()
+            if self._parquet:
+                if commit:
+                    self._flush_row_group()
+                self._parquet.close()
+        finally:
+            for path in self.paths:
+                tmp_path = f"{path}.tmp"
+                if commit:
+                    os.replace(tmp_path, path)
+                elif os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        if commit:
+            print(f"📤 已导出 {self.count} 个商品: {', '.join(self.paths)}")
+        else:
+            self.count = 0
+            # 没有保留任何文件时顺手删掉空的分区目录
+            if os.path.isdir(self.directory) and not os.listdir(self.directory):
+                os.rmdir(self.directory)
+        return self.count
@@ -0,0 +1,191 @@
+"""
+商品卡片提取层
+按榜单类型声明选择器，一次 page.evaluate 取回整页商品的纯字典列表；
+同一套选择器也用于 HTTP 通道下的 lxml 解析
+"""
+
+import os
+import time
+from functools import lru_cache
+from urllib.parse import urljoin
+
+# 单个榜单最多提取的商品数（Amazon 榜单每页最多 100 个）
+MAX_ITEMS_PER_CHART = 100
+
+# 单页就绪等待的总时限（毫秒），到点后按已加载的商品提取
+PAGE_DEADLINE_MS = int(os.environ.get("PAGE_DEADLINE_MS", "20000"))
+
+# 滚动后等待新商品出现的时长（毫秒），超时即视为已加载完
+SCROLL_IDLE_MS = 1200
+
+# 懒加载计数所用的选择器
+LAZY_ITEM_SELECTOR = "[data-asin]"
+
+# 各榜单类型的卡片选择器
+CHART_SELECTORS = {
+    "movers_shakers": {
+        "item": "[data-asin]",
+        "name": "span.a-size-base-plus, span.a-size-medium, .a-link-normal span",
+        "price": ".a-price .a-offscreen, .a-price-whole",
+        "growth": ".a-size-small.a-color-success, .a-color-success",
+        "rank": ".zg-bdg-text, .a-badge-text",
+        "rating": ".a-icon-alt",
+        "link": "a.a-link-normal[href]",
+    },
+    "best_sellers": {
+        "item": ".p13n-sc-uncoverable-faceout, [data-asin]",
+        "name": "._cDEzb_p13n-sc-css-line-clamp-1_1Fn1y, .a-link-normal span, .a-size-base-plus",
+        "price": ".a-price .a-offscreen, ._cDEzb_p13n-sc-price_3mJ9Z",
+        "growth": "",
+        "rank": ".zg-bdg-text, .a-badge-text",
+        "rating": ".a-icon-alt",
+        "link": "a.a-link-normal[href]",
+    },
+}
+
+# 在浏览器内执行的提取脚本：遍历卡片并一次性返回所有字段
+EXTRACT_JS = r"""
+([selectors, limit]) => {
+    const text = (root, sel) => {
+        if (!sel) return "";
+        const el = root.querySelector(sel);
+        return el ? (el.innerText || el.textContent || "").replace(/\s+/g, " ").trim() : "";
+    };
+    const cards = [];
+    const seen = new Set();
+    for (const item of document.querySelectorAll(selectors.item)) {
+        if (cards.length >= limit) break;
+        let asin = item.getAttribute("data-asin") || "";
+        if (!asin) {
+            const holder = item.closest("[data-asin]") || item.querySelector("[data-asin]");
+            asin = holder ? holder.getAttribute("data-asin") || "" : "";
+        }
+        // 同一商品可能同时命中多个选择器，按 ASIN 去重
+        if (asin) {
+            if (seen.has(asin)) continue;
+            seen.add(asin);
+        }
+        const linkEl = selectors.link ? item.querySelector(selectors.link) : null;
+        cards.push({
+            asin: asin,
+            name: text(item, selectors.name),
+            price: text(item, selectors.price),
+            growth: text(item, selectors.growth),
+            rank: text(item, selectors.rank),
+            rating: text(item, selectors.rating),
+            link: linkEl ? linkEl.href : "",
+        });
+    }
+    return cards;
+}
+"""
+
+# 滚动到底部并返回当前商品数
+SCROLL_AND_COUNT_JS = """
+(sel) => {
+    window.scrollTo(0, document.body.scrollHeight);
+    return document.querySelectorAll(sel).length;
+}
+"""
+
+# 商品数超过给定值时返回 true
+COUNT_GREW_JS = "([sel, n]) => document.querySelectorAll(sel).length > n"
+
+async def wait_for_product_grid(page, chart_key, target=MAX_ITEMS_PER_CHART, deadline_ms=PAGE_DEADLINE_MS):
+    """等待商品网格就绪
+    
+    先等网格选择器出现，再滚动直到商品数不再增长、达到目标数或超过单页时限。
+    返回最终的商品数。
+    """
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+    
+    deadline = time.monotonic() + deadline_ms / 1000
+    
+    def remaining_ms():
+        return max(0, int((deadline - time.monotonic()) * 1000))
+    
+    try:
+        await page.wait_for_selector(CHART_SELECTORS[chart_key]["item"], timeout=remaining_ms() or 1)
+    except PlaywrightTimeoutError:
+        return 0
+    
+    count = await page.evaluate(SCROLL_AND_COUNT_JS, LAZY_ITEM_SELECTOR)
+    while count < target and remaining_ms() > 0:
+        try:
+            await page.wait_for_function(
+                COUNT_GREW_JS,
+                arg=[LAZY_ITEM_SELECTOR, count],
+                timeout=min(SCROLL_IDLE_MS, remaining_ms()) or 1
+            )
+        except PlaywrightTimeoutError:
+            # 一段时间内没有新商品，懒加载已结束
+            break
+        count = await page.evaluate(SCROLL_AND_COUNT_JS, LAZY_ITEM_SELECTOR)
+    
+    return count
+
+async def extract_cards(page, chart_key, limit=MAX_ITEMS_PER_CHART):
+    """一次往返提取页面上所有商品卡片，返回纯字典列表"""
+    return await page.evaluate(EXTRACT_JS, [CHART_SELECTORS[chart_key], limit])
+
+@lru_cache(maxsize=None)
+def _compiled_selectors(chart_key):
+    """把榜单选择器编译成 lxml XPath（字段选择器只匹配卡片内部，与 querySelector 一致）"""
+    from cssselect import GenericTranslator
+    from lxml import etree
+    
+    translator = GenericTranslator()
+    compiled = {}
+    for field, css in CHART_SELECTORS[chart_key].items():
+        if not css:
+            compiled[field] = None
+            continue
+        prefix = "descendant-or-self::" if field == "item" else "descendant::"
+        compiled[field] = etree.XPath(translator.css_to_xpath(css, prefix=prefix))
+    return compiled
+
+def parse_cards_html(html, chart_key, base_url="", limit=MAX_ITEMS_PER_CHART):
+    """用 lxml 解析整页 HTML，返回与 extract_cards 结构相同的卡片字典"""
+    from lxml import html as lxml_html
+    
+    return parse_cards_tree(lxml_html.fromstring(html), chart_key, base_url, limit)
+
+def parse_cards_tree(root, chart_key, base_url="", limit=MAX_ITEMS_PER_CHART):
+    """从已解析的 lxml 文档树提取商品卡片（便于同一文档再做其他解析）"""
+    selectors = _compiled_selectors(chart_key)
+    
+    def text(item, field):
+        xpath = selectors[field]
+        matches = xpath(item) if xpath is not None else []
+        return " ".join(matches[0].text_content().split()) if matches else ""
+    
+    cards = []
+    seen = set()
+    for item in selectors["item"](root):
+        if len(cards) >= limit:
+            break
+        asin = item.get("data-asin") or ""
+        if not asin:
+            holders = item.xpath("ancestor::*[@data-asin][1] | descendant::*[@data-asin][1]")
+            asin = holders[0].get("data-asin") or "" if holders else ""
+        # 同一商品可能同时命中多个选择器，按 ASIN 去重
+        if asin:
+            if asin in seen:
+                continue
+            seen.add(asin)
+        links = selectors["link"](item) if selectors["link"] is not None else []
+        cards.append({
+            "asin": asin,
+            "name": text(item, "name"),
+            "price": text(item, "price"),
+            "growth": text(item, "growth"),
+            "rank": text(item, "rank"),
+            "rating": text(item, "rating"),
+            "link": urljoin(base_url, links[0].get("href")) if links else "",
+        })
+    return cards
+
+def parse_rank(rank_text, default):
+    """把 "#12" 之类的徽章文字解析成整数名次"""
+    digits = "".join(ch for ch in rank_text if ch.isdigit())
+    return int(digits) if digits else default
@@ -0,0 +1,187 @@
+"""
+商品历史库
+以 (ASIN, 市场, 榜单, 日期) 为键把每次抓取的名次、增长率、价格和名称写入内嵌 SQLite，
+每次运行批量 upsert，支持按 ASIN 和日期快速查询
+
+用法：
+    python history.py risers de --days 14
+    python history.py asin B0XXXXXXXX
+"""
+
+import argparse
+import os
+import sqlite3
+from datetime import date, timedelta
+
+from ranking import parse_growth
+
+# 历史库文件路径
+HISTORY_DB = os.environ.get("HISTORY_DB", "data/history.db")
+
+# 主键以 ASIN 开头，兼作按 ASIN 查询的索引
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    asin TEXT NOT NULL,
+    market TEXT NOT NULL,
+    chart TEXT NOT NULL,
+    date TEXT NOT NULL,
+    rank INTEGER,
+    growth TEXT,
+    growth_pct REAL,
+    price TEXT,
+    name TEXT,
+    PRIMARY KEY (asin, market, chart, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_snapshots_date ON snapshots (date);
+CREATE INDEX IF NOT EXISTS idx_snapshots_market_date ON snapshots (market, chart, date, growth_pct);
+"""
+
+UPSERT_SQL = """
+INSERT INTO snapshots (asin, market, chart, date, rank, growth, growth_pct, price, name)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (asin, market, chart, date) DO UPDATE SET
+    rank = excluded.rank,
+    growth = excluded.growth,
+    growth_pct = excluded.growth_pct,
+    price = excluded.price,
+    name = excluded.name
+"""
+
+# 窗口内名次提升最多的商品（名次越小越靠前，提升 = 首日名次 - 最新名次）
+# 聚合只走 (market, chart, date, growth_pct) 覆盖索引，首末两天的名次按主键回表
+TOP_RISERS_SQL = """
+WITH agg AS (
+    SELECT asin, MIN(date) AS first_date, MAX(date) AS last_date,
+           MAX(growth_pct) AS max_growth, COUNT(*) AS days
+    FROM snapshots
+    WHERE market = :market AND chart = :chart AND date >= :since
+    GROUP BY asin
+)
+SELECT agg.asin, last.name, first.rank AS first_rank, last.rank AS last_rank,
+       first.rank - last.rank AS rank_gain, agg.max_growth, agg.days
+FROM agg
+JOIN snapshots AS first
+    ON first.asin = agg.asin AND first.market = :market AND first.chart = :chart
+    AND first.date = agg.first_date
+JOIN snapshots AS last
+    ON last.asin = agg.asin AND last.market = :market AND last.chart = :chart
+    AND last.date = agg.last_date
+ORDER BY rank_gain DESC, agg.max_growth DESC
+LIMIT :limit
+"""
+
+def connect(path=HISTORY_DB):
+    """打开历史库，不存在时自动建表"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _snapshot_row(p, run_date):
+    return (
+        p["asin"],
+        p["market_key"],
+        p["chart"],
+        run_date,
+        p.get("rank"),
+        p["growth"],
+        parse_growth(p["growth"]),
+        p["price"],
+        p["name"],
+    )
+
+class HistoryWriter:
+    """流式写入历史库：商品逐个加入，攒满一批执行一次 executemany，
+    整轮运行处于同一个事务中，结束时决定提交还是回滚
+
+    连接只能在创建它的线程里使用，调用方需保证所有方法在同一线程执行
+    """
+
+    def __init__(self, run_date, path=HISTORY_DB, batch_size=500):
+        self.run_date = run_date
+        self.path = path
+        self.batch_size = batch_size
+        self.conn = connect(path)
+        self.rows = []
+        self.count = 0
+        # 只记录键，用于“同一商品只保留第一条”
+        self.seen = set()
+
+    def add(self, p):
+        key = (p.get("asin"), p["market_key"], p["chart"])
+        if not key[0] or key in self.seen:
+            return
+        self.seen.add(key)
+        self.rows.append(_snapshot_row(p, self.run_date))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.conn.executemany(UPSERT_SQL, self.rows)
+            self.count += len(self.rows)
+            self.rows = []
+
+    def close(self, commit=True):
+        """提交（或回滚）本轮写入并关闭连接，返回写入条数"""
+        try:
+            if commit:
+                self.flush()
+                self.conn.commit()
+                print(f"🗄️ 历史库已写入 {self.count} 条记录: {self.path}")
+            else:
+                self.conn.rollback()
+                self.count = 0
+        finally:
+            self.conn.close()
+        return self.count
+
+def top_risers(conn, market, chart="movers_shakers", days=14, limit=20, today=None):
+    """查询最近 days 天内名次提升最多的商品"""
+    since = ((today or date.today()) - timedelta(days=days - 1)).isoformat()
+    params = {"market": market, "chart": chart, "since": since, "limit": limit}
+    return [dict(row) for row in conn.execute(TOP_RISERS_SQL, params)]
+
+def last_snapshot_dates(conn):
+    """每个 (市场, 榜单) 最近一次有快照的日期"""
+    rows = conn.execute("SELECT market, chart, MAX(date) FROM snapshots GROUP BY market, chart")
+    return {(market, chart): day for market, chart, day in rows}
+
+def asin_history(conn, asin):
+    """查询单个 ASIN 在所有市场和榜单的历史记录"""
+    rows = conn.execute(
+        "SELECT * FROM snapshots WHERE asin = ? ORDER BY date, market, chart",
+        (asin,)
+    )
+    return [dict(row) for row in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description="查询商品历史库")
+    parser.add_argument("--db", default=HISTORY_DB, help="历史库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    risers = sub.add_parser("risers", help="名次上升最快的商品")
+    risers.add_argument("market", help="市场，如 usa / uk / de")
+    risers.add_argument("--chart", default="movers_shakers", help="榜单类型")
+    risers.add_argument("--days", type=int, default=14, help="时间窗口（天）")
+    risers.add_argument("--limit", type=int, default=20, help="返回条数")
+
+    lookup = sub.add_parser("asin", help="单个 ASIN 的历史")
+    lookup.add_argument("asin")
+
+    args = parser.parse_args()
+    conn = connect(args.db)
+    if args.command == "risers":
+        rows = top_risers(conn, args.market, args.chart, args.days, args.limit)
+    else:
+        rows = asin_history(conn, args.asin)
+    for row in rows:
+        print(row)
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+免浏览器的 HTTP 抓取通道
+复用长连接的 requests 会话抓取榜单页面，用 lxml 解析成与浏览器通道相同的商品卡片；
+遇到验证码、空榜单或被拦截的响应时返回原因，由调用方回退到 Playwright
+"""
+
+import asyncio
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from extractor import MAX_ITEMS_PER_CHART, parse_cards_html
+
+# 连接池大小（应不小于并发抓取数）
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "8"))
+
+# 单次请求超时（秒）
+HTTP_TIMEOUT = 15
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+DEFAULT_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# 机器人验证页的特征文字
+CAPTCHA_MARKERS = (
+    "/errors/validateCaptcha",
+    "Type the characters you see in this image",
+    "Enter the characters you see below",
+    "api-services-support@amazon.com",
+)
+
+# 视为被拦截的 HTTP 状态码
+BLOCKED_STATUS = {403, 429, 503}
+
+# 说明站点在验证 / 拦截本客户端的失败类型（reason_kind 的取值）
+BLOCK_KINDS = {"captcha", "blocked"}
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """返回进程内共享的长连接会话"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(DEFAULT_HEADERS)
+            _session = session
+        return _session
+
+def close_session():
+    """关闭共享会话"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def detect_block(status_code, html):
+    """判断响应是否被拦截，返回原因或 None"""
+    if status_code in BLOCKED_STATUS:
+        return f"blocked (HTTP {status_code})"
+    if status_code != 200:
+        return f"HTTP {status_code}"
+    if any(marker in html for marker in CAPTCHA_MARKERS):
+        return "captcha"
+    return None
+
+def reason_kind(reason):
+    """把回退原因归并为固定的几类，便于做指标标签"""
+    for prefix, kind in (
+        ("blocked", "blocked"),
+        ("captcha", "captcha"),
+        ("empty grid", "empty_grid"),
+        ("request error", "request_error"),
+        ("timeout", "timeout"),
+        ("browser unavailable", "browser_unavailable"),
+        ("browser error", "browser_error"),
+    ):
+        if reason.startswith(prefix):
+            return kind
+    return "http_error"
+
+def fetch_page(url, timeout=HTTP_TIMEOUT, session=None):
+    """同步抓取页面，返回 (状态码, HTML, 最终 URL)；session 为会话池中某个会话的 requests 会话，默认用共享会话"""
+    response = (session or get_session()).get(url, timeout=timeout)
+    # 响应头没写 charset 时 requests 按 ISO-8859-1 解码，£、€ 会变成乱码；榜单页面都是 UTF-8
+    if "charset" not in response.headers.get("Content-Type", "").lower():
+        response.encoding = "utf-8"
+    return response.status_code, response.text, response.url
+
+async def fetch_cards(url, chart_key, limit=MAX_ITEMS_PER_CHART, timeout=HTTP_TIMEOUT, session=None):
+    """通过 HTTP 抓取并解析榜单
+
+    返回 (cards, reason)；reason 不为 None 时说明需要回退到浏览器
+    """
+    try:
+        status_code, html, final_url = await asyncio.to_thread(fetch_page, url, timeout, session)
+    except requests.Timeout as e:
+        return [], f"timeout: {e}"
+    except requests.RequestException as e:
+        return [], f"request error: {e}"
+
+    reason = detect_block(status_code, html)
+    if reason:
+        return [], reason
+
+    cards = await asyncio.to_thread(parse_cards_html, html, chart_key, final_url, limit)
+    if not cards:
+        return [], "empty grid"
+    return cards, None
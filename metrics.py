@@ -0,0 +1,160 @@
+"""
+运行指标
+按市场、榜单打标签记录各阶段耗时（goto、就绪等待、提取、排序、渲染、写文件、通知等），
+统计商品数量与丢弃原因；运行结束时可写出 JSON 文件和 Prometheus textfile collector 文件
+"""
+
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# 指标输出路径（留空则不写文件）
+METRICS_JSON = os.environ.get("METRICS_JSON", "")
+METRICS_PROM = os.environ.get("METRICS_PROM", "")
+
+# Prometheus 指标名前缀
+METRIC_PREFIX = "hotpicks"
+
+class Metrics:
+    """单次运行的耗时与计数"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """清空记录，开始新一轮运行（守护进程每轮调用）"""
+        self.started = time.time()
+        self.spans = []
+        self.counters = Counter()
+
+    @contextmanager
+    def span(self, stage, **tags):
+        """记录一个阶段的耗时；阶段内抛出异常时标记为 error 并继续抛出"""
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - start, status, **tags)
+
+    def record(self, stage, seconds, status="ok", **tags):
+        """直接记录一段已知耗时（流水线阶段按累计忙碌时间上报，避免每个商品一条记录）"""
+        self.spans.append({"stage": stage, "tags": tags, "seconds": seconds, "status": status})
+
+    def count(self, name, value=1, **tags):
+        """累加计数器"""
+        self.counters[(name, tuple(sorted(tags.items())))] += value
+
+    def stage_summary(self):
+        """按 (阶段, 标签) 汇总耗时"""
+        summary = {}
+        for span in self.spans:
+            key = (span["stage"], tuple(sorted(span["tags"].items())))
+            item = summary.setdefault(key, {"count": 0, "seconds": 0.0, "max": 0.0, "errors": 0})
+            item["count"] += 1
+            item["seconds"] += span["seconds"]
+            item["max"] = max(item["max"], span["seconds"])
+            item["errors"] += span["status"] == "error"
+        return summary
+
+    def to_dict(self):
+        return {
+            "started": self.started,
+            "duration": time.time() - self.started,
+            "stages": [
+                {"stage": stage, "tags": dict(tags), **{k: round(v, 6) for k, v in item.items()}}
+                for (stage, tags), item in sorted(self.stage_summary().items())
+            ],
+            "counters": [
+                {"name": name, "tags": dict(tags), "value": value}
+                for (name, tags), value in sorted(self.counters.items())
+            ],
+        }
+
+    def to_prometheus(self):
+        """生成 Prometheus 文本格式"""
+        lines = []
+
+        def labels(tags):
+            if not tags:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in tags) + "}"
+
+        stage_metric = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines.append(f"# HELP {stage_metric} Time spent in each run stage.")
+        lines.append(f"# TYPE {stage_metric} summary")
+        errors = []
+        for (stage, tags), item in sorted(self.stage_summary().items()):
+            tag_list = (("stage", stage),) + tags
+            lines.append(f"{stage_metric}_sum{labels(tag_list)} {item['seconds']:.6f}")
+            lines.append(f"{stage_metric}_count{labels(tag_list)} {item['count']}")
+            errors.append(f"{METRIC_PREFIX}_stage_errors_total{labels(tag_list)} {item['errors']}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_stage_errors_total counter")
+        lines.extend(errors)
+
+        seen = set()
+        for (name, tags), value in sorted(self.counters.items()):
+            metric = f"{METRIC_PREFIX}_{name}"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{labels(tags)} {value}")
+
+        lines.append(f"# TYPE {METRIC_PREFIX}_run_duration_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_run_duration_seconds {time.time() - self.started:.3f}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_run_timestamp_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_run_timestamp_seconds {int(self.started)}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        _atomic_write(path, json.dumps(self.to_dict(), ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path):
+        # textfile collector 要求原子替换，避免采集到半个文件
+        _atomic_write(path, self.to_prometheus())
+
+    def print_summary(self):
+        """按阶段打印耗时汇总"""
+        totals = {}
+        for (stage, _), item in self.stage_summary().items():
+            total = totals.setdefault(stage, {"count": 0, "seconds": 0.0, "max": 0.0, "errors": 0})
+            total["count"] += item["count"]
+            total["seconds"] += item["seconds"]
+            total["max"] = max(total["max"], item["max"])
+            total["errors"] += item["errors"]
+        print("⏱️ 阶段耗时：")
+        for stage, total in totals.items():
+            errors = f"，失败 {total['errors']} 次" if total["errors"] else ""
+            print(
+                f"  {stage}: {total['count']} 次，合计 {total['seconds']:.2f}s，"
+                f"最长 {total['max']:.2f}s{errors}"
+            )
+
+    def write_outputs(self, json_path=METRICS_JSON, prom_path=METRICS_PROM):
+        """按配置写出指标文件"""
+        if json_path:
+            self.write_json(json_path)
+            print(f"📈 指标已写入: {json_path}")
+        if prom_path:
+            self.write_prometheus(prom_path)
+            print(f"📈 Prometheus 指标已写入: {prom_path}")
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _atomic_write(path, content):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+# 进程内共享的指标实例
+metrics = Metrics()
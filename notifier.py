@@ -0,0 +1,283 @@
+"""
+飞书通知
+通过一个共享连接池并发推送到多个群 Webhook；每个群可配置市场过滤和 TOP N，
+相同过滤条件的卡片只构建一次；遇到 5xx 和限流时按指数退避加随机抖动重试，
+单个群慢或失败不会拖住其他群
+
+群配置（FEISHU_TARGETS，JSON 字符串或 JSON 文件路径）示例：
+    [
+        {"name": "美国组", "url": "https://open.feishu.cn/...", "markets": ["usa"], "top_n": 5},
+        {"name": "欧洲组", "url": "https://open.feishu.cn/...", "markets": ["uk", "de"]}
+    ]
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from render import also_listed
+
+# 多群配置
+FEISHU_TARGETS = os.environ.get("FEISHU_TARGETS", "")
+
+# 单次请求超时（秒）
+NOTIFY_TIMEOUT = 10
+
+# 每个群最多尝试次数
+NOTIFY_MAX_ATTEMPTS = 4
+
+# 每个群的总时限（秒，含所有请求与退避），用完即放弃，不让一个群拖住整轮运行
+NOTIFY_TARGET_BUDGET = 45.0
+
+# 退避基数与上限（秒）
+NOTIFY_BACKOFF_BASE = 1.0
+NOTIFY_BACKOFF_MAX = 30.0
+
+# 需要重试的 HTTP 状态码
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# 需要重试的飞书错误码（11232：发送频率超限）
+RETRY_FEISHU_CODES = {11232}
+
+NUMBER_EMOJIS = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
+
+def load_targets(spec=FEISHU_TARGETS, default_webhook=None):
+    """读取群配置；FEISHU_WEBHOOK 作为不过滤市场、推送 TOP 3 的默认群"""
+    if default_webhook is None:
+        default_webhook = os.environ.get("FEISHU_WEBHOOK", "")
+
+    items = []
+    if spec:
+        if spec.lstrip().startswith("["):
+            items = json.loads(spec)
+        else:
+            with open(spec, encoding="utf-8") as f:
+                items = json.load(f)
+    if default_webhook:
+        items.insert(0, {"name": "默认群", "url": default_webhook})
+
+    return [
+        {
+            "name": item.get("name") or f"群{i}",
+            "url": item["url"],
+            "markets": sorted(item["markets"]) if item.get("markets") else None,
+            "top_n": int(item.get("top_n", 3)),
+        }
+        for i, item in enumerate(items, 1)
+        if item.get("url")
+    ]
+
+def build_card(products, report_url, markets=None, notes=(), timestamp=None):
+    """构建飞书消息卡片；notes 为数据过期或不完整的市场提示，timestamp 为数据的抓取时间（缺省为当前时间）"""
+    timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M")
+
+    # 构建商品列表文本
+    products_text = ""
+    for i, product in enumerate(products):
+        name = product["name"][:40] + "..." if len(product["name"]) > 40 else product["name"]
+        number = NUMBER_EMOJIS[i] if i < len(NUMBER_EMOJIS) else f"{i + 1}."
+        products_text += f"{number} {name}\n    {product['flag']} {product['market']} | 📈 {product['growth']}\n"
+        also = also_listed(product)
+        if also:
+            products_text += f"    🌍 同时上榜：{also}\n"
+        products_text += "\n"
+
+    if notes:
+        products_text += "⚠️ " + "\n⚠️ ".join(note["text"] for note in notes) + "\n"
+
+    title = "🔥 海外爆款选品日报"
+    if markets:
+        title += f"（{' · '.join(markets).upper()}）"
+
+    return {
+        "msg_type": "interactive",
+        "card": {
+            "config": {
+                "wide_screen_mode": True
+            },
+            "header": {
+                "template": "red",
+                "title": {
+                    "tag": "plain_text",
+                    "content": title
+                }
+            },
+            "elements": [
+                {
+                    "tag": "div",
+                    "text": {
+                        "tag": "plain_text",
+                        "content": f"📅 {timestamp}"
+                    }
+                },
+                {
+                    "tag": "hr"
+                },
+                {
+                    "tag": "div",
+                    "text": {
+                        "tag": "lark_md",
+                        "content": f"**📊 今日 TOP {len(products)} 精选**\n\n{products_text}"
+                    }
+                },
+                {
+                    "tag": "hr"
+                },
+                {
+                    "tag": "action",
+                    "actions": [
+                        {
+                            "tag": "button",
+                            "text": {
+                                "tag": "plain_text",
+                                "content": "📊 查看完整报告"
+                            },
+                            "type": "primary",
+                            "url": report_url
+                        }
+                    ]
+                },
+                {
+                    "tag": "note",
+                    "elements": [
+                        {
+                            "tag": "plain_text",
+                            "content": "数据来源: Amazon Movers & Shakers + Best Sellers"
+                        }
+                    ]
+                }
+            ]
+        }
+    }
+
+class FeishuNotifier:
+    """共享连接池的并发飞书推送器"""
+
+    def __init__(self, pool_size=10, max_attempts=NOTIFY_MAX_ATTEMPTS, timeout=NOTIFY_TIMEOUT,
+                 budget=NOTIFY_TARGET_BUDGET):
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.budget = budget
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def _post(self, url, payload, timeout):
+        """同步发送一次，返回 (HTTP 状态码, 响应 JSON 或 None, Retry-After 秒数或 None)"""
+        response = self.session.post(url, json=payload, timeout=timeout)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        retry_after = response.headers.get("Retry-After")
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None
+        return response.status_code, body, retry_after
+
+    async def send(self, target, payload):
+        """向单个群推送，失败时在总时限内退避重试，返回投递结果
+
+        只重试 5xx / 限流和连接失败、超时；URL 写错等其他请求异常重试也不会好，直接放弃
+        """
+        started = time.monotonic()
+        deadline = started + self.budget
+        result = {"name": target["name"], "ok": False, "attempts": 0, "status": None, "error": None}
+
+        for attempt in range(1, self.max_attempts + 1):
+            result["attempts"] = attempt
+            retry_after = None
+            timeout = min(self.timeout, max(0.1, deadline - time.monotonic()))
+            try:
+                status, body, retry_after = await asyncio.to_thread(self._post, target["url"], payload, timeout)
+                result["status"] = status
+                code = (body or {}).get("StatusCode", (body or {}).get("code"))
+                if status == 200 and code == 0:
+                    result["ok"] = True
+                    result["error"] = None
+                    break
+                result["error"] = f"HTTP {status}" if status != 200 else f"飞书返回 {body}"
+                retryable = status in RETRY_STATUS or code in RETRY_FEISHU_CODES
+            except (requests.ConnectionError, requests.Timeout) as e:
+                result["error"] = str(e)
+                retryable = True
+            except requests.RequestException as e:
+                result["error"] = str(e)
+                retryable = False
+
+            if not retryable or attempt == self.max_attempts:
+                break
+
+            # 服务端要求等待的时间超过退避上限时放弃这个群，不让一个群拖住整轮运行
+            if retry_after and retry_after > NOTIFY_BACKOFF_MAX:
+                result["error"] += f"（Retry-After {retry_after:g} 秒，超过 {NOTIFY_BACKOFF_MAX:g} 秒上限，放弃重试）"
+                break
+
+            # 指数退避 + 全量随机抖动；服务端给了 Retry-After 时以它为下限
+            delay = random.uniform(0, min(NOTIFY_BACKOFF_MAX, NOTIFY_BACKOFF_BASE * 2 ** (attempt - 1)))
+            if retry_after:
+                delay = max(delay, retry_after)
+            if time.monotonic() + delay >= deadline:
+                result["error"] += f"（超过单个群 {self.budget:g} 秒的总时限，放弃重试）"
+                break
+            await asyncio.sleep(delay)
+
+        result["elapsed"] = round(time.monotonic() - started, 3)
+        return result
+
+    async def notify_all(self, products, targets, report_url, notes=(), timestamp=None):
+        """并发推送到所有群，返回每个群的投递结果（顺序与 targets 一致）
+
+        products 应为已打分的全部商品；每个群按自己的市场过滤取 TOP N，只附上相关市场的完整性提示；
+        timestamp 为卡片上显示的抓取时间（补发旧快照时不会显示成当前时间）
+        """
+        # dedup 依赖 NumPy，推送时才导入，notify 子命令启动时不加载
+        from dedup import top_unique
+
+        payloads = {}
+        for target in targets:
+            key = (tuple(target["markets"] or ()), target["top_n"])
+            if key not in payloads:
+                selected, related = products, notes
+                if target["markets"]:
+                    selected = [p for p in products if p.get("market_key") in target["markets"]]
+                    related = [note for note in notes if note["market_key"] in target["markets"]]
+                payloads[key] = build_card(
+                    top_unique(selected, target["top_n"]), report_url, target["markets"], related, timestamp
+                )
+
+        return await asyncio.gather(*(
+            self.send(target, payloads[(tuple(target["markets"] or ()), target["top_n"])])
+            for target in targets
+        ))
+
+async def notify(products, report_url, targets=None, notes=(), timestamp=None):
+    """按配置推送飞书通知并打印投递汇总；timestamp 为数据的抓取时间"""
+    targets = load_targets() if targets is None else targets
+    if not targets:
+        print("⚠️ 未配置飞书 Webhook，跳过通知")
+        return []
+
+    notifier = FeishuNotifier(pool_size=len(targets))
+    try:
+        results = await notifier.notify_all(products, targets, report_url, notes, timestamp)
+    finally:
+        notifier.close()
+
+    succeeded = sum(1 for r in results if r["ok"])
+    print(f"📨 飞书通知：{succeeded}/{len(results)} 个群发送成功")
+    for r in results:
+        if not r["ok"]:
+            print(f"  ⚠️ {r['name']} 发送失败（尝试 {r['attempts']} 次）: {r['error']}")
+    return results
@@ -0,0 +1,264 @@
+"""
+流式处理流水线
+抓取任务把商品逐个送入有界队列，排序阶段边收边打分并维护滚动 TOP K，
+再把商品分发到各输出端（变化检测、历史库、全量导出、报告商品目录）各自的有界队列；
+任何一个输出端跟不上时队列写满，背压沿队列一路传回抓取任务，放慢抓取。
+整个过程只保留 TOP K 和少量排队中的商品；报告商品目录每个商品只留一行紧凑数组
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from catalog import ProductCatalog
+from export import ExportWriter
+from history import HISTORY_DB, HistoryWriter
+from metrics import metrics
+from ranking import RunningTopK, load_weights, prepare_product, weights_for
+
+# 各队列的容量（商品数）
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "500"))
+
+# 历史库每批写入的条数
+HISTORY_BATCH_SIZE = 500
+
+# 每次移交给导出线程的商品数
+EXPORT_BATCH_SIZE = 500
+
+# 队列结束标记
+_DONE = object()
+
+class RankingStage:
+    """边收边打分，维护各市场的滚动 TOP K（全局 TOP 由 candidates() 去重后选出）
+
+    signals 为 {(asin, 市场, 榜单): 爆发分}（见 analytics.breakout_signals），打分前写入商品的 breakout 字段
+    """
+
+    def __init__(self, k, weights=None, signals=None):
+        self.k = k
+        self.weights = weights or load_weights()
+        self.signals = signals or {}
+        self._resolved = {}
+        self.by_market = {}
+
+    def add(self, order, product):
+        """对商品打分并放进 TOP K（已带分数且爆发分没变的商品直接使用）"""
+        group = (product.get("market_key"), product.get("chart"))
+        if group not in self._resolved:
+            self._resolved[group] = weights_for(self.weights, *group)
+        if self.signals or "breakout" in product:
+            breakout = self.signals.get((product.get("asin"), *group), 0.0)
+            if product.get("breakout") != breakout:
+                product["breakout"] = breakout
+                product.pop("score", None)
+        if "score" not in product:
+            prepare_product(product, self._resolved[group])
+        market_key = product.get("market_key")
+        if market_key not in self.by_market:
+            self.by_market[market_key] = RunningTopK(self.k)
+        self.by_market[market_key].push(product, order)
+
+    def candidates(self):
+        """各市场 TOP K 的并集，按原始顺序排列
+
+        任意市场组合的 TOP N（N ≤ k）都包含在其中，可直接交给按群过滤市场的飞书通知
+        """
+        entries = [entry for top in self.by_market.values() for entry in top.entries()]
+        entries.sort(key=lambda entry: entry[0])
+        return [product for _, product in entries]
+
+class Sink:
+    """输出端：consume 逐个处理流过的商品，close 在整轮结束、决定是否保留结果后调用"""
+
+    name = "sink"
+
+    async def consume(self, product):
+        raise NotImplementedError
+
+    async def close(self, commit=True):
+        pass
+
+class ChangeSink(Sink):
+    """把商品累加进各榜单的内容哈希"""
+
+    name = "changes"
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    async def consume(self, product):
+        self.tracker.observe(f"{product['market_key']}:{product['chart']}", product)
+
+class CatalogSink(Sink):
+    """把商品压成报告页面使用的紧凑目录（见 catalog.py）"""
+
+    name = "catalog"
+
+    def __init__(self):
+        self.catalog = ProductCatalog()
+
+    async def consume(self, product):
+        self.catalog.add(product)
+
+class ThreadedSink(Sink):
+    """在专用线程里驱动一个同步 writer（add(product) / close(commit)），商品按批移交
+
+    writer 在该线程中创建，SQLite 连接、文件句柄等都只在这一个线程里使用
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.writer = None
+        self.count = 0
+        self._pending = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name)
+
+    def make_writer(self):
+        raise NotImplementedError
+
+    async def _call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _write(self, batch):
+        if self.writer is None:
+            self.writer = self.make_writer()
+        for product in batch:
+            self.writer.add(product)
+
+    async def consume(self, product):
+        self._pending.append(product)
+        if len(self._pending) >= self.batch_size:
+            batch, self._pending = self._pending, []
+            await self._call(self._write, batch)
+
+    async def close(self, commit=True):
+        try:
+            if commit and self._pending:
+                await self._call(self._write, self._pending)
+            self._pending = []
+            if self.writer is not None:
+                self.count = await self._call(self.writer.close, commit)
+        finally:
+            self._executor.shutdown(wait=False)
+        return self.count
+
+class HistorySink(ThreadedSink):
+    """流式写历史库；整轮处于同一个事务中，close(commit=False) 时回滚，什么也不留下"""
+
+    name = "history"
+
+    def __init__(self, run_date, path=HISTORY_DB, batch_size=HISTORY_BATCH_SIZE):
+        super().__init__(batch_size)
+        self.run_date = run_date
+        self.path = path
+
+    def make_writer(self):
+        return HistoryWriter(self.run_date, self.path, self.batch_size)
+
+class ExportSink(ThreadedSink):
+    """流式导出全量商品（NDJSON / Parquet）；close(commit=False) 时删除临时文件"""
+
+    name = "export"
+
+    def __init__(self, run_time, batch_size=EXPORT_BATCH_SIZE):
+        super().__init__(batch_size)
+        self.run_time = run_time
+
+    def make_writer(self):
+        return ExportWriter(self.run_time)
+
+class Pipeline:
+    """抓取 → 排序 → 输出端 的流水线
+
+    用法：
+        pipeline = Pipeline(RankingStage(10), [ChangeSink(tracker), HistorySink(run_date)])
+        counts = await pipeline.run(lambda emit: scrape_all_sources(browser, emit))
+    producer 通过 await emit(order, product) 送出商品，order 是商品在完整结果中的排序键
+    """
+
+    def __init__(self, ranking, sinks, queue_size=PIPELINE_QUEUE_SIZE):
+        self.ranking = ranking
+        self.sinks = list(sinks)
+        self.queue_size = max(1, queue_size)
+        self.failures = {}
+        self._input = None
+        self._started = None
+        self._first_product = None
+
+    async def emit(self, order, product):
+        """送出一个商品；队列满时等待，抓取因此放慢"""
+        if self._first_product is None:
+            self._first_product = time.perf_counter() - self._started
+        if self._input.full():
+            metrics.count("pipeline_backpressure_waits_total")
+        await self._input.put((order, product))
+
+    async def _rank(self, sink_queues):
+        busy = 0.0
+        while True:
+            item = await self._input.get()
+            if item is _DONE:
+                break
+            order, product = item
+            start = time.perf_counter()
+            try:
+                self.ranking.add(order, product)
+            except Exception as e:
+                metrics.count("pipeline_errors_total", stage="ranking")
+                print(f"⚠️ 商品打分失败（{product.get('asin')}）: {e}")
+                continue
+            busy += time.perf_counter() - start
+            for queue in sink_queues:
+                await queue.put(product)
+        for queue in sink_queues:
+            await queue.put(_DONE)
+        metrics.record("ranking", busy)
+
+    async def _drain(self, sink, queue):
+        busy = 0.0
+        while True:
+            product = await queue.get()
+            if product is _DONE:
+                break
+            # 出错的输出端继续把队列读空，避免背压卡住整条流水线
+            if sink.name in self.failures:
+                continue
+            start = time.perf_counter()
+            try:
+                await sink.consume(product)
+            except Exception as e:
+                self.failures[sink.name] = e
+                metrics.count("pipeline_errors_total", stage=sink.name)
+                print(f"⚠️ 输出端 {sink.name} 失败，本轮不再写入: {e}")
+            busy += time.perf_counter() - start
+        metrics.record(sink.name, busy, "error" if sink.name in self.failures else "ok")
+
+    async def run(self, producer):
+        """运行 producer(emit)，等排序阶段和所有输出端都消费完后返回 producer 的返回值"""
+        self._started = time.perf_counter()
+        self._input = asyncio.Queue(self.queue_size)
+        sink_queues = [asyncio.Queue(self.queue_size) for _ in self.sinks]
+        ranker = asyncio.create_task(self._rank(sink_queues))
+        drains = [asyncio.create_task(self._drain(sink, queue)) for sink, queue in zip(self.sinks, sink_queues)]
+        try:
+            return await producer(self.emit)
+        finally:
+            await self._input.put(_DONE)
+            await ranker
+            await asyncio.gather(*drains)
+            if self._first_product is not None:
+                metrics.record("first_product", self._first_product)
+
+    async def close_sinks(self, commit=None):
+        """关闭所有输出端；commit 为 {输出端名称: 是否保留}，未列出的默认保留，出错的一律回滚"""
+        commit = commit or {}
+        results = {}
+        for sink in self.sinks:
+            keep = commit.get(sink.name, True) and sink.name not in self.failures
+            try:
+                results[sink.name] = await sink.close(keep)
+            except Exception as e:
+                self.failures[sink.name] = e
+                print(f"⚠️ 输出端 {sink.name} 关闭失败: {e}")
+        return results
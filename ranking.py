@@ -0,0 +1,175 @@
+"""
+商品排序引擎
+把增长率、名次和各地区格式的价格一次性解析成数值字段，按市场/榜单可配置的权重打分，
+用堆选出 TOP K，避免对字符串键反复全量排序
+"""
+
+import heapq
+import json
+import os
+import re
+
+# 打分权重：先找 "市场:榜单"，再找市场、榜单，最后用 default
+#   growth      增长率每 1000% 的得分
+#   new_entry   新进榜商品的基础分
+#   best_seller 热销榜商品的基础分
+#   rank        名次分（第 1 名为满分，第 100 名为 0）的权重
+#   breakout    历史趋势爆发分（analytics.py，约 -0.6~1）的权重，为 0 时不读历史库
+SCORING_WEIGHTS = {
+    "default": {"growth": 1.0, "new_entry": 1.0, "best_seller": 0.2, "rank": 0.01, "breakout": 0.0},
+}
+
+# 可选的权重覆盖文件（JSON，结构同 SCORING_WEIGHTS）
+SCORING_WEIGHTS_FILE = os.environ.get("SCORING_WEIGHTS", "")
+
+CURRENCY_SYMBOLS = {"$": "USD", "£": "GBP", "€": "EUR", "¥": "JPY"}
+
+_NUMBER_RE = re.compile(r"\d[\d.,\s  ]*")
+
+def parse_growth(growth):
+    """把 "+1,234%" 解析成 1234.0，非百分比或无法解析时返回 None"""
+    if "%" not in growth:
+        return None
+    match = _NUMBER_RE.search(growth)
+    if not match:
+        return None
+    value = parse_number(match.group())
+    if value is None:
+        return None
+    return -value if growth.strip().startswith("-") else value
+
+def parse_number(text):
+    """解析带千分位的数字，兼容 1,299.99 / 1.299,99 / 12,99 等写法"""
+    text = re.sub(r"[\s  ]", "", text).strip(".,")
+    if not text:
+        return None
+    if "," in text and "." in text:
+        # 两种分隔符都有时，后出现的是小数点
+        if text.rfind(",") > text.rfind("."):
+            text = text.replace(".", "").replace(",", ".")
+        else:
+            text = text.replace(",", "")
+    elif "," in text:
+        # 只有逗号：恰好两位小数视为小数点（12,99 €），否则是千分位
+        head, _, tail = text.rpartition(",")
+        text = f"{head.replace(',', '')}.{tail}" if len(tail) == 2 else text.replace(",", "")
+    elif text.count(".") > 1:
+        text = text.replace(".", "")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+def parse_price(price):
+    """把 "12,99 €" / "£9.99" / "$10.99 - $15.99" 解析成 (数值, 币种)，区间取下限"""
+    match = _NUMBER_RE.search(price)
+    if not match:
+        return None, None
+    currency = next((code for symbol, code in CURRENCY_SYMBOLS.items() if symbol in price), None)
+    return parse_number(match.group()), currency
+
+def load_weights(path=SCORING_WEIGHTS_FILE):
+    """合并默认权重与覆盖文件"""
+    weights = {key: dict(value) for key, value in SCORING_WEIGHTS.items()}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for key, value in json.load(f).items():
+                weights.setdefault(key, {}).update(value)
+    return weights
+
+def uses_breakout(weights):
+    """是否有任何一组权重启用了爆发分"""
+    return any(value.get("breakout") for value in weights.values())
+
+def weights_for(weights, market_key, chart):
+    """按 市场:榜单 > 市场 > 榜单 > default 的顺序合并出一组权重"""
+    merged = dict(weights["default"])
+    for key in (chart, market_key, f"{market_key}:{chart}"):
+        merged.update(weights.get(key, {}))
+    return merged
+
+def score_product(product, w):
+    """按一组已合并的权重计算单个商品的得分（越大越靠前）"""
+    rank = product.get("rank")
+    rank_score = max(0.0, (100 - rank) / 99) if rank else 0.0
+
+    if product["is_new"]:
+        base = w["new_entry"]
+    elif product["growth_pct"] is not None:
+        base = w["growth"] * product["growth_pct"] / 1000
+    elif product.get("chart") == "best_sellers":
+        base = w["best_seller"]
+    else:
+        base = 0.0
+    return base + w["rank"] * rank_score + w.get("breakout", 0.0) * (product.get("breakout") or 0.0)
+
+def prepare_product(product, w):
+    """解析单个商品的数值字段并按已合并的权重打分，结果写回商品字典"""
+    product["is_new"] = "新进榜" in product["growth"]
+    product["growth_pct"] = parse_growth(product["growth"])
+    product["price_value"], product["currency"] = parse_price(product["price"])
+    product["score"] = round(score_product(product, w), 6)
+    return product
+
+def prepare_products(products, weights=None):
+    """一次性解析数值字段并打分，结果写回商品字典"""
+    weights = weights or load_weights()
+    resolved = {}
+    for product in products:
+        if "score" in product:
+            continue
+        group = (product.get("market_key"), product.get("chart"))
+        if group not in resolved:
+            resolved[group] = weights_for(weights, *group)
+        prepare_product(product, resolved[group])
+    return products
+
+def top_k(products, k=10, weights=None):
+    """用堆选出得分最高的 k 个商品，同分时保持原有顺序"""
+    prepare_products(products, weights)
+    indexed = heapq.nlargest(
+        k,
+        enumerate(products),
+        key=lambda item: (item[1]["score"], -item[0])
+    )
+    return [product for _, product in indexed]
+
+class _Descending:
+    """反转比较方向，让堆在同分时淘汰 order 较大（排在后面）的商品"""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return self.key > other.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+class RunningTopK:
+    """流式 TOP K：商品逐个到达，只保留当前得分最高的 k 个
+
+    order 为商品在完整列表中的排序键（如 (市场序号, 榜单序号, 名次)），同分时 order 小的优先，
+    与对按 order 排好的完整列表调用 top_k 的结果一致
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+
+    def push(self, product, order):
+        """加入一个已打分的商品"""
+        item = (product["score"], _Descending(order), product)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, item)
+        elif self._heap[0] < item:
+            heapq.heapreplace(self._heap, item)
+
+    def entries(self):
+        """返回 [(order, product), ...]，得分从高到低"""
+        return [(desc.key, product) for _, desc, product in sorted(self._heap, reverse=True)]
+
+    def items(self):
+        return [product for _, product in self.entries()]
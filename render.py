@@ -0,0 +1,214 @@
+"""
+报告渲染层
+页面与卡片模板只预编译一次，输出经流式 writer 逐块写入文件；
+CSS 和 JS 发布为带内容指纹的共享静态文件，latest.html 直接复制当日报告而不是再渲染一次。
+TOP 商品在服务端渲染成卡片，全量商品目录（见 catalog.py）内嵌或写成旁路文件，由页面脚本渲染
+"""
+
+import hashlib
+import html
+import io
+import os
+import re
+import shutil
+
+from catalog import data_mode, encode_catalog
+from classifier import classify_product
+
+# 模板目录
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+# 报告目录下存放共享静态文件的子目录
+ASSET_DIR_NAME = "assets"
+
+_FIELD_RE = re.compile(r"\{\{(\w+)\}\}")
+
+class CompiledTemplate:
+    """预编译模板：加载时把 {{字段}} 占位符拆成 (文本, 字段) 片段，渲染时只做顺序写出"""
+
+    def __init__(self, source):
+        self.parts = []
+        pos = 0
+        for match in _FIELD_RE.finditer(source):
+            self.parts.append((source[pos:match.start()], match.group(1)))
+            pos = match.end()
+        self.tail = source[pos:]
+
+    @classmethod
+    def from_file(cls, name):
+        with open(os.path.join(TEMPLATE_DIR, name), encoding="utf-8") as f:
+            return cls(f.read())
+
+    def render_to(self, write, context):
+        """把渲染结果写给 write；字段值为可迭代对象（如生成器）时逐块写出"""
+        for literal, field in self.parts:
+            write(literal)
+            value = context[field]
+            if isinstance(value, (str, int, float)):
+                write(str(value))
+            else:
+                for chunk in value:
+                    write(chunk)
+        write(self.tail)
+
+    def render(self, context):
+        buffer = io.StringIO()
+        self.render_to(buffer.write, context)
+        return buffer.getvalue()
+
+_templates = {}
+
+def get_template(name):
+    """返回预编译好的模板（每个模板只编译一次）"""
+    if name not in _templates:
+        _templates[name] = CompiledTemplate.from_file(name)
+    return _templates[name]
+
+_asset_cache = {}
+
+def _asset(name):
+    """读取模板目录下的静态文件并计算内容指纹"""
+    if name not in _asset_cache:
+        with open(os.path.join(TEMPLATE_DIR, name), "rb") as f:
+            content = f.read()
+        _asset_cache[name] = (content, hashlib.sha256(content).hexdigest()[:10])
+    return _asset_cache[name]
+
+def publish_asset(report_dir, name):
+    """把静态文件发布到 <报告目录>/assets/<名称>.<指纹>.<扩展名>，返回相对引用路径"""
+    content, digest = _asset(name)
+    stem, ext = os.path.splitext(name)
+    filename = f"{stem}.{digest}{ext}"
+    asset_dir = os.path.join(report_dir, ASSET_DIR_NAME)
+    path = os.path.join(asset_dir, filename)
+    if not os.path.exists(path):
+        os.makedirs(asset_dir, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+    return f"{ASSET_DIR_NAME}/{filename}"
+
+def publish_css(report_dir):
+    return publish_asset(report_dir, "report.css")
+
+def also_listed(pick):
+    """合并选品（见 dedup.merge_picks）在其他市场 / 榜单上的表现，如 "🇬🇧 英国 Best Sellers #3 · 🇩🇪 德国 Movers & Shakers #5"；没有时返回空串"""
+    others = pick.get("signals", [])[1:]
+    return " · ".join(
+        f"{s['flag']} {s['market']} {s['source']}" + (f" #{s['rank']}" if s.get("rank") else "")
+        for s in others
+    )
+
+def iter_cards(products):
+    """逐个渲染商品卡片"""
+    card = get_template("card.html")
+    # 增长条按得分相对第一名的比例显示
+    top_score = max((product.get("score") or 0 for product in products), default=0)
+    for i, product in enumerate(products, 1):
+        # 每个商品只分类一次，同时得到营销建议和图标
+        category = classify_product(product)
+        tips = category.tips
+        also = also_listed(product)
+        yield card.render({
+            "icon": category.icon,
+            "index": i,
+            "flag": product["flag"],
+            "market": html.escape(product["market"]),
+            "name": html.escape(product["name"]),
+            "growth": html.escape(product["growth"]),
+            "price": html.escape(product["price"]),
+            "source": html.escape(product["source"]),
+            "bar_width": max(5, round(100 * (product.get("score") or 0) / top_score)) if top_score > 0 else 5,
+            "also_listed": f'<div class="also-listed">🌍 同时上榜：{html.escape(also)}</div>' if also else "",
+            "tip_selling": tips["卖点"],
+            "tip_audience": tips["人群"],
+            "tip_pricing": tips["定价"],
+            "tip_channel": tips["渠道"],
+        })
+
+def coverage_notice(notes):
+    """数据过期或不完整的市场提示块，没有时为空串"""
+    if not notes:
+        return ""
+    items = "".join(f"<li>{html.escape(note['text'])}</li>" for note in notes)
+    return f'<div class="coverage-notice"><strong>⚠️ 部分市场数据未更新或不完整</strong><ul>{items}</ul></div>'
+
+def browse_section(catalog_text, count, js_href, data_src=""):
+    """全量商品浏览区；catalog_text 为内嵌的目录 JSON，data_src 为旁路文件地址（二选一）"""
+    # 内嵌 JSON 中的 "<" 转义，商品名里的 </script> 不会提前结束数据块
+    island = ""
+    if catalog_text:
+        escaped = catalog_text.replace("<", "\\u003c")
+        island = f'        <script type="application/json" id="catalog-data">{escaped}</script>'
+
+    return get_template("browse.html").render({
+        "data_src": html.escape(data_src),
+        "count": count,
+        "data_island": island,
+        "js_href": js_href,
+    })
+
+def render_report(products, timestamp, write, css_href, market_count=3, notes=(), browse=""):
+    """把 TOP 商品渲染为完整 HTML 页面并流式写给 write；notes 为数据完整性提示，browse 为全量商品浏览区"""
+    # 计算最高增长率
+    max_growth = next((p["growth"] for p in products if "%" in p["growth"]), "新进榜")
+
+    get_template("report.html").render_to(write, {
+        "date": timestamp[:10],
+        "css_href": css_href,
+        "timestamp": timestamp,
+        "count": len(products),
+        "market_count": market_count,
+        "max_growth": html.escape(max_growth),
+        "coverage_notice": coverage_notice(notes),
+        "cards": iter_cards(products),
+        "browse": browse,
+    })
+
+def render_report_string(products, timestamp, css_href, market_count=3, notes=(), browse=""):
+    """渲染为字符串（不落盘时使用）"""
+    buffer = io.StringIO()
+    render_report(products, timestamp, buffer.write, css_href, market_count, notes, browse)
+    return buffer.getvalue()
+
+def sidecar_path(path):
+    """报告对应的旁路商品目录文件：hot_products_YYYYMMDD.html -> hot_products_YYYYMMDD.data.json"""
+    return f"{os.path.splitext(path)[0]}.data.json"
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def write_report(products, timestamp, path, market_count=3, notes=(), catalog=None, catalog_digest=""):
+    """流式写出报告文件：先写临时文件再原子替换，避免读到半个文件
+
+    catalog 为全量商品目录（catalog.ProductCatalog.table()），按 REPORT_DATA 内嵌进页面或写成旁路文件
+    """
+    report_dir = os.path.dirname(path) or "."
+    css_href = publish_css(report_dir)
+    count = len(catalog["rows"]) if catalog else 0
+    mode = data_mode(count) if count else "off"
+    browse = ""
+    if mode != "sidecar" and os.path.exists(sidecar_path(path)):
+        os.remove(sidecar_path(path))
+    if mode == "inline":
+        browse = browse_section(encode_catalog(catalog), count, publish_asset(report_dir, "report.js"))
+    elif mode == "sidecar":
+        data_path = sidecar_path(path)
+        _write_atomic(data_path, encode_catalog(catalog))
+        # 同一天多次运行会覆盖同名文件，带上内容哈希让浏览器缓存失效
+        data_src = os.path.basename(data_path) + (f"?v={catalog_digest}" if catalog_digest else "")
+        browse = browse_section("", count, publish_asset(report_dir, "report.js"), data_src)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        render_report(products, timestamp, f.write, css_href, market_count, notes, browse)
+    os.replace(tmp_path, path)
+    return path
+
+def publish_latest(path, latest_path):
+    """把当日报告复制为 latest.html（不再重新渲染）"""
+    tmp_path = f"{latest_path}.tmp"
+    shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, latest_path)
+    return latest_path
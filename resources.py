@@ -0,0 +1,136 @@
+"""
+浏览器请求拦截策略
+按资源类型和 URL 规则中止图片、字体、媒体和广告/统计请求，并统计节省的请求数与流量
+"""
+
+import asyncio
+import re
+from collections import Counter
+
+# 默认拦截的资源类型（我们只读取 DOM 文本）
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+
+# 默认拦截的广告 / 统计域名
+BLOCKED_URL_PATTERNS = [
+    r"amazon-adsystem\.com",
+    r"doubleclick\.net",
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"googlesyndication\.com",
+    r"scorecardresearch\.com",
+    r"facebook\.(com|net)",
+    r"fls-(na|eu|fe)\.amazon\.",
+    r"unagi(-na|-eu)?\.amazon\.",
+    r"/uedata",
+    r"/csm/",
+    r"/rd/uedata",
+]
+
+# 白名单：商品网格渲染需要的请求，命中时一律放行
+ALLOWED_URL_PATTERNS = [
+    r"/acp/p13n-",
+]
+
+# 被拦截请求的平均体积估算（字节），用于估算节省的流量
+ESTIMATED_BYTES = {
+    "image": 30_000,
+    "media": 200_000,
+    "font": 40_000,
+    "script": 25_000,
+    "xhr": 2_000,
+    "fetch": 2_000,
+    "ping": 500,
+}
+DEFAULT_ESTIMATED_BYTES = 5_000
+
+class ResourcePolicy:
+    """浏览器上下文的请求拦截策略"""
+
+    def __init__(self, blocked_types=None, blocked_patterns=None, allowed_patterns=None):
+        self.blocked_types = set(BLOCKED_RESOURCE_TYPES if blocked_types is None else blocked_types)
+        self.blocked_re = _compile(BLOCKED_URL_PATTERNS if blocked_patterns is None else blocked_patterns)
+        self.allowed_re = _compile(ALLOWED_URL_PATTERNS if allowed_patterns is None else allowed_patterns)
+        self.blocked = Counter()
+        self.loaded_requests = 0
+        self.loaded_bytes = 0
+        self._size_tasks = set()
+
+    def should_block(self, url, resource_type):
+        """判断请求是否应被中止"""
+        if self.allowed_re and self.allowed_re.search(url):
+            return False
+        if resource_type in self.blocked_types:
+            return True
+        return bool(self.blocked_re and self.blocked_re.search(url))
+
+    async def install(self, context):
+        """在浏览器上下文上注册拦截路由"""
+        await context.route("**/*", self._handle_route)
+        context.on("requestfinished", self._on_request_finished)
+
+    async def _handle_route(self, route):
+        request = route.request
+        try:
+            if self.should_block(request.url, request.resource_type):
+                self.blocked[request.resource_type] += 1
+                await route.abort()
+            else:
+                await route.continue_()
+        except Exception:
+            # 页面已关闭时路由会失效，忽略即可
+            pass
+
+    def _on_request_finished(self, request):
+        self.loaded_requests += 1
+        task = asyncio.ensure_future(self._record_size(request))
+        self._size_tasks.add(task)
+        task.add_done_callback(self._size_tasks.discard)
+
+    async def _record_size(self, request):
+        try:
+            sizes = await request.sizes()
+            self.loaded_bytes += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        except Exception:
+            pass
+
+    async def flush(self):
+        """等待尚未统计完的响应体积"""
+        if self._size_tasks:
+            await asyncio.gather(*self._size_tasks, return_exceptions=True)
+
+    def reset(self):
+        """清零统计（常驻浏览器在每轮运行结束后调用）"""
+        self.blocked.clear()
+        self.loaded_requests = 0
+        self.loaded_bytes = 0
+
+    def summary(self):
+        """返回拦截统计"""
+        blocked_requests = sum(self.blocked.values())
+        saved_bytes = sum(
+            ESTIMATED_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES) * count
+            for resource_type, count in self.blocked.items()
+        )
+        return {
+            "blocked_requests": blocked_requests,
+            "blocked_by_type": dict(self.blocked),
+            "estimated_saved_bytes": saved_bytes,
+            "loaded_requests": self.loaded_requests,
+            "loaded_bytes": self.loaded_bytes,
+        }
+
+    def print_summary(self):
+        """打印拦截统计"""
+        stats = self.summary()
+        by_type = ", ".join(f"{k} {v}" for k, v in sorted(stats["blocked_by_type"].items())) or "无"
+        print(
+            f"🛡️ 已拦截 {stats['blocked_requests']} 个请求（{by_type}），"
+            f"约节省 {stats['estimated_saved_bytes'] / 1024 / 1024:.1f} MB；"
+            f"实际加载 {stats['loaded_requests']} 个请求，"
+            f"{stats['loaded_bytes'] / 1024 / 1024:.1f} MB"
+        )
+
+def _compile(patterns):
+    """把多条规则合并为一个正则"""
+    patterns = list(patterns)
+    return re.compile("|".join(f"(?:{p})" for p in patterns)) if patterns else None
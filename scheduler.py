@@ -0,0 +1,227 @@
+"""
+截止时间感知的抓取调度
+整轮抓取有一个总截止时间，每个榜单 URL 有自己的时间预算（含重试）；失败后按指数退避加随机抖动重试，
+同一站点连续出现验证码、拦截（403/429/503）或超时达到阈值时熔断，剩余时间留给正常的市场。
+配置了会话池（见 sessions.py）时，每次尝试从池中租一个该站点健康分最高的会话，结果计入它的健康统计。
+每个榜单的结果记入 coverage，报告和通知据此标出数据过期或不完整的市场
+"""
+
+import asyncio
+import os
+import random
+import time
+
+from http_fetch import reason_kind
+from metrics import metrics
+
+# 整轮抓取的总时限（秒），到点后未开始的榜单直接跳过
+SCRAPE_DEADLINE = int(os.environ.get("SCRAPE_DEADLINE", "600"))
+
+# 单个榜单 URL 的时间预算（秒，含所有重试和退避）
+SCRAPE_URL_BUDGET = int(os.environ.get("SCRAPE_URL_BUDGET", "120"))
+
+# 单次尝试（HTTP 加浏览器回退）的时限上限（秒）
+SCRAPE_ATTEMPT_TIMEOUT = 45
+
+# 每个榜单最多尝试次数
+SCRAPE_MAX_ATTEMPTS = int(os.environ.get("SCRAPE_MAX_ATTEMPTS", "3"))
+
+# 重试退避（秒）：第 n 次重试在 [0, min(上限, 基数 × 2^(n-1))] 内随机等待
+SCRAPE_BACKOFF_BASE = 2.0
+SCRAPE_BACKOFF_MAX = 30.0
+
+# 同一站点连续失败多少次后熔断，熔断多久（秒）后放行一次试探请求
+BREAKER_THRESHOLD = int(os.environ.get("BREAKER_THRESHOLD", "3"))
+BREAKER_COOLDOWN = int(os.environ.get("BREAKER_COOLDOWN", "900"))
+
+# 计入熔断的失败类型（说明站点在限流或不可用）
+BREAKER_KINDS = {"captcha", "blocked", "timeout"}
+
+# 重试也不会好转的失败类型
+NO_RETRY_KINDS = {"http_error", "browser_unavailable"}
+
+# 剩余时间不足该值（秒）时不再发起新的尝试
+MIN_ATTEMPT_SECONDS = 1.0
+
+class CircuitBreaker:
+    """按站点（域名）计数的熔断器
+
+    closed：正常放行；连续失败达到阈值后 open：直接拒绝；
+    冷却时间过后 half-open：放行一次试探，成功则恢复，失败则重新计时
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self._hosts = {}
+
+    def _state(self, host):
+        return self._hosts.setdefault(host, {"failures": 0, "opened_at": None, "probing": False})
+
+    def is_open(self, host):
+        state = self._hosts.get(host)
+        return bool(state and state["opened_at"] is not None)
+
+    def allow(self, host):
+        """是否放行对该站点的请求"""
+        state = self._state(host)
+        if state["opened_at"] is None:
+            return True
+        if state["probing"] or time.monotonic() - state["opened_at"] < self.cooldown:
+            return False
+        state["probing"] = True
+        print(f"🔌 {host} 熔断冷却结束，放行一次试探请求")
+        return True
+
+    def success(self, host):
+        state = self._state(host)
+        if state["opened_at"] is not None:
+            print(f"🔌 {host} 已恢复，关闭熔断")
+        state.update(failures=0, opened_at=None, probing=False)
+
+    def failure(self, host, kind):
+        """记录一次失败；只有限流类失败计数，达到阈值时熔断；试探请求不论哪种失败都重新熔断"""
+        state = self._state(host)
+        if kind not in BREAKER_KINDS and not state["probing"]:
+            return
+        state["failures"] += 1
+        if state["probing"] or (state["opened_at"] is None and state["failures"] >= self.threshold):
+            state.update(opened_at=time.monotonic(), probing=False)
+            metrics.count("circuit_open_total", host=host, reason=kind)
+            print(f"🔌 {host} 连续 {state['failures']} 次失败（最近一次 {kind}），熔断 {self.cooldown} 秒")
+
+    def abandon(self, host):
+        """试探请求没有结果（被取消）时收回试探名额，下次 allow() 重新放行一次试探"""
+        state = self._hosts.get(host)
+        if state:
+            state["probing"] = False
+
+_default_breaker = None
+
+def get_breaker():
+    """返回进程内共享的熔断器（守护进程多轮之间保留熔断状态）"""
+    global _default_breaker
+    if _default_breaker is None:
+        _default_breaker = CircuitBreaker()
+    return _default_breaker
+
+class ScrapeScheduler:
+    """为每个榜单分配时间预算并负责重试、熔断与结果登记
+
+    用法：
+        scheduler = ScrapeScheduler()
+        cards = await scheduler.run(("usa", "best_sellers"), "www.amazon.com", semaphore, attempt)
+    attempt(timeout, session) 为单次尝试，返回 (结果, 失败原因)，失败原因为 None 表示成功；
+    session 为本次租到的会话（没有会话池时为 None）
+    """
+
+    def __init__(self, deadline=SCRAPE_DEADLINE, url_budget=SCRAPE_URL_BUDGET,
+                 max_attempts=SCRAPE_MAX_ATTEMPTS, breaker=None, sessions=None):
+        self.deadline = time.monotonic() + deadline
+        self.url_budget = url_budget
+        self.max_attempts = max(1, max_attempts)
+        self.breaker = breaker or get_breaker()
+        self.sessions = sessions
+        # (market_key, chart_key) -> {"status": ok / failed / skipped, "reason", "attempts", "elapsed"}
+        self.coverage = {}
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def _record(self, key, status, reason, attempts, started):
+        self.coverage[key] = {
+            "status": status,
+            "reason": reason,
+            "attempts": attempts,
+            "elapsed": round(time.monotonic() - started, 3) if started else 0.0,
+        }
+        if status != "ok":
+            metrics.count("charts_incomplete_total", market=key[0], chart=key[1], status=status)
+
+    async def run(self, key, host, semaphore, attempt, size=len):
+        """按预算执行 attempt，成功返回其结果，放弃时返回 None（原因记入 coverage）；size(result) 为记入会话的条目数"""
+        started = None
+        budget_end = None
+        reason = None
+        attempts = 0
+        while attempts < self.max_attempts:
+            async with semaphore:
+                # 排队等并发名额的时间不计入该 URL 的预算，但计入总截止时间
+                if started is None:
+                    started = time.monotonic()
+                    budget_end = min(self.deadline, started + self.url_budget)
+                # 先看时间再问熔断器，免得拿到试探名额却不发请求
+                timeout = min(SCRAPE_ATTEMPT_TIMEOUT, budget_end - time.monotonic())
+                if timeout < MIN_ATTEMPT_SECONDS:
+                    expired = "总截止时间已到" if self.remaining() < MIN_ATTEMPT_SECONDS else "时间预算用完"
+                    self._record(key, "skipped" if attempts == 0 else "failed", reason or expired, attempts, started)
+                    return None
+                if not self.breaker.allow(host):
+                    self._record(key, "skipped", reason or f"{host} 已熔断", attempts, started)
+                    return None
+                # 熔断状态下被放行的就是试探请求
+                probe = self.breaker.is_open(host)
+
+                attempts += 1
+                session = self.sessions.lease(host) if self.sessions else None
+                attempt_started = time.monotonic()
+                try:
+                    result, reason = await asyncio.wait_for(attempt(timeout, session), timeout)
+                except asyncio.TimeoutError:
+                    result, reason = None, f"timeout: 超过 {timeout:.0f} 秒"
+                except BaseException:
+                    # 被取消等情况只归还会话和试探名额，不计入健康统计
+                    if probe:
+                        self.breaker.abandon(host)
+                    if session:
+                        self.sessions.release(session)
+                    raise
+                if session:
+                    self.sessions.release(
+                        session, time.monotonic() - attempt_started,
+                        reason_kind(reason) if reason else None, size(result) if result else 0,
+                    )
+
+            if reason is None:
+                self.breaker.success(host)
+                self._record(key, "ok", None, attempts, started)
+                return result
+
+            kind = reason_kind(reason)
+            self.breaker.failure(host, kind)
+            metrics.count("scrape_attempt_failures_total", market=key[0], chart=key[1], kind=kind)
+            if kind in NO_RETRY_KINDS or attempts >= self.max_attempts:
+                break
+
+            # 指数退避 + 全量随机抖动；退避后已没有时间再试时直接放弃
+            delay = random.uniform(0, min(SCRAPE_BACKOFF_MAX, SCRAPE_BACKOFF_BASE * 2 ** (attempts - 1)))
+            if time.monotonic() + delay + MIN_ATTEMPT_SECONDS >= budget_end:
+                break
+            metrics.count("scrape_retries_total", market=key[0], chart=key[1])
+            print(f"  🔁 {key[0]} {key[1]} 第 {attempts} 次失败（{reason}），{delay:.1f} 秒后重试")
+            await asyncio.sleep(delay)
+
+        self._record(key, "failed", reason, attempts, started)
+        return None
+
+def market_coverage(coverage, markets, charts):
+    """按市场汇总各榜单结果
+
+    返回 {market_key: {"status": ok / partial / stale, "missing": [(chart_key, 原因), ...]}}；
+    partial 表示部分榜单没拿到，stale 表示一个榜单都没拿到（报告里只有旧数据）
+    """
+    summary = {}
+    for market_key in markets:
+        missing = [
+            (chart_key, coverage.get((market_key, chart_key), {}).get("reason") or "未抓取")
+            for chart_key in charts
+            if coverage.get((market_key, chart_key), {}).get("status") != "ok"
+        ]
+        if not missing:
+            status = "ok"
+        elif len(missing) == len(charts):
+            status = "stale"
+        else:
+            status = "partial"
+        summary[market_key] = {"status": status, "missing": missing}
+    return summary
@@ -2,14 +2,40 @@
 海外爆款选品自动抓取脚本
 使用 Playwright 抓取 Amazon 热销榜数据，生成 HTML 报告
 支持飞书推送通知
+
+用法：
+    python scraper.py            # 抓取、渲染并推送（同 all）
+    python scraper.py scrape     # 只抓取，保存运行快照
+    python scraper.py render     # 用运行快照重新生成报告
+    python scraper.py notify     # 用运行快照重新推送飞书通知
+    python scraper.py --daemon   # 常驻运行
+
+Playwright、requests、NumPy 等重依赖都在用到它们的函数里导入，
+render / notify 不启动浏览器，也不需要安装 Playwright
 """
 
+import argparse
 import asyncio
 import json
 import os
-import requests
+import signal
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from playwright.async_api import async_playwright
+from urllib.parse import urlsplit
+
+from changes import content_hash, get_tracker, write_github_output
+from classifier import classify_product
+from metrics import metrics
+from export import EXPORT_FORMATS
+from archive import archive_report
+from catalog import REPORT_DATA, catalog_digest
+from pipeline import CatalogSink, ChangeSink, ExportSink, HistorySink, Pipeline, RankingStage
+from history import HISTORY_DB, connect as history_connect, last_snapshot_dates
+from ranking import load_weights, uses_breakout
+from render import publish_css, publish_latest, render_report_string, write_report
+from snapshot import RUN_SNAPSHOT, load_snapshot, save_snapshot
+from extractor import MAX_ITEMS_PER_CHART, PAGE_DEADLINE_MS, extract_cards, parse_rank, wait_for_product_grid
 
 # GitHub Pages 报告地址
 REPORT_URL = "https://xiaocaioh14-arch.github.io/hot-picks/reports/latest.html"
@@ -36,571 +62,714 @@ DATA_SOURCES = {
     }
 }
 
-async def scrape_amazon_movers_shakers(page, url, market_info):
-    """抓取 Amazon Movers & Shakers 页面"""
-    products = []
-    try:
-        await page.goto(url, timeout=30000)
-        await page.wait_for_timeout(3000)
-        
-        # 滚动页面加载更多内容
-        for _ in range(3):
-            await page.mouse.wheel(0, 800)
-            await page.wait_for_timeout(1000)
+# 市场信息里带上自身的 key，方便商品记录所属市场
+for _market_key, _market_info in DATA_SOURCES.items():
+    _market_info.setdefault("key", _market_key)
+
+# 同时打开的页面数上限（设为 1 即退回逐页抓取）
+SCRAPE_CONCURRENCY = int(os.environ.get("SCRAPE_CONCURRENCY", "4"))
+
+# 抓取通道：auto（先 HTTP，失败回退浏览器）/ http（只用 HTTP）/ browser（只用浏览器）
+FETCH_BACKEND = os.environ.get("FETCH_BACKEND", "auto")
+
+# 本地替身服务器地址（见 standin_server.py），设置后所有榜单 URL 都指向它
+AMAZON_STANDIN_URL = os.environ.get("AMAZON_STANDIN_URL", "")
+
+# 榜单类型 -> 显示名称
+CHART_LABELS = {
+    "movers_shakers": "Movers & Shakers",
+    "best_sellers": "Best Sellers",
+}
+
+# 是否拦截图片、字体、媒体和广告统计请求（设为 0 关闭）
+BLOCK_RESOURCES = os.environ.get("BLOCK_RESOURCES", "1") != "0"
+
+# 守护进程模式下两轮运行之间的间隔（秒）
+DAEMON_INTERVAL = int(os.environ.get("DAEMON_INTERVAL", "3600"))
+
+# 参与卡片哈希的字段（extractor 提取出的全部字段）
+CARD_HASH_FIELDS = ("asin", "name", "price", "growth", "rank", "rating", "link")
+
+def iter_products(cards, chart_key, market_info):
+    """把提取到的卡片字典逐个转换成报告使用的商品字典"""
+    tags = {"market": market_info["key"], "chart": chart_key}
+    metrics.count("items_found_total", len(cards), **tags)
+    
+    kept = 0
+    for i, card in enumerate(cards):
+        name = card["name"] or "未知商品"
+        rank = parse_rank(card["rank"], i + 1)
         
-        # 提取商品信息
-        items = await page.query_selector_all('[data-asin]')
+        if chart_key == "movers_shakers":
+            # 只有带百分比的才算增长率
+            growth = card["growth"] if "%" in card["growth"] else "新进榜"
+        else:
+            growth = f"#{rank} 热销"
         
-        for i, item in enumerate(items[:15]):  # 取前15个
-            try:
-                name_el = await item.query_selector('span.a-size-base-plus, span.a-size-medium, .a-link-normal span')
-                price_el = await item.query_selector('.a-price .a-offscreen, .a-price-whole')
-                rank_el = await item.query_selector('.a-badge-text, .a-size-small')
-                
-                name = await name_el.inner_text() if name_el else "未知商品"
-                price = await price_el.inner_text() if price_el else "价格待定"
-                
-                # 尝试提取增长率
-                growth = "新进榜"
-                growth_el = await item.query_selector('.a-size-small.a-color-success, .a-color-success')
-                if growth_el:
-                    growth_text = await growth_el.inner_text()
-                    if '%' in growth_text:
-                        growth = growth_text
-                
-                if name and len(name) > 5:
-                    products.append({
-                        "name": name[:80],
-                        "price": price,
-                        "growth": growth,
-                        "market": market_info["name"],
-                        "flag": market_info["flag"],
-                        "source": "Movers & Shakers"
-                    })
-            except Exception as e:
-                continue
-                
-    except Exception as e:
-        print(f"抓取 {market_info['name']} Movers & Shakers 失败: {e}")
+        if name and len(name) > 5:
+            kept += 1
+            yield {
+                "name": name[:80],
+                "price": card["price"] or "价格待定",
+                "growth": growth,
+                "rank": rank,
+                "rating": card["rating"],
+                "asin": card["asin"],
+                "link": card["link"],
+                "market": market_info["name"],
+                "market_key": market_info["key"],
+                "flag": market_info["flag"],
+                "chart": chart_key,
+                "source": CHART_LABELS[chart_key]
+            }
+        else:
+            metrics.count("items_dropped_total", reason="short_name", **tags)
     
-    return products
+    metrics.count("items_kept_total", kept, **tags)
 
-async def scrape_amazon_best_sellers(page, url, market_info):
-    """抓取 Amazon Best Sellers 页面"""
-    products = []
+def cards_to_products(cards, chart_key, market_info):
+    """把提取到的卡片字典转换成商品列表"""
+    return list(iter_products(cards, chart_key, market_info))
+
+async def scrape_chart_page(page, url, chart_key, market_key, timeout):
+    """用浏览器页面抓取单个榜单，返回 (cards, reason)；reason 不为 None 表示失败
+
+    页面跳转和懒加载等待都限制在 timeout 秒内
+    """
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+    from http_fetch import detect_block
+    
+    tags = {"market": market_key, "chart": chart_key}
+    deadline = time.monotonic() + timeout
     try:
-        await page.goto(url, timeout=30000)
-        await page.wait_for_timeout(3000)
+        with metrics.span("goto", **tags):
+            response = await page.goto(url, timeout=timeout * 1000, wait_until="domcontentloaded")
+        reason = detect_block(response.status if response else 200, "")
+        # 验证码页通常就在原 URL 上以 200 返回，看表单而不是只看跳转后的地址，免得白等满商品网格的时限
+        if reason is None and (
+            "validateCaptcha" in page.url or await page.query_selector('form[action*="validateCaptcha"]')
+        ):
+            reason = "captcha"
+        if reason:
+            return [], reason
+        
+        # 等待商品网格出现，并滚动到懒加载商品不再增长（最多用到剩余时间）
+        remaining_ms = max(1, int((deadline - time.monotonic()) * 1000))
+        with metrics.span("wait_grid", **tags):
+            await wait_for_product_grid(page, chart_key, MAX_ITEMS_PER_CHART, min(PAGE_DEADLINE_MS, remaining_ms))
         
-        # 滚动页面
-        for _ in range(3):
-            await page.mouse.wheel(0, 800)
-            await page.wait_for_timeout(1000)
+        # 一次往返提取所有商品卡片
+        with metrics.span("extract", **tags):
+            cards = await extract_cards(page, chart_key, MAX_ITEMS_PER_CHART)
+    except PlaywrightTimeoutError as e:
+        return [], f"timeout: {e}"
+    except Exception as e:
+        return [], f"browser error: {e}"
+    return (cards, None) if cards else ([], "empty grid")
+
+def source_url(url):
+    """配置了替身服务器时，把 Amazon URL 改写为指向替身服务器"""
+    if not AMAZON_STANDIN_URL:
+        return url
+    parts = urlsplit(url)
+    return f"{AMAZON_STANDIN_URL.rstrip('/')}/{parts.netloc}{parts.path}"
+
+class LazyBrowser:
+    """按需启动的浏览器，只有 HTTP 通道回退时才启动 Chromium
+    
+    每个会话（见 sessions.py）一个上下文，使用会话自己的指纹、代理和 cookies；不带会话时共用一个默认上下文
+    """
+    
+    def __init__(self, block_resources=BLOCK_RESOURCES):
+        self.block_resources = block_resources
+        self.resource_policy = None
+        self._playwright = None
+        self._browser = None
+        # 会话 id（默认上下文为 None）-> (上下文, 会话)
+        self._contexts = {}
+        self._launch_error = None
+        self._lock = asyncio.Lock()
+    
+    async def get_context(self, session=None):
+        """返回该会话的浏览器上下文，首次调用时启动浏览器（启动失败后不再重试）"""
+        async with self._lock:
+            if self._launch_error:
+                raise self._launch_error
+            if self._browser is None:
+                try:
+                    await self._launch()
+                except Exception as e:
+                    self._launch_error = e
+                    raise
+            key = session.id if session else None
+            if key not in self._contexts:
+                self._contexts[key] = (await self._new_context(session), session)
+            return self._contexts[key][0]
+    
+    @asynccontextmanager
+    async def page(self, market_key=None, session=None):
+        """借出一个新页面，用完自动关闭（不带会话时所有市场共用一个上下文）"""
+        context = await self.get_context(session)
+        page = await context.new_page()
+        try:
+            yield page
+        finally:
+            await page.close()
+    
+    async def _launch(self):
+        from playwright.async_api import async_playwright
+        from resources import ResourcePolicy
         
-        # 提取商品信息
-        items = await page.query_selector_all('.p13n-sc-uncoverable-faceout, [data-asin]')
+        print("🌐 启动 Chromium...")
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        # 只读取 DOM 文本，拦截不需要的资源
+        if self.block_resources:
+            self.resource_policy = ResourcePolicy()
+    
+    async def _new_context(self, session):
+        from http_fetch import USER_AGENT
         
-        for i, item in enumerate(items[:10]):
+        options = session.context_options() if session else {"user_agent": USER_AGENT}
+        context = await self._browser.new_context(**options)
+        if self.resource_policy:
+            await self.resource_policy.install(context)
+        return context
+    
+    async def _save_state(self):
+        """把各会话上下文的 cookies 和 localStorage 合并回会话，由会话池保存"""
+        for context, session in self._contexts.values():
+            if session is None:
+                continue
             try:
-                name_el = await item.query_selector('._cDEzb_p13n-sc-css-line-clamp-1_1Fn1y, .a-link-normal span, .a-size-base-plus')
-                price_el = await item.query_selector('.a-price .a-offscreen, ._cDEzb_p13n-sc-price_3mJ9Z')
-                rating_el = await item.query_selector('.a-icon-alt, .a-size-small')
-                
-                name = await name_el.inner_text() if name_el else "未知商品"
-                price = await price_el.inner_text() if price_el else "价格待定"
-                
-                if name and len(name) > 5:
-                    products.append({
-                        "name": name[:80],
-                        "price": price,
-                        "growth": f"#{i+1} 热销",
-                        "market": market_info["name"],
-                        "flag": market_info["flag"],
-                        "source": "Best Sellers"
-                    })
+                session.merge_storage_state(await context.storage_state())
             except Exception as e:
-                continue
-                
+                print(f"⚠️ 读取会话 {session.id} 的 storage state 失败: {e}")
+    
+    async def close(self):
+        """关闭浏览器（未启动时什么也不做）"""
+        if self.resource_policy:
+            await self.resource_policy.flush()
+            self.resource_policy.print_summary()
+            stats = self.resource_policy.summary()
+            for resource_type, count in stats["blocked_by_type"].items():
+                metrics.count("blocked_requests_total", count, type=resource_type)
+            metrics.count("loaded_bytes_total", stats["loaded_bytes"])
+        if self._browser:
+            await self._save_state()
+            await self._browser.close()
+        if self._playwright:
+            await self._playwright.stop()
+    
+    async def finish_run(self):
+        """单次运行结束即关闭浏览器"""
+        await self.close()
+
+async def fetch_chart_cards(browser, chart_key, url, market_info, timeout, session=None):
+    """单次尝试抓取一个榜单：先走 HTTP 通道，遇到验证码、空榜单或被拦截时再用浏览器页面，返回 (cards, reason)
+    
+    session 为调度器租到的会话（见 sessions.py），两条通道都使用它的指纹、代理和 cookies
+    """
+    from http_fetch import BLOCK_KINDS, HTTP_TIMEOUT, fetch_cards, reason_kind
+    
+    label = CHART_LABELS[chart_key]
+    tags = {"market": market_info["key"], "chart": chart_key}
+    http_reason = None
+    if FETCH_BACKEND in ("auto", "http"):
+        with metrics.span("http_fetch", **tags):
+            cards, http_reason = await fetch_cards(
+                url, chart_key, MAX_ITEMS_PER_CHART, min(HTTP_TIMEOUT, timeout), session.http() if session else None
+            )
+        if http_reason is None or FETCH_BACKEND == "http":
+            return cards, http_reason
+        metrics.count("http_fallbacks_total", reason=reason_kind(http_reason), **tags)
+        print(f"  ↪️ {market_info['name']} {label} HTTP 通道失败（{http_reason}），改用浏览器")
+    
+    try:
+        async with browser.page(market_info["key"], session) as page:
+            cards, reason = await scrape_chart_page(page, url, chart_key, market_info["key"], timeout)
     except Exception as e:
-        print(f"抓取 {market_info['name']} Best Sellers 失败: {e}")
+        cards, reason = [], f"browser unavailable: {e}"
+    else:
+        if reason:
+            metrics.count("scrape_errors_total", backend="browser", **tags)
+    # 浏览器没有给出自己的拦截原因时保留 HTTP 通道的验证码 / 拦截原因，熔断和会话健康分才看得到限流
+    if reason and http_reason and reason_kind(http_reason) in BLOCK_KINDS and reason_kind(reason) not in BLOCK_KINDS:
+        reason = http_reason
+    return cards, reason
+
+def count_reused(cards, products, chart_key, market_key):
+    """沿用上一轮商品时补记 iter_products 会记的卡片数量指标"""
+    tags = {"market": market_key, "chart": chart_key}
+    metrics.count("items_found_total", len(cards), **tags)
+    if len(cards) > len(products):
+        metrics.count("items_dropped_total", len(cards) - len(products), reason="short_name", **tags)
+    metrics.count("items_kept_total", len(products), **tags)
+
+async def scrape_chart(browser, scheduler, semaphore, chart_key, url, market_info, chart_cache=None):
+    """在调度器的时间预算内抓取单个榜单（失败按退避重试，站点熔断时跳过），逐个产出商品
+    
+    卡片整页取回后才开始产出；下游处理不过来时产出会被阻塞，抓取自然放慢。
+    chart_cache 只由守护进程传入：{(市场, 榜单): {"hash": 卡片哈希, "weights": 打分权重, "products": 已打分的商品}}，
+    卡片和权重都没变时直接沿用上一轮的商品，不再转换、分类和打分；单次运行不缓存，商品流过即释放
+    """
+    host = urlsplit(DATA_SOURCES[market_info["key"]][chart_key]).netloc
+    cards = await scheduler.run(
+        (market_info["key"], chart_key),
+        host,
+        semaphore,
+        lambda timeout, session: fetch_chart_cards(browser, chart_key, url, market_info, timeout, session),
+    )
+    if cards is None:
+        outcome = scheduler.coverage[(market_info["key"], chart_key)]
+        print(f"抓取 {market_info['name']} {CHART_LABELS[chart_key]} 失败: {outcome['reason']}")
+        return
+    if chart_cache is None:
+        for product in iter_products(cards, chart_key, market_info):
+            yield product
+        return
+    
+    # 榜单内容和权重与上一轮相同时沿用已打分的商品（复制一份，下游改动不影响缓存）；
+    # 爆发分是否变化由 RankingStage 逐个核对
+    key = (market_info["key"], chart_key)
+    digest = content_hash(cards, CARD_HASH_FIELDS)
+    weights = load_weights()
+    cached = chart_cache.get(key)
+    if cached and cached["hash"] == digest and cached["weights"] == weights \
+            and all("score" in product for product in cached["products"]):
+        metrics.count("charts_reused_total", market=key[0], chart=chart_key)
+        count_reused(cards, cached["products"], chart_key, key[0])
+        for product in cached["products"]:
+            yield dict(product)
+        return
+    products = []
+    for product in iter_products(cards, chart_key, market_info):
+        # 流过 RankingStage 时原地打分，下一轮即可沿用
+        products.append(product)
+        yield product
+    chart_cache[key] = {"hash": digest, "weights": weights, "products": products}
+
+async def scrape_all_sources(browser, emit, concurrency=SCRAPE_CONCURRENCY, scheduler=None, chart_cache=None):
+    """并发抓取所有 (市场, 榜单) 组合，商品通过 await emit(order, product) 逐个送出
+    
+    order = (市场序号, 榜单序号, 深度, 页面 URL, 页内序号)，与 DATA_SOURCES 顺序一致，
+    保证排序结果与抓取完成先后无关；各榜单的成败记入 scheduler.coverage；chart_cache 见 scrape_chart；
+    返回 [((market_key, 榜单名称), 商品数), ...]
+    """
+    from scheduler import ScrapeScheduler
+    
+    scheduler = scheduler or ScrapeScheduler()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    jobs = [
+        (market_index, market_key, chart_index, chart_key)
+        for market_index, market_key in enumerate(DATA_SOURCES)
+        for chart_index, chart_key in enumerate(CHART_LABELS)
+    ]
+    print(
+        f"📊 并发抓取 {len(jobs)} 个榜单（并发上限 {max(1, concurrency)}，通道 {FETCH_BACKEND}，"
+        f"总时限 {max(0, scheduler.remaining()):.0f} 秒）..."
+    )
+    
+    async def run_job(market_index, market_key, chart_index, chart_key):
+        url = source_url(DATA_SOURCES[market_key][chart_key])
+        count = 0
+        async for product in scrape_chart(
+            browser, scheduler, semaphore, chart_key, url, DATA_SOURCES[market_key], chart_cache
+        ):
+            await emit((market_index, chart_index, 0, "", count), product)
+            count += 1
+        return count
+    
+    counts = await asyncio.gather(*(run_job(*job) for job in jobs))
+    return [
+        ((market_key, CHART_LABELS[chart_key]), count)
+        for (_, market_key, _, chart_key), count in zip(jobs, counts)
+    ]
+
+async def crawl_all_sources(emit, scheduler=None):
+    """按类目树爬取所有市场的两个榜单，商品通过 emit 逐个送出
+    
+    scheduler 同 scrape_all_sources，每个类目页都在它的预算和熔断之内抓取；
+    返回结构与 scrape_all_sources 相同，每个 (市场, 榜单) 统计其下所有类目页的商品数
+    """
+    from crawler import CategoryCrawler, journal_path_for
+    
+    crawler = CategoryCrawler(
+        DATA_SOURCES,
+        CHART_LABELS,
+        cards_to_products,
+        rewrite=source_url,
+        journal_path=journal_path_for(datetime.now().strftime("%Y%m%d")),
+        emit=emit,
+        scheduler=scheduler,
+    )
+    pages = await crawler.run()
+    print(f"🕸️ 共完成 {len(pages)} 个类目页面")
     
-    return products
+    counts = {}
+    for record in pages:
+        key = (record["market_key"], record["chart"])
+        counts[key] = counts.get(key, 0) + record["product_count"]
+    return [
+        ((market_key, CHART_LABELS[chart_key]), counts.get((market_key, chart_key), 0))
+        for market_key in DATA_SOURCES
+        for chart_key in CHART_LABELS
+    ]
 
 def generate_marketing_tips(product):
-    """生成营销建议"""
-    name = product["name"].lower()
-    
-    # 根据商品类别生成不同建议
-    if any(kw in name for kw in ["airpods", "headphone", "earbuds", "bluetooth"]):
-        return {
-            "卖点": "音质清晰 + 无线便携 + 长续航",
-            "人群": "通勤族、运动爱好者、远程办公人群",
-            "定价": "突出性价比，对标品牌价格8折",
-            "渠道": "短视频开箱测评、科技博主合作"
-        }
-    elif any(kw in name for kw in ["kitchen", "scale", "cooking"]):
-        return {
-            "卖点": "精准便捷 + 厨房必备 + 高性价比",
-            "人群": "烘焙爱好者、健康饮食人群、新手厨师",
-            "定价": "低价引流款，建议¥39-69",
-            "渠道": "美食博主搭配食谱推荐"
-        }
-    elif any(kw in name for kw in ["soap", "clean", "wash"]):
-        return {
-            "卖点": "天然成分 + 香氛怡人 + 环保补充装",
-            "人群": "注重生活品质的家庭用户",
-            "定价": "中端价位¥39-59",
-            "渠道": "家居生活类 KOL、小红书种草"
-        }
-    elif any(kw in name for kw in ["skincare", "toner", "pad", "beauty"]):
-        return {
-            "卖点": "韩国护肤科技 + 毛孔清洁神器",
-            "人群": "18-35岁女性、韩妆爱好者",
-            "定价": "中高端¥99-169",
-            "渠道": "美妆博主测评、抖音带货直播"
-        }
-    elif any(kw in name for kw in ["dumbbell", "fitness", "sport", "gym"]):
-        return {
-            "卖点": "舒适握感 + 家用健身必备",
-            "人群": "居家健身人群、健身初学者",
-            "定价": "性价比路线¥59-99",
-            "渠道": "健身博主推荐、运动类社群"
-        }
-    elif any(kw in name for kw in ["bottle", "water", "cup"]):
-        return {
-            "卖点": "保温保冷 + 便携设计 + 高颜值",
-            "人群": "户外运动爱好者、上班族",
-            "定价": "中端¥89-159",
-            "渠道": "运动户外社群、健身房合作"
-        }
-    elif any(kw in name for kw in ["case", "cover", "protect"]):
-        return {
-            "卖点": "保护设备 + 多款颜色 + 超低价",
-            "人群": "数码产品用户、配件收集者",
-            "定价": "低价爆款¥19.9-39.9",
-            "渠道": "电商首页推荐、买正品送配件活动"
-        }
-    else:
-        return {
-            "卖点": "品质保证 + 性价比高",
-            "人群": "大众消费者",
-            "定价": "参考市场同类产品定价",
-            "渠道": "多平台推广、社交媒体种草"
-        }
+    """生成营销建议（按 categories.json 中的类目规则）"""
+    return classify_product(product).tips
 
 def generate_html_report(products, timestamp):
-    """生成 HTML 报告"""
+    """生成 HTML 报告（返回字符串，CSS 引用 reports/assets 下的共享样式）"""
+    from dedup import top_unique
     
-    # 按增长率排序（新进榜排前面）
-    def sort_key(p):
-        if "新进榜" in p["growth"]:
-            return 0
-        elif "%" in p["growth"]:
+    # 按得分选出 TOP 10（新进榜和高增长排前面），同一商品在多个市场 / 榜单上榜时只占一个位置
+    top_products = top_unique(products, 10)
+    return render_report_string(top_products, timestamp, publish_css("reports"), len(DATA_SOURCES))
+
+def coverage_notes(summary):
+    """把各市场的抓取结果整理成报告和通知里的提示，返回 [{"market_key", "text"}]，数据完整时为空
+
+    stale：本轮一个榜单都没拿到，报告中该市场只有此前的数据；partial：缺少部分榜单
+    """
+    incomplete = {key: item for key, item in summary.items() if item["status"] != "ok"}
+    if not incomplete:
+        return []
+    last_dates = {}
+    if os.path.exists(HISTORY_DB):
+        try:
+            conn = history_connect(HISTORY_DB)
             try:
-                return 1 - int(p["growth"].replace("%", "").replace("+", "")) / 1000
-            except:
-                return 0.5
+                last_dates = last_snapshot_dates(conn)
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"⚠️ 读取历史库最近日期失败: {e}")
+    
+    notes = []
+    for market_key, item in incomplete.items():
+        market = DATA_SOURCES[market_key]
+        reasons = "；".join(f"{CHART_LABELS[chart_key]}: {reason}" for chart_key, reason in item["missing"])
+        if item["status"] == "stale":
+            last = max((last_dates.get((market_key, chart_key)) or "" for chart_key in CHART_LABELS), default="")
+            since = f"，最近一次成功 {last}" if last else ""
+            text = f"{market['flag']} {market['name']}：本轮未取得数据{since}（{reasons}）"
         else:
-            return 0.8
+            text = f"{market['flag']} {market['name']}：数据不完整（{reasons}）"
+        notes.append({"market_key": market_key, "text": text})
+        print(f"⚠️ {text}")
+    return notes
+
+def load_breakout_signals():
+    """权重启用了 breakout 时读取历史趋势爆发分（按需导入 NumPy），否则返回空"""
+    if not uses_breakout(load_weights()):
+        return {}
+    try:
+        from analytics import breakout_signals
+        with metrics.span("analytics"):
+            signals = breakout_signals()
+    except Exception as e:
+        print(f"⚠️ 计算爆发分失败，本轮不按趋势加权: {e}")
+        return {}
+    print(f"📈 已计算 {len(signals)} 个商品的历史爆发分")
+    return signals
+
+async def scrape_stage(browser, chart_cache=None):
+    """抓取阶段：抓取、排序、写历史库和全量导出，选出 TOP 并保存运行快照
     
-    products.sort(key=sort_key)
-    top_products = products[:10]
+    抓取到的商品经流水线逐个打分并写入历史库，只保留 TOP K，不再汇总成完整列表；
+    browser 为 LazyBrowser（单次运行）或 BrowserPool（守护进程），本轮结束时调用其 finish_run()；
+    chart_cache 为守护进程跨轮保留的已打分商品（见 scrape_chart），单次运行为 None；
+    返回运行快照（见 snapshot.py），render_stage / notify_stage 只依赖它；
+    一个榜单都没抓到时不覆盖上次的快照，返回 None
+    """
+    from crawler import CRAWL_DEPTH
+    from dedup import DEDUP_HEADROOM, top_unique
+    from notifier import load_targets
+    from scheduler import ScrapeScheduler, market_coverage
+    from sessions import get_session_pool
     
-    # 生成商品卡片 HTML
-    cards_html = ""
-    for i, product in enumerate(top_products, 1):
-        tips = generate_marketing_tips(product)
-        
-        # 选择图标
-        name_lower = product["name"].lower()
-        if any(kw in name_lower for kw in ["airpods", "headphone", "earbuds"]):
-            icon = "🎧"
-        elif any(kw in name_lower for kw in ["kitchen", "scale"]):
-            icon = "⚖️"
-        elif any(kw in name_lower for kw in ["soap", "clean"]):
-            icon = "🧴"
-        elif any(kw in name_lower for kw in ["skincare", "toner", "beauty"]):
-            icon = "💊"
-        elif any(kw in name_lower for kw in ["dumbbell", "fitness"]):
-            icon = "🏋️"
-        elif any(kw in name_lower for kw in ["bottle", "water"]):
-            icon = "🥤"
-        elif any(kw in name_lower for kw in ["case", "cover"]):
-            icon = "📱"
-        else:
-            icon = "📦"
-        
-        cards_html += f'''
-            <div class="product-card">
-                <div class="product-image">{icon}</div>
-                <span class="product-rank">#{i}</span>
-                <span class="product-market">{product["flag"]} {product["market"]}</span>
-                <div class="product-info">
-                    <h3 class="product-name">{product["name"]}</h3>
-                    <div class="metrics">
-                        <span class="metric growth">📈 {product["growth"]}</span>
-                        <span class="metric price">💰 {product["price"]}</span>
-                        <span class="metric hot">🔥 {product["source"]}</span>
-                    </div>
-                    <div class="growth-bar">
-                        <div class="growth-bar-fill" style="width: {90 - i*5}%"></div>
-                    </div>
-                    <div class="marketing-tips">
-                        <h4>🎯 营销建议</h4>
-                        <ul>
-                            <li><strong>主打卖点</strong>：{tips["卖点"]}</li>
-                            <li><strong>目标人群</strong>：{tips["人群"]}</li>
-                            <li><strong>建议定价</strong>：{tips["定价"]}</li>
-                            <li><strong>推广渠道</strong>：{tips["渠道"]}</li>
-                        </ul>
-                    </div>
-                </div>
-            </div>
-        '''
-    
-    # 计算最高增长率
-    max_growth = "新进榜"
-    for p in top_products:
-        if "%" in p["growth"]:
-            max_growth = p["growth"]
-            break
-    
-    html = f'''<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>海外爆款选品 TOP 10 - {timestamp[:10]}</title>
-    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap" rel="stylesheet">
-    <style>
-        :root {{
-            --bg-primary: #0f0f23;
-            --bg-card: #1a1a2e;
-            --accent: #00d4ff;
-            --accent-secondary: #ff6b6b;
-            --accent-green: #4ade80;
-            --text-primary: #ffffff;
-            --text-secondary: #a0a0a0;
-        }}
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{
-            font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-            background: linear-gradient(135deg, var(--bg-primary) 0%, #16213e 100%);
-            min-height: 100vh;
-            color: var(--text-primary);
-            padding: 40px 20px;
-        }}
-        .container {{ max-width: 1200px; margin: 0 auto; }}
-        .header {{ text-align: center; margin-bottom: 50px; }}
-        .header h1 {{
-            font-size: 2.5rem;
-            background: linear-gradient(90deg, var(--accent), var(--accent-secondary));
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            background-clip: text;
-            margin-bottom: 15px;
-        }}
-        .header .meta {{ color: var(--text-secondary); font-size: 0.95rem; line-height: 1.6; }}
-        .header .meta span {{ display: inline-block; margin: 0 10px; }}
-        .header .meta .separator {{ color: var(--accent); }}
-        .stats-bar {{
-            display: flex; justify-content: center; gap: 40px; margin-top: 25px;
-            padding: 20px; background: rgba(0,212,255,0.05); border-radius: 12px;
-            border: 1px solid rgba(0,212,255,0.1);
-        }}
-        .stat-item {{ text-align: center; }}
-        .stat-value {{ font-size: 1.8rem; font-weight: 700; color: var(--accent); }}
-        .stat-label {{ font-size: 0.8rem; color: var(--text-secondary); margin-top: 5px; }}
-        .products-grid {{
-            display: grid; grid-template-columns: repeat(auto-fill, minmax(350px, 1fr));
-            gap: 25px; margin-top: 40px;
-        }}
-        .product-card {{
-            background: var(--bg-card); border-radius: 16px; overflow: hidden;
-            transition: transform 0.3s ease, box-shadow 0.3s ease;
-            border: 1px solid rgba(255,255,255,0.1); position: relative;
-        }}
-        .product-card:hover {{
-            transform: translateY(-8px);
-            box-shadow: 0 20px 40px rgba(0,212,255,0.2);
-        }}
-        .product-image {{
-            width: 100%; height: 200px; object-fit: cover;
-            background: linear-gradient(135deg, #2a2a4a 0%, #1a1a2e 100%);
-            display: flex; align-items: center; justify-content: center; font-size: 4rem;
-        }}
-        .product-info {{ padding: 20px; }}
-        .product-rank {{
-            position: absolute; top: 15px; left: 15px;
-            background: linear-gradient(90deg, var(--accent), var(--accent-secondary));
-            color: white; font-weight: bold; padding: 8px 16px; border-radius: 20px;
-            font-size: 0.85rem; box-shadow: 0 4px 15px rgba(0,212,255,0.3);
-        }}
-        .product-market {{
-            position: absolute; top: 15px; right: 15px;
-            background: rgba(0,0,0,0.6); color: white; padding: 6px 12px;
-            border-radius: 15px; font-size: 0.75rem; backdrop-filter: blur(10px);
-        }}
-        .product-name {{
-            font-size: 1.1rem; font-weight: 600; margin-bottom: 15px; line-height: 1.4;
-            display: -webkit-box; -webkit-line-clamp: 2; -webkit-box-orient: vertical; overflow: hidden;
-        }}
-        .metrics {{ display: flex; gap: 15px; margin-bottom: 15px; flex-wrap: wrap; }}
-        .metric {{
-            display: flex; align-items: center; gap: 6px; font-size: 0.9rem;
-            padding: 6px 12px; border-radius: 8px; background: rgba(255,255,255,0.05);
-        }}
-        .metric.growth {{ color: var(--accent-green); background: rgba(74,222,128,0.1); }}
-        .metric.price {{ color: var(--accent); background: rgba(0,212,255,0.1); }}
-        .metric.hot {{ color: var(--accent-secondary); background: rgba(255,107,107,0.1); }}
-        .growth-bar {{
-            width: 100%; height: 6px; background: rgba(255,255,255,0.1);
-            border-radius: 3px; margin: 15px 0; overflow: hidden;
-        }}
-        .growth-bar-fill {{
-            height: 100%; background: linear-gradient(90deg, var(--accent-green), var(--accent));
-            border-radius: 3px; transition: width 0.5s ease;
-        }}
-        .marketing-tips {{
-            background: rgba(0,212,255,0.08); border-radius: 12px; padding: 15px;
-            margin-top: 15px; border: 1px solid rgba(0,212,255,0.1);
-        }}
-        .marketing-tips h4 {{
-            font-size: 0.9rem; color: var(--accent); margin-bottom: 12px;
-            display: flex; align-items: center; gap: 8px;
-        }}
-        .marketing-tips ul {{ list-style: none; font-size: 0.85rem; color: var(--text-secondary); }}
-        .marketing-tips li {{
-            padding: 8px 0; padding-left: 22px; position: relative;
-            border-bottom: 1px solid rgba(255,255,255,0.05);
-        }}
-        .marketing-tips li:last-child {{ border-bottom: none; }}
-        .marketing-tips li::before {{ content: "→"; position: absolute; left: 0; color: var(--accent); }}
-        .footer {{
-            text-align: center; margin-top: 60px; padding: 30px;
-            color: var(--text-secondary); font-size: 0.85rem;
-            background: rgba(0,0,0,0.2); border-radius: 16px;
-            border: 1px solid rgba(255,255,255,0.05);
-        }}
-        .footer p {{ margin: 8px 0; }}
-        .footer .warning {{ color: var(--accent-secondary); }}
-        @media (max-width: 768px) {{
-            .header h1 {{ font-size: 1.8rem; }}
-            .stats-bar {{ flex-direction: column; gap: 20px; }}
-            .products-grid {{ grid-template-columns: 1fr; }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <header class="header">
-            <h1>🔥 海外爆款选品 TOP 10</h1>
-            <p class="meta">
-                <span>📅 生成时间：{timestamp}</span>
-                <span class="separator">|</span>
-                <span>🌍 市场：欧洲 · 美国</span>
-                <span class="separator">|</span>
-                <span>📊 数据源：Amazon Movers & Shakers + Best Sellers</span>
-            </p>
-            <div class="stats-bar">
-                <div class="stat-item">
-                    <div class="stat-value">{len(top_products)}</div>
-                    <div class="stat-label">精选爆款</div>
-                </div>
-                <div class="stat-item">
-                    <div class="stat-value">3</div>
-                    <div class="stat-label">覆盖市场</div>
-                </div>
-                <div class="stat-item">
-                    <div class="stat-value">{max_growth}</div>
-                    <div class="stat-label">最高增长</div>
-                </div>
-            </div>
-        </header>
-        <div class="products-grid">
-            {cards_html}
-        </div>
-        <footer class="footer">
-            <p class="warning">⚠️ 数据仅供参考，具体选品请结合实际市场情况和供应链能力综合分析</p>
-            <p>📊 数据来源：Amazon Movers & Shakers + Best Sellers 榜单</p>
-            <p>⏱️ 数据时效性：每日自动更新</p>
-            <p>🤖 由 GitHub Actions 自动生成</p>
-        </footer>
-    </div>
-</body>
-</html>'''
-    
-    return html
-
-def send_feishu_notification(products, webhook_url):
-    """发送飞书通知"""
-    if not webhook_url:
-        print("⚠️ 未配置飞书 Webhook，跳过通知")
-        return
+    print("🚀 开始抓取海外爆款数据...")
+    run_time = datetime.now()
+    run_date = run_time.strftime("%Y-%m-%d")
     
-    # 生成时间
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-    
-    # 取 TOP 3 商品
-    top3 = products[:3]
-    
-    # 构建商品列表文本
-    products_text = ""
-    emojis = ["1️⃣", "2️⃣", "3️⃣"]
-    for i, product in enumerate(top3):
-        name = product["name"][:40] + "..." if len(product["name"]) > 40 else product["name"]
-        products_text += f"{emojis[i]} {name}\n    {product['flag']} {product['market']} | 📈 {product['growth']}\n\n"
-    
-    # 构建飞书消息卡片
-    card = {
-        "msg_type": "interactive",
-        "card": {
-            "config": {
-                "wide_screen_mode": True
-            },
-            "header": {
-                "template": "red",
-                "title": {
-                    "tag": "plain_text",
-                    "content": "🔥 海外爆款选品日报"
-                }
-            },
-            "elements": [
-                {
-                    "tag": "div",
-                    "text": {
-                        "tag": "plain_text",
-                        "content": f"📅 {timestamp}"
-                    }
-                },
-                {
-                    "tag": "hr"
-                },
-                {
-                    "tag": "div",
-                    "text": {
-                        "tag": "lark_md",
-                        "content": f"**📊 今日 TOP 3 精选**\n\n{products_text}"
-                    }
-                },
-                {
-                    "tag": "hr"
-                },
-                {
-                    "tag": "action",
-                    "actions": [
-                        {
-                            "tag": "button",
-                            "text": {
-                                "tag": "plain_text",
-                                "content": "📊 查看完整报告"
-                            },
-                            "type": "primary",
-                            "url": REPORT_URL
-                        }
-                    ]
-                },
-                {
-                    "tag": "note",
-                    "elements": [
-                        {
-                            "tag": "plain_text",
-                            "content": "数据来源: Amazon Movers & Shakers + Best Sellers"
-                        }
-                    ]
-                }
-            ]
+    # 报告取 TOP 10；飞书各群按自己的市场过滤取 TOP N，每个市场保留足够的候选，去重合并后仍够数
+    targets = load_targets()
+    ranking = RankingStage(
+        max([10] + [target["top_n"] for target in targets]) * DEDUP_HEADROOM,
+        signals=load_breakout_signals(),
+    )
+    tracker = get_tracker()
+    sinks = [ChangeSink(tracker), HistorySink(run_date)]
+    if EXPORT_FORMATS:
+        sinks.append(ExportSink(run_time))
+    catalog_sink = CatalogSink() if REPORT_DATA != "off" else None
+    if catalog_sink:
+        sinks.append(catalog_sink)
+    pipeline = Pipeline(ranking, sinks)
+    
+    if CRAWL_DEPTH > 0:
+        # 类目树爬取模式
+        scheduler = ScrapeScheduler(sessions=get_session_pool())
+        try:
+            with metrics.span("crawl"):
+                results = await pipeline.run(lambda emit: crawl_all_sources(emit, scheduler))
+        finally:
+            scheduler.sessions.save()
+        scheduler.sessions.print_summary()
+        chart_keys = {label: key for key, label in CHART_LABELS.items()}
+        coverage = {
+            (market_key, chart_keys[label]): {"status": "ok"} if count else {"status": "failed", "reason": "没有抓到商品"}
+            for (market_key, label), count in results
         }
+    else:
+        scheduler = ScrapeScheduler(sessions=get_session_pool())
+        try:
+            with metrics.span("scrape"):
+                results = await pipeline.run(
+                    lambda emit: scrape_all_sources(browser, emit, SCRAPE_CONCURRENCY, scheduler, chart_cache)
+                )
+        finally:
+            # 浏览器先把各上下文的 cookies 交回会话，再保存会话池
+            await browser.finish_run()
+            scheduler.sessions.save()
+        scheduler.sessions.print_summary()
+        coverage = scheduler.coverage
+    
+    # 各榜单的内容哈希在商品流过时已累加好，这里与上次运行比较；没抓到的榜单保留上次的哈希
+    changed = tracker.finish_charts(
+        f"{market_key}:{chart_key}"
+        for market_key in DATA_SOURCES for chart_key in CHART_LABELS
+        if coverage.get((market_key, chart_key), {}).get("status") == "ok"
+    )
+    chart_keys = {label: key for key, label in CHART_LABELS.items()}
+    total = 0
+    for (market_key, chart_label), count in results:
+        total += count
+        key = f"{market_key}:{chart_keys[chart_label]}"
+        if key not in changed:
+            print(f"  ❌ {DATA_SOURCES[market_key]['name']} {chart_label}: 未取得数据")
+            continue
+        mark = "" if changed[key] else "（无变化）"
+        print(f"  ✅ {DATA_SOURCES[market_key]['name']} {chart_label}: {count} 个商品{mark}")
+    notes = coverage_notes(market_coverage(coverage, DATA_SOURCES, CHART_LABELS))
+    changed_charts = sum(changed.values())
+    metrics.count("charts_changed_total", changed_charts)
+    metrics.count("charts_unchanged_total", len(changed) - changed_charts)
+    print(f"\n📦 共抓取 {total} 个商品，{changed_charts}/{len(changed)} 个榜单有变化")
+    
+    # 历史库和全量导出都是边流边写，榜单都没变且今天已写过时回滚、丢弃
+    history_changed = tracker.history_needed(changed_charts > 0, run_date)
+    await pipeline.close_sinks({"history": history_changed, "export": history_changed})
+    if "history" in pipeline.failures:
+        print(f"⚠️ 写入历史库失败: {pipeline.failures['history']}")
+        history_changed = False
+    elif history_changed:
+        tracker.mark_history(run_date)
+    tracker.save()
+    
+    if not changed:
+        # 全部榜单失败时快照里只有空列表，保留上次的快照，不渲染空报告也不推送
+        print(f"⚠️ 所有榜单都没有抓到商品，保留上次的运行快照: {RUN_SNAPSHOT}")
+        return None
+    
+    candidates = ranking.candidates()
+    catalog = catalog_sink.catalog.table() if catalog_sink and "catalog" not in pipeline.failures else None
+    snapshot = {
+        "timestamp": run_time.strftime("%Y-%m-%d %H:%M"),
+        "run_date": run_date,
+        "report": f"reports/hot_products_{run_time.strftime('%Y%m%d')}.html",
+        "market_count": len(DATA_SOURCES),
+        "history_changed": history_changed,
+        "top": top_unique(candidates, 10),
+        "candidates": candidates,
+        "notes": notes,
+        "catalog": catalog,
+        "catalog_digest": catalog_digest(catalog) if catalog else None,
     }
+    save_snapshot(snapshot)
+    return snapshot
+
+def render_stage(snapshot):
+    """渲染阶段：按快照写出当日报告，更新 latest.html 并归档，返回报告路径"""
+    filename = snapshot["report"]
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    
+    # 流式写出报告
+    with metrics.span("render"):
+        write_report(
+            snapshot["top"], snapshot["timestamp"], filename, snapshot["market_count"], snapshot["notes"],
+            snapshot.get("catalog"), snapshot.get("catalog_digest") or "",
+        )
+    print(f"✅ 报告已生成: {filename}")
     
+    # latest.html 直接复制当日报告
+    latest = os.path.join(os.path.dirname(filename), "latest.html")
+    with metrics.span("file_write"):
+        publish_latest(filename, latest)
+    print(f"✅ 最新报告: {latest}")
+    
+    # 登记进归档清单、预压缩、合并过期日报；归档失败不影响本次报告
     try:
-        response = requests.post(webhook_url, json=card, timeout=10)
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("StatusCode") == 0 or result.get("code") == 0:
-                print("✅ 飞书通知发送成功")
-            else:
-                print(f"⚠️ 飞书通知发送失败: {result}")
-        else:
-            print(f"⚠️ 飞书通知发送失败: HTTP {response.status_code}")
+        with metrics.span("archive"):
+            archive_report(filename, snapshot["run_date"], snapshot["top"], snapshot["timestamp"], latest)
+        print(f"✅ 归档首页: {os.path.join(os.path.dirname(filename), 'index.html')}")
     except Exception as e:
-        print(f"⚠️ 飞书通知发送异常: {e}")
+        print(f"⚠️ 报告归档失败: {e}")
+    return filename
 
-async def main():
-    """主函数"""
-    print("🚀 开始抓取海外爆款数据...")
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-    
-    all_products = []
+async def notify_stage(snapshot, targets=None):
+    """推送阶段：按快照向 FEISHU_WEBHOOK 及 FEISHU_TARGETS 中配置的所有群发送通知"""
+    from notifier import notify
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    with metrics.span("notify"):
+        return await notify(
+            snapshot["candidates"], REPORT_URL, targets, snapshot["notes"], snapshot.get("timestamp")
         )
-        page = await context.new_page()
-        
-        for market_key, market_info in DATA_SOURCES.items():
-            print(f"📊 正在抓取 {market_info['name']} 市场...")
-            
-            # 抓取 Movers & Shakers
-            products = await scrape_amazon_movers_shakers(
-                page, 
-                market_info["movers_shakers"], 
-                market_info
-            )
-            all_products.extend(products)
-            print(f"  ✅ Movers & Shakers: {len(products)} 个商品")
-            
-            # 抓取 Best Sellers
-            products = await scrape_amazon_best_sellers(
-                page,
-                market_info["best_sellers"],
-                market_info
-            )
-            all_products.extend(products)
-            print(f"  ✅ Best Sellers: {len(products)} 个商品")
-        
-        await browser.close()
-    
-    print(f"\n📦 共抓取 {len(all_products)} 个商品")
-    
-    # 生成报告
-    html = generate_html_report(all_products, timestamp)
+
+async def run_once(browser, chart_cache=None):
+    """完整跑一轮：抓取阶段之后，TOP 列表有变化时渲染报告并推送通知（chart_cache 见 scrape_chart）
     
-    # 确保 reports 目录存在
-    os.makedirs("reports", exist_ok=True)
+    返回 {"report_changed": 是否生成了新报告, "history_changed": 是否写了历史库, "report": 报告路径或 None}
+    """
+    snapshot = await scrape_stage(browser, chart_cache)
+    if snapshot is None:
+        print("⏭️ 本轮没有可用数据，跳过渲染和通知")
+        metrics.count("reports_generated_total", 0)
+        metrics.print_summary()
+        metrics.write_outputs()
+        return {"report_changed": False, "history_changed": False, "report": None}
+    top_products, run_date, notes = snapshot["top"], snapshot["run_date"], snapshot["notes"]
     
-    # 保存报告
-    filename = f"reports/hot_products_{datetime.now().strftime('%Y%m%d')}.html"
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(html)
+    # TOP 列表没变且今天已有报告时，不重新渲染也不推送；只有全量商品目录变了时只重新渲染
+    tracker = get_tracker()
+    top_changed = tracker.top_changed(top_products, run_date, notes)
+    report_changed = top_changed or tracker.catalog_changed(snapshot.get("catalog_digest"))
+    if report_changed:
+        render_stage(snapshot)
+        if top_changed:
+            await notify_stage(snapshot)
+        else:
+            print("⏭️ TOP 列表与上次相同，只更新报告中的全量商品，跳过通知")
+        tracker.mark_rendered(top_products, run_date, snapshot["report"], notes, snapshot.get("catalog_digest"))
+        tracker.save()
+    else:
+        print("⏭️ TOP 列表与上次相同，跳过渲染和通知")
+    metrics.count("reports_generated_total", int(report_changed))
     
-    print(f"✅ 报告已生成: {filename}")
+    metrics.print_summary()
+    metrics.write_outputs()
+    return {
+        "report_changed": report_changed,
+        "history_changed": snapshot["history_changed"],
+        "report": snapshot["report"] if report_changed else None,
+    }
+
+async def main(command="all"):
+    """单次运行：all 为完整一轮，scrape 只到保存快照为止"""
+    from http_fetch import close_session
+    from sessions import close_session_pool
     
-    # 同时保存一份最新版本
-    with open("reports/latest.html", "w", encoding="utf-8") as f:
-        f.write(html)
+    browser = LazyBrowser(BLOCK_RESOURCES)
+    try:
+        if command == "scrape":
+            snapshot = await scrape_stage(browser)
+            if snapshot:
+                print(f"💾 运行快照已保存: {RUN_SNAPSHOT}（可用 render / notify 子命令继续）")
+            metrics.print_summary()
+            metrics.write_outputs()
+            result = {"report_changed": False, "history_changed": bool(snapshot and snapshot["history_changed"])}
+        else:
+            result = await run_once(browser)
+    finally:
+        close_session()
+        close_session_pool()
+    # 让工作流据此决定是否提交
+    write_github_output(report_changed=result["report_changed"], history_changed=result["history_changed"])
+
+def render_command(path):
+    """render 子命令：用保存的快照重新生成报告，并记为已渲染"""
+    snapshot = load_snapshot(path)
+    render_stage(snapshot)
+    tracker = get_tracker()
+    tracker.mark_rendered(
+        snapshot["top"], snapshot["run_date"], snapshot["report"], snapshot["notes"], snapshot.get("catalog_digest")
+    )
+    tracker.save()
+    write_github_output(report_changed=True, history_changed=False)
+
+async def notify_command(path):
+    """notify 子命令：用保存的快照重新推送飞书通知"""
+    snapshot = load_snapshot(path)
+    print(f"📨 补发 {snapshot['timestamp']} 的选品通知")
+    await notify_stage(snapshot)
+
+async def run_daemon(interval=DAEMON_INTERVAL):
+    """守护进程：常驻浏览器池，按固定间隔反复运行，收到 SIGTERM / SIGINT 后保存会话退出"""
+    from browser_pool import BrowserPool
+    from http_fetch import close_session
+    from sessions import close_session_pool
     
-    print("✅ 最新报告: reports/latest.html")
+    pool = BrowserPool(BLOCK_RESOURCES)
+    # 各榜单上一轮已打分的商品，只在守护进程内跨轮保留（见 scrape_chart）
+    chart_cache = {}
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows 不支持，靠 KeyboardInterrupt 退出
+            pass
     
-    # 发送飞书通知
-    feishu_webhook = os.environ.get("FEISHU_WEBHOOK", "")
-    if feishu_webhook:
-        # 按增长率排序后的商品用于通知
-        def sort_key(p):
-            if "新进榜" in p["growth"]:
-                return 0
-            elif "%" in p["growth"]:
-                try:
-                    return 1 - int(p["growth"].replace("%", "").replace("+", "")) / 1000
-                except:
-                    return 0.5
-            else:
-                return 0.8
-        
-        sorted_products = sorted(all_products, key=sort_key)[:10]
-        send_feishu_notification(sorted_products, feishu_webhook)
+    print(f"🛰️ 守护进程模式：每 {interval} 秒运行一次")
+    next_run = time.monotonic()
+    try:
+        while not stop.is_set():
+            metrics.reset()
+            try:
+                await run_once(pool, chart_cache)
+            except Exception as e:
+                print(f"❌ 本轮运行失败: {e}")
+            
+            # 按固定节拍排下一轮；本轮超时则跳过错过的节拍，不连续补跑
+            next_run += interval
+            now = time.monotonic()
+            if next_run <= now:
+                next_run += ((now - next_run) // interval + 1) * interval
+            print(f"💤 下一轮在 {int(next_run - now)} 秒后")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=next_run - now)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        print("👋 守护进程退出，保存会话...")
+        await pool.close()
+        close_session()
+        close_session_pool()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="海外爆款选品抓取")
+    parser.add_argument("--daemon", action="store_true", help="常驻运行，按间隔定时完整运行")
+    parser.add_argument("--interval", type=int, default=DAEMON_INTERVAL, help="守护进程两轮之间的间隔（秒）")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("all", help="抓取、渲染并推送（默认）")
+    sub.add_parser("scrape", help="只抓取、写历史库并保存运行快照")
+    for name, help_text in (("render", "用运行快照重新生成报告"), ("notify", "用运行快照重新推送飞书通知")):
+        command_parser = sub.add_parser(name, help=f"{help_text}（不启动浏览器）")
+        command_parser.add_argument("--snapshot", default=RUN_SNAPSHOT, help="运行快照路径")
+    args = parser.parse_args()
+    
+    command = args.command or "all"
+    try:
+        if args.daemon:
+            asyncio.run(run_daemon(args.interval))
+        elif command == "render":
+            render_command(args.snapshot)
+        elif command == "notify":
+            asyncio.run(notify_command(args.snapshot))
+        else:
+            asyncio.run(main(command))
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
@@ -0,0 +1,36 @@
+"""
+运行快照
+抓取阶段结束时把渲染和推送需要的全部数据（TOP 选品、通知候选、数据完整性提示、全量商品目录等）存成一个 JSON 文件，
+render / notify 子命令直接读取它，改报告样式或补发通知时不必重新抓取
+"""
+
+import json
+import os
+
+# 最近一次抓取的快照（随报告一起提交，工作流里也能重新渲染或补发）
+RUN_SNAPSHOT = os.environ.get("RUN_SNAPSHOT", "data/last_run.json")
+
+# 快照格式版本，字段不兼容地变化时递增
+SNAPSHOT_VERSION = 1
+
+def save_snapshot(snapshot, path=RUN_SNAPSHOT):
+    """原子写出快照（先写临时文件再替换）"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(snapshot, version=SNAPSHOT_VERSION), f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return path
+
+def load_snapshot(path=RUN_SNAPSHOT):
+    """读取快照；文件不存在或版本不符时抛出 ValueError，附带可读的原因"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"找不到运行快照 {path}，请先运行 python scraper.py scrape") from None
+    except json.JSONDecodeError as e:
+        raise ValueError(f"运行快照 {path} 已损坏: {e}") from None
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"运行快照 {path} 的版本 {snapshot.get('version')} 不受支持，请重新抓取")
+    return snapshot
@@ -0,0 +1,215 @@
+"""
+本地替身服务器
+把保存下来的榜单页面当作 Amazon 提供服务，用于离线测试 HTTP 与浏览器两条抓取通道
+
+页面目录结构为 <页面目录>/<域名>/<路径>/index.html，例如：
+    fixtures/pages/www.amazon.com/gp/movers-and-shakers/index.html
+
+可模拟网络延迟和懒加载：开启懒加载后，带 <!--standin-card--> 标记的卡片只在 HTML 中保留前 N 个，
+其余卡片由页面脚本在每次滚动后延迟追加，HTTP 通道看不到这部分商品；
+还可让指定站点模拟限流：返回 503、验证码页，或迟迟不响应（hang）；
+也可按 User-Agent 模拟风控：每个 UA 在每个站点只正常应答 N 次，之后返回验证码页，或含指定片段的 UA 一律返回验证码页
+
+用法：
+    python standin_server.py --dir fixtures/pages --port 8765
+    python standin_server.py --dir benchmarks/fixtures/pages --latency-ms 200 --lazy-initial 30
+    python standin_server.py --dir benchmarks/fixtures/pages --throttle www.amazon.de=503 --throttle www.amazon.co.uk=hang
+    python standin_server.py --dir benchmarks/fixtures/pages --ua-budget 12 --flag-ua Edg/
+    AMAZON_STANDIN_URL=http://127.0.0.1:8765 python scraper.py
+"""
+
+import argparse
+import json
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# 懒加载页面中卡片与网格结束位置的标记
+CARD_MARKER = "<!--standin-card-->"
+GRID_END_MARKER = "<!--/standin-grid-->"
+
+# 限流模拟方式
+THROTTLE_MODES = ("503", "captcha", "hang")
+
+# 模拟的验证码页面（含 http_fetch.CAPTCHA_MARKERS 中的特征）
+CAPTCHA_PAGE = """<html><body>
+<form action="/errors/validateCaptcha"><p>Type the characters you see in this image:</p></form>
+</body></html>"""
+
+# hang 模式下挂起请求的时长（秒）
+HANG_SECONDS = 120
+
+# 追加剩余卡片的页面脚本：每次滚动后等待 interval 毫秒追加一批
+LAZY_SCRIPT = """<script>
+(function () {
+    var pending = %s, batch = %d, interval = %d, busy = false;
+    var grid = document.querySelector("[data-standin-grid]");
+    window.addEventListener("scroll", function () {
+        if (busy || !pending.length) return;
+        busy = true;
+        setTimeout(function () {
+            grid.insertAdjacentHTML("beforeend", pending.splice(0, batch).join(""));
+            busy = false;
+        }, interval);
+    });
+})();
+</script>"""
+
+class StandinHandler(SimpleHTTPRequestHandler):
+    """按目录提供保存页面的请求处理器"""
+
+    # 每个请求的固定延迟（毫秒）
+    latency_ms = 0
+    # 懒加载：HTML 中直接给出的卡片数（0 表示不模拟懒加载）
+    lazy_initial = 0
+    # 懒加载：每次滚动追加的卡片数与追加前的延迟（毫秒）
+    lazy_batch = 20
+    lazy_interval_ms = 800
+    # 限流模拟：{域名: "503" / "captcha" / "hang"}
+    throttle = {}
+    # 每个 User-Agent 在每个站点正常应答的请求数，之后返回验证码页（0 表示不限）
+    ua_budget = 0
+    # User-Agent 含其中任一片段的请求一律返回验证码页
+    flagged_agents = ()
+    # (域名, User-Agent) -> 已应答的请求数，由 make_handler 为每个配置单独创建
+    ua_counts = {}
+    ua_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        # 不打印每个请求的访问日志
+        pass
+
+    def do_GET(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        # 路径的第一段是被替身的 Amazon 域名
+        site = self.path.lstrip("/").split("/", 1)[0]
+        mode = self.throttle.get(site) or self.agent_throttle(site)
+        if mode:
+            self.throttled(mode)
+            return
+        if self.lazy_initial:
+            path = self.translate_path(self.path)
+            if not path.endswith(".html"):
+                path = path.rstrip("/") + "/index.html"
+            try:
+                with open(path, encoding="utf-8") as f:
+                    content = f.read()
+            except OSError:
+                content = None
+            if content is not None and CARD_MARKER in content:
+                body = self.lazy_page(content).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+        super().do_GET()
+
+    def agent_throttle(self, site):
+        """按 User-Agent 判断是否要返回验证码页"""
+        agent = self.headers.get("User-Agent", "")
+        if any(fragment in agent for fragment in self.flagged_agents):
+            return "captcha"
+        if not self.ua_budget:
+            return None
+        with self.ua_lock:
+            count = self.ua_counts.get((site, agent), 0) + 1
+            self.ua_counts[(site, agent)] = count
+        return "captcha" if count > self.ua_budget else None
+
+    def throttled(self, mode):
+        """按限流模式应答"""
+        if mode == "hang":
+            time.sleep(HANG_SECONDS)
+            return
+        body = CAPTCHA_PAGE.encode("utf-8") if mode == "captcha" else b"Service Unavailable"
+        self.send_response(200 if mode == "captcha" else 503)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def lazy_page(self, content):
+        """只保留前 lazy_initial 个卡片，其余放进页面脚本按滚动追加"""
+        head, _, rest = content.partition(CARD_MARKER)
+        grid, end_marker, tail = rest.partition(GRID_END_MARKER)
+        cards = [CARD_MARKER + card for card in grid.split(CARD_MARKER)]
+        shown, pending = cards[:self.lazy_initial], cards[self.lazy_initial:]
+        # 避免卡片里的 </script> 提前结束脚本
+        pending_json = json.dumps(pending).replace("</", "<\\/")
+        script = LAZY_SCRIPT % (pending_json, self.lazy_batch, self.lazy_interval_ms)
+        return head + "".join(shown) + end_marker + tail.replace("</body>", script + "\n</body>", 1)
+
+def make_handler(pages_dir, latency_ms=0, lazy_initial=0, lazy_batch=None, lazy_interval_ms=None, throttle=None,
+                 ua_budget=0, flagged_agents=()):
+    """按配置生成请求处理器"""
+    options = {
+        "latency_ms": latency_ms,
+        "lazy_initial": lazy_initial,
+        "throttle": dict(throttle or {}),
+        "ua_budget": ua_budget,
+        "flagged_agents": tuple(flagged_agents),
+        "ua_counts": {},
+    }
+    if lazy_batch is not None:
+        options["lazy_batch"] = lazy_batch
+    if lazy_interval_ms is not None:
+        options["lazy_interval_ms"] = lazy_interval_ms
+    handler_class = type("ConfiguredStandinHandler", (StandinHandler,), options)
+    return partial(handler_class, directory=pages_dir)
+
+def start_server(pages_dir, port=0, host="127.0.0.1", **options):
+    """在后台线程启动替身服务器，返回 (server, base_url)
+
+    options 可包含 latency_ms、lazy_initial、lazy_batch、lazy_interval_ms、throttle、ua_budget、flagged_agents
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(pages_dir, **options))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 Amazon 替身服务器")
+    parser.add_argument("--dir", default="fixtures/pages", help="保存页面的目录")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--latency-ms", type=int, default=0, help="每个请求的固定延迟（毫秒）")
+    parser.add_argument("--lazy-initial", type=int, default=0, help="懒加载页面首屏卡片数（0 为关闭）")
+    parser.add_argument("--lazy-batch", type=int, default=StandinHandler.lazy_batch, help="每次滚动追加的卡片数")
+    parser.add_argument("--lazy-interval-ms", type=int, default=StandinHandler.lazy_interval_ms, help="追加卡片前的延迟（毫秒）")
+    parser.add_argument("--throttle", action="append", default=[], metavar="域名=方式",
+                        help=f"让某个站点模拟限流，方式为 {' / '.join(THROTTLE_MODES)}，可重复指定")
+    parser.add_argument("--ua-budget", type=int, default=0, help="每个 User-Agent 在每个站点正常应答的请求数，之后返回验证码（0 为不限）")
+    parser.add_argument("--flag-ua", action="append", default=[], metavar="片段", help="User-Agent 含该片段的请求一律返回验证码，可重复指定")
+    args = parser.parse_args()
+
+    throttle = {}
+    for item in args.throttle:
+        host, _, mode = item.partition("=")
+        if mode not in THROTTLE_MODES:
+            parser.error(f"--throttle {item}: 方式应为 {' / '.join(THROTTLE_MODES)}")
+        throttle[host] = mode
+
+    handler = make_handler(
+        args.dir,
+        latency_ms=args.latency_ms,
+        lazy_initial=args.lazy_initial,
+        lazy_batch=args.lazy_batch,
+        lazy_interval_ms=args.lazy_interval_ms,
+        throttle=throttle,
+        ua_budget=args.ua_budget,
+        flagged_agents=args.flag_ua,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), handler)
+    print(f"🧪 替身服务器已启动: http://127.0.0.1:{args.port} （页面目录 {args.dir}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
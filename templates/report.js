@@ -0,0 +1,244 @@
+/*
+ * 报告页面的全量商品浏览
+ * 读取内嵌（#catalog-data）或旁路文件（data-src）中的商品目录（格式见 catalog.py），
+ * 按市场、榜单、类目和关键词筛选并排序；列表只渲染可见区域附近的行，上万个商品也只有几十个 DOM 节点
+ */
+(function () {
+    "use strict";
+
+    var CATALOG_VERSION = 1;
+    // 与 report.css 中 .browse-row 的高度一致
+    var ROW_HEIGHT = 64;
+    // 可见区域上下额外渲染的行数，快速滚动时不露白
+    var OVERSCAN = 8;
+    var SEARCH_DELAY_MS = 120;
+    var TIPS = [["主打卖点", "卖点"], ["目标人群", "人群"], ["建议定价", "定价"], ["推广渠道", "渠道"]];
+
+    var section = document.getElementById("browse");
+    if (!section) {
+        return;
+    }
+    function byId(id) {
+        return document.getElementById(id);
+    }
+    var viewport = byId("browse-viewport");
+    var spacer = byId("browse-spacer");
+    var windowEl = byId("browse-window");
+    var detail = byId("browse-detail");
+    var countEl = byId("browse-count");
+    var controls = {
+        search: byId("browse-search"),
+        market: byId("browse-market"),
+        chart: byId("browse-chart"),
+        category: byId("browse-category"),
+        sort: byId("browse-sort")
+    };
+
+    var catalog = null;
+    var rows = [];
+    var col = {};
+    var view = [];
+    var searchText = null;
+    var shown = [-1, -1];
+    var frame = 0;
+    var searchTimer = 0;
+
+    function escapeHtml(text) {
+        return String(text == null ? "" : text).replace(/[&<>"']/g, function (ch) {
+            return {"&": "&amp;", "<": "&lt;", ">": "&gt;", "\"": "&quot;", "'": "&#39;"}[ch];
+        });
+    }
+
+    function setStatus(text) {
+        windowEl.style.transform = "";
+        windowEl.innerHTML = "<p class=\"browse-status\">" + escapeHtml(text) + "</p>";
+    }
+
+    // 数值字段排序：空值排最后，相同时保持目录原有顺序
+    function numeric(field, direction) {
+        return function (a, b) {
+            var x = rows[a][col[field]];
+            var y = rows[b][col[field]];
+            if (x == null || y == null) {
+                return x == null ? (y == null ? a - b : 1) : -1;
+            }
+            return (x - y) * direction || a - b;
+        };
+    }
+
+    var SORTS = {
+        score: function () { return numeric("score", -1); },
+        growth: function () { return numeric("growth_pct", -1); },
+        rank: function () { return numeric("rank", 1); },
+        price_asc: function () { return numeric("price_value", 1); },
+        price_desc: function () { return numeric("price_value", -1); }
+    };
+
+    function selected(select) {
+        return select.value === "" ? -1 : Number(select.value);
+    }
+
+    function apply() {
+        var market = selected(controls.market);
+        var chart = selected(controls.chart);
+        var category = selected(controls.category);
+        var query = controls.search.value.trim().toLowerCase();
+        if (query && !searchText) {
+            searchText = rows.map(function (row) {
+                return (row[col.name] + " " + row[col.asin]).toLowerCase();
+            });
+        }
+
+        var picked = [];
+        for (var i = 0; i < rows.length; i++) {
+            var row = rows[i];
+            if ((market >= 0 && row[col.market] !== market) ||
+                (chart >= 0 && row[col.chart] !== chart) ||
+                (category >= 0 && row[col.category] !== category) ||
+                (query && searchText[i].indexOf(query) < 0)) {
+                continue;
+            }
+            picked.push(i);
+        }
+        picked.sort((SORTS[controls.sort.value] || SORTS.score)());
+        view = picked;
+
+        countEl.textContent = picked.length === rows.length ? String(rows.length) : picked.length + " / " + rows.length;
+        spacer.style.height = picked.length * ROW_HEIGHT + "px";
+        viewport.scrollTop = 0;
+        shown = [-1, -1];
+        render();
+    }
+
+    function rowHtml(index, position) {
+        var row = rows[index];
+        var market = catalog.markets[row[col.market]];
+        var chart = catalog.charts[row[col.chart]];
+        var category = catalog.categories[row[col.category]];
+        var asin = row[col.asin];
+        var link = row[col.link] || (asin && market.origin ? market.origin + "/dp/" + asin : "");
+        var name = escapeHtml(row[col.name]);
+        var meta = market.flag + " " + market.name + " · " + chart.label +
+            (row[col.rank] ? " #" + row[col.rank] : "") + " · " + category.name;
+        return "<div class=\"browse-row\" data-index=\"" + index + "\">" +
+            "<span class=\"browse-pos\">" + (position + 1) + "</span>" +
+            "<span class=\"browse-icon\">" + escapeHtml(category.icon) + "</span>" +
+            "<span class=\"browse-main\"><span class=\"browse-name\">" +
+            (link ? "<a href=\"" + escapeHtml(link) + "\" target=\"_blank\" rel=\"noopener\">" + name + "</a>" : name) +
+            "</span><span class=\"browse-meta\">" + escapeHtml(meta) + "</span></span>" +
+            "<span class=\"browse-growth\">" + escapeHtml(row[col.growth]) + "</span>" +
+            "<span class=\"browse-price\">" + escapeHtml(row[col.price]) + "</span>" +
+            "</div>";
+    }
+
+    function render() {
+        frame = 0;
+        if (!view.length) {
+            shown = [-1, -1];
+            setStatus("没有符合条件的商品");
+            return;
+        }
+        var top = viewport.scrollTop;
+        var first = Math.max(0, Math.floor(top / ROW_HEIGHT) - OVERSCAN);
+        var last = Math.min(view.length, Math.ceil((top + viewport.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+        if (first === shown[0] && last === shown[1]) {
+            return;
+        }
+        shown = [first, last];
+        var parts = [];
+        for (var i = first; i < last; i++) {
+            parts.push(rowHtml(view[i], i));
+        }
+        windowEl.style.transform = "translateY(" + first * ROW_HEIGHT + "px)";
+        windowEl.innerHTML = parts.join("");
+    }
+
+    function schedule() {
+        if (!frame) {
+            frame = window.requestAnimationFrame(render);
+        }
+    }
+
+    function showDetail(index) {
+        var row = rows[index];
+        var tips = catalog.categories[row[col.category]].tips || {};
+        detail.innerHTML = "<h4>🎯 " + escapeHtml(row[col.name]) + "</h4><ul>" +
+            TIPS.map(function (pair) {
+                return "<li><strong>" + pair[0] + "</strong>：" + escapeHtml(tips[pair[1]]) + "</li>";
+            }).join("") + "</ul>";
+        detail.hidden = false;
+    }
+
+    function fillSelect(select, entries, label) {
+        entries.forEach(function (entry, index) {
+            var option = document.createElement("option");
+            option.value = String(index);
+            option.textContent = label(entry);
+            select.appendChild(option);
+        });
+    }
+
+    function init(data) {
+        if (!data || data.version !== CATALOG_VERSION) {
+            setStatus("商品数据格式不受支持，请重新生成报告");
+            return;
+        }
+        catalog = data;
+        rows = data.rows;
+        data.fields.forEach(function (name, index) {
+            col[name] = index;
+        });
+        fillSelect(controls.market, data.markets, function (m) { return m.flag + " " + m.name; });
+        fillSelect(controls.chart, data.charts, function (c) { return c.label; });
+        fillSelect(controls.category, data.categories, function (c) { return c.icon + " " + c.name; });
+
+        ["market", "chart", "category", "sort"].forEach(function (name) {
+            controls[name].addEventListener("change", apply);
+        });
+        controls.search.addEventListener("input", function () {
+            window.clearTimeout(searchTimer);
+            searchTimer = window.setTimeout(apply, SEARCH_DELAY_MS);
+        });
+        viewport.addEventListener("scroll", schedule, {passive: true});
+        window.addEventListener("resize", function () {
+            shown = [-1, -1];
+            schedule();
+        });
+        windowEl.addEventListener("click", function (event) {
+            var rowEl = event.target.closest(".browse-row");
+            if (rowEl && !event.target.closest("a")) {
+                showDetail(Number(rowEl.getAttribute("data-index")));
+            }
+        });
+        apply();
+    }
+
+    function load() {
+        var island = byId("catalog-data");
+        if (island) {
+            init(JSON.parse(island.textContent));
+            return;
+        }
+        window.fetch(section.getAttribute("data-src")).then(function (response) {
+            if (!response.ok) {
+                throw new Error("HTTP " + response.status);
+            }
+            return response.json();
+        }).then(init).catch(function (error) {
+            setStatus("商品数据加载失败（" + error.message + "）；直接打开本地文件时浏览器不允许读取旁路数据，请通过 HTTP 访问");
+        });
+    }
+
+    // 旁路数据等浏览区域快滚到可见时才加载，首屏只有 TOP 卡片
+    if (section.getAttribute("data-src") && "IntersectionObserver" in window) {
+        var observer = new IntersectionObserver(function (entries) {
+            if (entries.some(function (entry) { return entry.isIntersecting; })) {
+                observer.disconnect();
+                load();
+            }
+        }, {rootMargin: "600px"});
+        observer.observe(section);
+    } else {
+        load();
+    }
+})();